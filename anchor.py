@@ -1,32 +1,66 @@
 from langchain.prompts import PromptTemplate
-from langchain.schema.runnable import RunnablePassthrough
-from langchain_openai import ChatOpenAI
-from gtts import gTTS
 import os
 from typing import List, Dict
 import asyncio
 from dotenv import load_dotenv
-import feedparser
-import httpx
-from readability import Document
 import subprocess
 
 load_dotenv()
 
+from news_audio import AudioCache, CachedTTSBackend, GTTSBackend, SegmentedSpeaker, discard_output
+from news_batch import BATCH_PROMPT, NEWS_SUMMARY_MODE, PackedSummarizer
+from news_cache import NewsCache, content_hash, fetch_article, prompt_version
+from news_fetch import ArticleFetcher, Extractor, FeedReader, TokenBucket
+from registry import get_chat_model
+
 # Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 NEWS_RSS_URL = "https://finance.yahoo.com/news/rssindex"
 TIMEOUT = 25
 USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+BATCH_INSTRUCTIONS = """Analyze these financial news articles. If an article's content is unavailable, provide a cautious summary based on its title alone.
+Each summary is concise (max 100 words)."""
 
 class FinancialNewsAnchor:
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            model="gpt-4",
+    def __init__(self, llm=None, fetcher: ArticleFetcher = None, cache: NewsCache = None,
+                 summary_mode: str = NEWS_SUMMARY_MODE, audio_cache: AudioCache = None):
+        self.llm = llm or get_chat_model(
+            "gpt-4",
             temperature=0.3,
             openai_api_key=OPENAI_API_KEY
         )
         self.summary_prompt = self._create_summary_prompt()
+        self.summary_chain = self.summary_prompt | self.llm
+        self.fetcher = fetcher
+        self.feeds = None
+        self.cache = cache if cache is not None else NewsCache()
+        model_name = getattr(self.llm, "model_name", type(self.llm).__name__)
+        self.prompt_version = prompt_version(self.summary_prompt.template, model_name)
+        # Packed answers come from a different prompt, so they are cached under their own version
+        self.packed_prompt_version = prompt_version(BATCH_PROMPT.template + BATCH_INSTRUCTIONS, model_name)
+        # Paces LLM calls so a burst of articles stays under the provider's rate limit
+        self.llm_bucket = TokenBucket()
+        # Readability + lxml plain text in a process pool, off the event loop
+        self.extractor = Extractor()
+        # "concurrent": one request per article in parallel; "packed": several articles per request
+        self.summary_mode = summary_mode
+        self.packer = PackedSummarizer(self.llm, BATCH_INSTRUCTIONS, self.llm_bucket)
+        # Headlines already spoken are read from the audio cache, not re-synthesised
+        self.speaker = SegmentedSpeaker(CachedTTSBackend(GTTSBackend(lang='en', tld='co.uk'), audio_cache))
+    
+    def _get_fetcher(self) -> ArticleFetcher:
+        if self.fetcher is None:
+            self.fetcher = ArticleFetcher(headers={"User-Agent": USER_AGENT}, timeout=TIMEOUT)
+        return self.fetcher
+    
+    def _get_feeds(self) -> FeedReader:
+        if self.feeds is None:
+            self.feeds = FeedReader(self._get_fetcher())
+        return self.feeds
+    
+    async def aclose(self):
+        if self.fetcher is not None:
+            await self.fetcher.aclose()
     
     def _create_summary_prompt(self) -> PromptTemplate:
         return PromptTemplate.from_template(
@@ -41,58 +75,91 @@ class FinancialNewsAnchor:
     async def fetch_news(self) -> List[Dict]:
         """Fetch news articles with improved filtering"""
         try:
-            feed = feedparser.parse(NEWS_RSS_URL)
+            entries = await self._get_feeds().fetch(NEWS_RSS_URL)
             return [
                 {
-                    "title": entry.title,
-                    "link": entry.link,
+                    "title": entry["title"],
+                    "link": entry["link"],
                     "published": entry.get("published", "")
                 } 
-                for entry in feed.entries[:5] if entry.get("link")
+                for entry in entries[:5] if entry.get("link")
             ]
         except Exception as e:
             print(f"Error fetching RSS feed: {e}")
             return []
 
     async def fetch_article_content(self, url: str) -> str:
-        """Fetch and parse article content with Readability"""
-        async with httpx.AsyncClient(timeout=TIMEOUT, headers={"User-Agent": USER_AGENT}) as client:
-            try:
-                response = await client.get(url)
-                response.raise_for_status()
-                
-                # Extract main content using Readability
-                doc = Document(response.text)
-                content = doc.summary()
-                return content if len(content) > 100 else "Content unavailable"
-                
-            except Exception as e:
-                print(f"Error processing {url}: {e}")
-                return ""
+        """Fetch article text: Readability, then lxml plain text, in the extraction pool"""
+        try:
+            # Cached extraction; a repeat within the TTL costs no request
+            status, content = await fetch_article(self._get_fetcher(), self.cache, url, self.extractor)
+            if content is None:
+                raise RuntimeError(f"HTTP {status}")
+            return content if len(content) > 100 else "Content unavailable"
+            
+        except Exception as e:
+            print(f"Error processing {url}: {e}")
+            return ""
 
-    async def summarize_articles(self, articles: List[Dict]) -> List[str]:
-        """Generate reliable summaries with fallback"""
-        chain = (
-            {"title": RunnablePassthrough(), "content": RunnablePassthrough()}
-            | self.summary_prompt
-            | self.llm
+    async def _article_text(self, article: Dict) -> str:
+        content = await self.fetch_article_content(article["link"])
+        return content[:5000]  # Limit for API constraints
+
+    async def _llm_summary(self, title: str, content: str) -> str:
+        await self.llm_bucket.acquire()
+        result = await self.summary_chain.ainvoke({
+            "title": title,
+            "content": content
+        })
+        return result.content.strip()
+
+    async def _single_summary(self, title: str, content: str) -> str:
+        """Single-article prompt, cached under its own prompt version"""
+        key = content_hash(self.prompt_version, title, content)
+        summary = self.cache.get_summary(key)
+        if summary is None:
+            summary = await self._llm_summary(title, content)
+            self.cache.put_summary(key, summary)
+        return summary
+
+    async def _summarize_article(self, article: Dict) -> str:
+        try:
+            content = await self._article_text(article)
+            return await self._single_summary(article["title"], content)
+        except Exception as e:
+            print(f"Error summarizing {article['title']}: {e}")
+            return f"Update: {article['title']}"
+
+    async def _summarize_packed(self, articles: List[Dict]) -> List[str]:
+        """Cached summaries as usual; the misses share as few LLM requests as the token budget allows"""
+        contents = await asyncio.gather(*(self._article_text(article) for article in articles))
+        keys = [content_hash(self.packed_prompt_version, article["title"], content)
+                for article, content in zip(articles, contents)]
+        # Articles an earlier packed answer missed were summarised, and cached, with the single-article prompt
+        summaries = [self.cache.get_summary(key) or
+                     self.cache.get_summary(content_hash(self.prompt_version, article["title"], content))
+                     for key, article, content in zip(keys, articles, contents)]
+        missing = [i for i, summary in enumerate(summaries) if summary is None]
+        fresh, single = await self.packer.summarize(
+            [(articles[i]["title"], contents[i]) for i in missing], self._single_summary
         )
-        
-        summaries = []
-        for article in articles:
-            try:
-                content = await self.fetch_article_content(article["link"])
-                result = await chain.ainvoke({
-                    "title": article["title"],
-                    "content": content[:5000]  # Limit for API constraints
-                })
-                summaries.append(result.content.strip())
-                await asyncio.sleep(1)
-            except Exception as e:
-                print(f"Error summarizing {article['title']}: {e}")
-                summaries.append(f"Update: {article['title']}")
-        
-        return summaries or ["Important financial updates are currently unavailable"]
+        for j, (i, summary) in enumerate(zip(missing, fresh)):
+            if isinstance(summary, Exception):
+                print(f"Error summarizing {articles[i]['title']}: {summary}")
+                summaries[i] = f"Update: {articles[i]['title']}"
+            else:
+                summaries[i] = summary
+                if j not in single:  # single-prompt summaries were cached under their own version
+                    self.cache.put_summary(keys[i], summary)
+        return summaries
+
+    async def summarize_articles(self, articles: List[Dict]) -> List[str]:
+        """Generate reliable summaries with fallback; articles are fetched and summarized concurrently"""
+        if self.summary_mode == "packed":
+            summaries = await self._summarize_packed(articles)
+        else:
+            summaries = await asyncio.gather(*(self._summarize_article(article) for article in articles))
+        return list(summaries) or ["Important financial updates are currently unavailable"]
 
     def text_to_speech(self, text: str) -> str:
         """Robust TTS with validation"""
@@ -100,14 +167,17 @@ class FinancialNewsAnchor:
             text = "No financial updates available"
             
         try:
-            tts = gTTS(text=text, lang='en', tld='co.uk', slow=False)
-            audio_file = "news_summary.mp3"
-            tts.save(audio_file)
-            return audio_file
+            return self.speaker.save(text, "news_summary")
         except Exception as e:
             print(f"Text-to-speech error: {e}")
             return None
 
+    async def speak(self, text: str) -> dict:
+        """Segmented TTS piped into one player; audio starts after the first headline is synthesised"""
+        if not text.strip():
+            text = "No financial updates available"
+        return await self.speaker.speak(text)
+
     def play_audio(self, filename: str):
         """Reliable Linux audio playback"""
         if not os.path.exists(filename):
@@ -121,6 +191,8 @@ class FinancialNewsAnchor:
                 subprocess.run(["paplay", filename], check=True)
             except Exception as e:
                 print(f"Audio playback failed: {e}")
+        finally:
+            discard_output(filename)  # text_to_speech files are one-shot
 
 async def main():
     anchor = FinancialNewsAnchor()
@@ -130,10 +202,14 @@ async def main():
     
     if not articles:
         print("No articles found")
+        await anchor.aclose()
         return
     
     print("Analyzing news articles...")
     summaries = await anchor.summarize_articles(articles)
+    await anchor.aclose()
+    print("Cache:", anchor.cache.stats())
+    print("Extraction:", anchor.extractor.stats())
     
     broadcast = "\n\n".join([
         f"News Update {i+1}: {summary}" 
@@ -143,12 +219,10 @@ async def main():
     print("\nToday's Financial Headlines:")
     print(broadcast or "No summaries generated")
     
-    print("\nGenerating audio broadcast...")
-    audio_file = anchor.text_to_speech(broadcast)
-    
-    if audio_file:
-        anchor.play_audio(audio_file)
-        os.remove(audio_file)
+    print("\nPlaying audio broadcast...")
+    timings = await anchor.speak(broadcast)
+    if timings["first_audio"] is not None:
+        print(f"First audio after {timings['first_audio']:.1f} s, {timings['segments']} segments")
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
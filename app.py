@@ -1,17 +1,17 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
-from langchain_core.chat_history import InMemoryChatMessageHistory
 from langchain_core.runnables.history import RunnableWithMessageHistory
 
 from dotenv import load_dotenv
 load_dotenv()
 
-store = {}
+from registry import get_chat_model, shared
+from sessions import get_session_history
 
-def get_session_history(session_id: str) -> InMemoryChatMessageHistory:
-    if session_id not in store:
-        store[session_id] = InMemoryChatMessageHistory()
-    return store[session_id]
+def get_chat():
+    """The model wrapped with session history, built once per process"""
+    return shared(("app.chat",), lambda: RunnableWithMessageHistory(
+        get_chat_model("gpt-3.5-turbo"), get_session_history
+    ))
 
 def query_handler(query: str):
     try:
@@ -22,18 +22,17 @@ The user may ask for assistance with managing expenses, providing investment str
 The conversation history is as follows:
             query = {query}
         """ 
-        model = ChatOpenAI(model="gpt-3.5-turbo")
-        with_message_history = RunnableWithMessageHistory(model, get_session_history)
+        with_message_history = get_chat()
         config = {"configurable": {"session_id": "abc2"}}
         
-        # Invoke the model with the query
-        response = with_message_history.invoke(
+        # Stream the model's response to the terminal as it is generated
+        print("Response: ", end="", flush=True)
+        for chunk in with_message_history.stream(
             [HumanMessage(content=prompt)],
             config=config,
-        )
-        
-        # Print the model's response to the terminal
-        print("Response:", response.content)
+        ):
+            print(chunk.content, end="", flush=True)
+        print()
         
     except Exception as ex:
         print(f"Error: {ex}")
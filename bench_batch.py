@@ -0,0 +1,52 @@
+"""
+LLM requests vs wall time for a news briefing: one request per article in
+parallel ("concurrent") vs several articles per request ("packed").
+
+Runs offline. A local HTTP stand-in serves the article pages. A fake chat
+model takes a fixed overhead per request plus a per-summary generation
+time, so packed answers are slower than single ones. --drop-every makes
+it leave articles out of packed answers so the per-article fallback shows
+up in the request count.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from anchor import FinancialNewsAnchor
+from bench_news import ArticleSite
+from fakes import SummaryFakeChatModel
+from news_cache import NewsCache
+
+async def briefing(anchor: FinancialNewsAnchor, articles):
+    start = time.perf_counter()
+    summaries = await anchor.summarize_articles(articles)
+    elapsed = time.perf_counter() - start
+    await anchor.aclose()
+    return elapsed, summaries
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=1.0, help="fixed seconds per LLM request")
+    parser.add_argument("--per-summary", type=float, default=1.5, help="seconds to generate one summary")
+    parser.add_argument("--drop-every", type=int, default=0)
+    args = parser.parse_args()
+
+    site = ArticleSite([0.0] * args.articles)
+    url = site.start()
+    articles = [{"title": f"Story {n}", "link": f"{url}/article/{n}"} for n in range(args.articles)]
+
+    with tempfile.TemporaryDirectory() as path:
+        for mode in ("concurrent", "packed"):
+            llm = SummaryFakeChatModel(responses=["unused"], latency=args.latency,
+                                       per_summary=args.per_summary, drop_every=args.drop_every)
+            anchor = FinancialNewsAnchor(llm=llm, cache=NewsCache(os.path.join(path, f"{mode}.sqlite")),
+                                         summary_mode=mode)
+            elapsed, summaries = asyncio.run(briefing(anchor, articles))
+            print(f"{mode:<10} {elapsed:6.2f} s  {llm.requests} LLM requests  {llm.prompt_tokens} prompt tokens  "
+                  f"for {len(summaries)} articles  packer={anchor.packer.stats()}")
+
+if __name__ == "__main__":
+    main()
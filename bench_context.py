@@ -0,0 +1,77 @@
+"""
+Retrieval prompt context: stuffing the top k chunks (the old k=2 / k=3
+behaviour) vs ContextPacker over 8 candidates with a token budget.
+
+The synthetic corpus gives every term a page of a few thousand characters.
+Pages are split like insight.py (800-character chunks, start_index), with
+the overlap set by --overlap, and some pages are also ingested a second
+time under another file name. For each setup the bench reports context
+tokens per answer (mean and max), distinct word trigrams (evidence) and
+the share of trigrams that repeat.
+"""
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+import argparse
+import random
+import statistics
+import tempfile
+import time
+
+from bench_hybrid import FILLER, QUERIES, TERMS
+from context_packer import ContextPacker, shingles
+from fakes import HashingEmbeddings
+from hybrid import make_retriever
+from index_store import load_bm25, load_store, save_store
+from tokens import count_tokens
+
+def build_pages(sentences: int, duplicate_share: float):
+    rng = random.Random(0)
+    pages = []
+    for page, (term, text) in enumerate(TERMS.items()):
+        body = [f"{term}: {text}."] + [f"{term} note {i}: {rng.choice(FILLER)}" for i in range(sentences)]
+        content = " ".join(body)
+        pages.append(Document(page_content=content, metadata={"source": "guide.pdf", "page": page}))
+        if rng.random() < duplicate_share:
+            pages.append(Document(page_content=content, metadata={"source": "guide (copy).pdf", "page": page}))
+    return pages
+
+def measure(name, retrieve, queries):
+    tokens, evidence, repeats, latencies = [], [], [], []
+    for query in queries:
+        start = time.perf_counter()
+        docs = retrieve(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        tokens.append(count_tokens("\n\n".join(doc.page_content for doc in docs)))
+        grams = [gram for doc in docs for gram in shingles(doc.page_content)]
+        evidence.append(len(set(grams)))
+        repeats.append(1 - len(set(grams)) / len(grams) if grams else 0.0)
+    print(f"{name:<22} context tokens mean {statistics.mean(tokens):6.0f} max {max(tokens):5d}  "
+          f"distinct trigrams {statistics.mean(evidence):6.0f}  repeated {statistics.mean(repeats):5.1%}  "
+          f"p50 {statistics.median(latencies):6.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sentences", type=int, default=40, help="filler sentences per page")
+    parser.add_argument("--overlap", type=int, default=200)
+    parser.add_argument("--duplicates", type=float, default=0.3, help="share of pages ingested twice")
+    parser.add_argument("--budgets", default="600,1500", help="packer token budgets to compare")
+    args = parser.parse_args()
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=args.overlap, add_start_index=True)
+    chunks = splitter.split_documents(build_pages(args.sentences, args.duplicates))
+    queries = [template.format(term=term) for term in TERMS for template in QUERIES]
+    with tempfile.TemporaryDirectory() as path:
+        save_store(FAISS.from_documents(chunks, HashingEmbeddings()), path)
+        db, bm25 = load_store(path, HashingEmbeddings()), load_bm25(path)
+        print(f"{len(chunks)} chunks, {len(queries)} queries")
+        for k in (2, 3):
+            measure(f"stuff top {k}", make_retriever(db, bm25, k=k).invoke, queries)
+        candidates = make_retriever(db, bm25, k=8)
+        for budget in [int(budget) for budget in args.budgets.split(",")]:
+            packer = ContextPacker(max_tokens=budget)
+            measure(f"packed {budget} tokens", lambda query: packer.pack(candidates.invoke(query)), queries)
+            print("  packer:", {key: round(value, 2) for key, value in packer.stats().items()})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Throughput of the embedding pipeline against a local fake OpenAI embeddings
+server that enforces a concurrency ceiling (429 + Retry-After above it) and
+injects occasional 503s.
+
+Compares the old one-batch-at-a-time loop (concurrency=1) with the
+concurrent pipeline, going through the real OpenAIEmbeddings client.
+"""
+from langchain_core.documents import Document
+from langchain_openai import OpenAIEmbeddings
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+import argparse
+import asyncio
+import base64
+import random
+import socket
+import threading
+import time
+
+import numpy as np
+import uvicorn
+
+from embedding_pipeline import aembed_into_faiss
+
+class FakeEmbeddingServer:
+    """Minimal /v1/embeddings endpoint with simulated latency and rate limits"""
+    def __init__(self, dim: int, capacity: int, latency: float, per_item: float, error_rate: float):
+        self.dim = dim
+        self.capacity = capacity
+        self.latency = latency
+        self.per_item = per_item
+        self.error_rate = error_rate
+        self.in_flight = 0
+        self.requests = 0
+        self.rejected = 0
+        self.app = Starlette(routes=[Route("/v1/embeddings", self.embeddings, methods=["POST"])])
+
+    async def embeddings(self, request: Request):
+        body = await request.json()
+        self.requests += 1
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            return JSONResponse({"error": {"message": "Rate limit reached", "type": "requests"}},
+                                status_code=429, headers={"retry-after": "0.05"})
+        if random.random() < self.error_rate:
+            return JSONResponse({"error": {"message": "Service unavailable"}}, status_code=503)
+        self.in_flight += 1
+        try:
+            inputs = body["input"]
+            await asyncio.sleep(self.latency + self.per_item * len(inputs))
+            data = []
+            for i, text in enumerate(inputs):
+                vector = np.random.default_rng(abs(hash(str(text))) % 2**32).standard_normal(self.dim).astype(np.float32)
+                embedding = (base64.b64encode(vector.tobytes()).decode()
+                             if body.get("encoding_format") == "base64" else vector.tolist())
+                data.append({"object": "embedding", "index": i, "embedding": embedding})
+            return JSONResponse({"object": "list", "data": data, "model": body["model"],
+                                 "usage": {"prompt_tokens": 0, "total_tokens": 0}})
+        finally:
+            self.in_flight -= 1
+
+    def start(self) -> str:
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=port, log_level="error")
+        self.server = uvicorn.Server(config)
+        threading.Thread(target=self.server.run, daemon=True).start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return f"http://127.0.0.1:{port}/v1"
+
+    def stop(self):
+        self.server.should_exit = True
+
+def make_chunks(n: int):
+    words = "equity debt fund SIP ELSS inflation compounding risk return savings tax".split()
+    rng = random.Random(0)
+    return [Document(page_content=" ".join(rng.choice(words) for _ in range(130)), metadata={"i": i})
+            for i in range(n)]
+
+async def run(base_url: str, chunks, concurrency: int, batch_tokens: int) -> float:
+    embeddings = OpenAIEmbeddings(model="text-embedding-3-large", base_url=base_url, api_key="fake",
+                                  check_embedding_ctx_length=False, max_retries=0)
+    start = time.perf_counter()
+    db = await aembed_into_faiss(chunks, None, embeddings, concurrency=concurrency, max_tokens=batch_tokens)
+    elapsed = time.perf_counter() - start
+    assert db.index.ntotal == len(chunks)
+    assert [db.docstore.search(db.index_to_docstore_id[i]).metadata["i"] for i in range(len(chunks))] \
+        == list(range(len(chunks))), "chunks were assembled out of order"
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=4000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--capacity", type=int, default=8, help="server-side concurrency ceiling")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-tokens", type=int, default=20_000)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--per-item", type=float, default=0.001)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    args = parser.parse_args()
+
+    server = FakeEmbeddingServer(args.dim, args.capacity, args.latency, args.per_item, args.error_rate)
+    base_url = server.start()
+    chunks = make_chunks(args.chunks)
+    try:
+        for label, concurrency in [("sequential", 1), ("concurrent", args.concurrency)]:
+            server.requests = server.rejected = 0
+            elapsed = asyncio.run(run(base_url, chunks, concurrency, args.batch_tokens))
+            print(f"{label:<11} concurrency={concurrency:<3} {elapsed:6.2f} s  "
+                  f"{len(chunks) / elapsed:8.0f} chunks/s  requests={server.requests} 429s={server.rejected}")
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
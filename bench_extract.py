@@ -0,0 +1,68 @@
+"""
+Article extraction on the event loop (the old extract_content call inside
+fetch_article) vs news_fetch.Extractor in a process pool, plus prompt
+tokens of Readability HTML vs lxml plain text.
+
+A heartbeat task ticks every 10 ms while articles are extracted; its worst
+delay is how long every other fetch on the loop was stalled.
+"""
+import argparse
+import asyncio
+import time
+
+from news_fetch import Extractor, extract_content, extract_text
+
+PARAGRAPH = ('<p class="article-body__text" data-track="para">Shares of <a href="https://example.com/quote/HDFCBANK" '
+             'class="stock-link" data-symbol="HDFCBANK"><strong>HDFC Bank</strong></a> rose 3% after the lender '
+             'reported a <span class="highlight">19% rise</span> in quarterly net profit, beating '
+             '<em>Street estimates</em> on strong loan growth and stable asset quality.</p>')
+
+def make_page(n: int) -> str:
+    nav = "".join(f'<li><a href="/section/{i}">Section {i}</a></li>' for i in range(40))
+    return (f"<html><head><title>Story {n}</title><script>{'var x = 1;' * 200}</script>"
+            f"<style>{'.a{{color:red}}' * 100}</style></head><body><nav><ul>{nav}</ul></nav>"
+            f'<article><h1>Banks lift Nifty, story {n}</h1><div class="body">{PARAGRAPH * 25}</div></article>'
+            f"<footer>{nav}</footer></body></html>")
+
+async def heartbeat(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - start - 0.01)
+
+async def run(pages, extract):
+    stop, lags = asyncio.Event(), []
+    beat = asyncio.create_task(heartbeat(stop, lags))
+    await asyncio.sleep(0.02)
+    start = time.perf_counter()
+    await asyncio.gather(*(extract(page) for page in pages))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    return elapsed, max(lags)
+
+async def inline(html: str) -> str:
+    return extract_content(html)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=20)
+    args = parser.parse_args()
+    pages = [make_page(n) for n in range(args.articles)]
+
+    extractor = Extractor()
+    asyncio.run(run(pages[:1], extractor))  # start the pool's workers
+    extractor = Extractor(extractor.pool)
+    for label, extract in (("on event loop", inline), ("process pool", extractor)):
+        elapsed, lag = asyncio.run(run(pages, extract))
+        print(f"{label:<14} {elapsed:6.2f} s for {len(pages)} articles  worst event-loop stall {lag * 1000:7.1f} ms")
+
+    text, html_tokens, text_tokens = extract_text(pages[0])
+    print(f"tokens per article: Readability HTML {html_tokens}, plain text {text_tokens} "
+          f"({1 - text_tokens / html_tokens:.0%} fewer)")
+    print(f"first 5000 characters keep {len(extract_content(pages[0])[:5000].split())} words as HTML, "
+          f"{len(text[:5000].split())} as text")
+    print("pool stats:", extractor.stats())
+
+if __name__ == "__main__":
+    main()
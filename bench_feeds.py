@@ -0,0 +1,90 @@
+"""
+RSS polling: blocking feedparser.parse(url) per feed (the old fetch_news)
+vs FeedReader. FeedReader fetches all feeds concurrently on the first poll
+and uses conditional GET on later polls.
+
+Runs offline against local feed servers that answer with different
+latencies and honour If-None-Match.
+"""
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+import argparse
+import asyncio
+import hashlib
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import feedparser
+import uvicorn
+
+from news_fetch import ArticleFetcher, FeedCache, FeedReader
+
+def make_feed(name: str, items: int) -> bytes:
+    entries = "".join(
+        f"<item><title>{name} story {i}</title><link>https://example.com/{name}/{i}</link>"
+        f"<description>{'Markets moved on results. ' * 20}</description></item>"
+        for i in range(items)
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>{name}</title>{entries}</channel></rss>'.encode()
+
+class FeedSite:
+    def __init__(self, name: str, delay: float, items: int):
+        self.body = make_feed(name, items)
+        self.etag = '"' + hashlib.md5(self.body).hexdigest() + '"'
+        self.delay = delay
+        self.app = Starlette(routes=[Route("/rss", self.rss)])
+
+    async def rss(self, request: Request):
+        await asyncio.sleep(self.delay)
+        if request.headers.get("if-none-match") == self.etag:
+            return Response(status_code=304, headers={"etag": self.etag})
+        return Response(self.body, media_type="application/rss+xml", headers={"etag": self.etag})
+
+    def start(self) -> str:
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        self.server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=port, log_level="error"))
+        threading.Thread(target=self.server.run, daemon=True).start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return f"http://127.0.0.1:{port}/rss"
+
+async def poll(urls, cache_path: str, polls: int):
+    async with ArticleFetcher() as fetcher:
+        reader = FeedReader(fetcher, FeedCache(cache_path))
+        for n in range(polls):
+            before = reader.stats()
+            start = time.perf_counter()
+            feeds = await reader.fetch_all(urls)
+            elapsed = time.perf_counter() - start
+            after = reader.stats()
+            print(f"FeedReader poll {n + 1}: {elapsed:5.2f} s  {sum(len(e) for e in feeds.values())} entries  "
+                  f"{after['bytes'] - before['bytes']} bytes  "
+                  f"{after['not_modified'] - before['not_modified']}/{len(urls)} not modified")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--delays", default="0.3,0.6,0.9", help="per-feed server latency in seconds")
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--polls", type=int, default=2)
+    args = parser.parse_args()
+
+    delays = [float(delay) for delay in args.delays.split(",")]
+    urls = [FeedSite(f"feed{i}", delay, args.items).start() for i, delay in enumerate(delays)]
+
+    start = time.perf_counter()
+    entries = sum(len(feedparser.parse(url).entries) for url in urls)
+    print(f"feedparser serial: {time.perf_counter() - start:5.2f} s  {entries} entries (full download every poll)")
+
+    with tempfile.TemporaryDirectory() as path:
+        asyncio.run(poll(urls, os.path.join(path, "feeds.sqlite"), args.polls))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Dense-only vs hybrid (BM25 + FAISS, RRF) vs hybrid + lexical rerank on a
+synthetic Indian personal-finance corpus. Each query names one exact term
+(a tax section, scheme or ticker) and the single chunk that defines it is
+the expected hit.
+
+Reports hit@k and per-stage latency. The corpus is built offline and the
+dense side uses the hashing embedding from fakes.py, so absolute numbers
+only approximate text-embedding-3-large. Pass --store to time the stages
+on a real db_faiss store instead (hit@k is then not measured).
+"""
+from langchain_core.documents import Document
+from typing import Dict, List
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+
+from fakes import HashingEmbeddings
+from hybrid import make_retriever
+from index_store import load_bm25, load_store, save_store
+from langchain_community.vectorstores import FAISS
+
+TERMS = {
+    "80C": "deduction of up to 1.5 lakh for ELSS, PPF, EPF and life insurance premiums",
+    "80CCD(1B)": "extra deduction of 50,000 for contributions to the National Pension System",
+    "80D": "deduction for health insurance premiums paid for self, family and parents",
+    "80E": "deduction of interest paid on an education loan for eight years",
+    "80G": "deduction for donations to approved charitable institutions",
+    "80TTA": "deduction of up to 10,000 on savings account interest",
+    "24(b)": "deduction of up to 2 lakh on home loan interest for a self-occupied house",
+    "ELSS": "equity linked savings scheme with a three year lock-in",
+    "SCSS": "senior citizens savings scheme paying quarterly interest",
+    "SGB": "sovereign gold bonds paying 2.5 percent interest over gold returns",
+    "ULIP": "unit linked insurance plan mixing insurance and market investment",
+    "NPS": "national pension system with tier 1 and tier 2 accounts",
+    "PPF": "public provident fund with a fifteen year maturity",
+    "SSY": "sukanya samriddhi yojana for a girl child's education and marriage",
+    "HDFCBANK": "private sector bank listed on NSE and BSE",
+    "INFY": "IT services company listed on NSE and BSE",
+    "RELIANCE": "conglomerate with energy, retail and telecom businesses",
+    "LTCG": "long term capital gains on equity taxed above 1.25 lakh a year",
+    "STCG": "short term capital gains on equity taxed at a flat rate",
+    "TDS": "tax deducted at source by the payer before paying income",
+}
+FILLER = [
+    "Investors should review their goals and risk tolerance before choosing a product.",
+    "Diversification across asset classes reduces the impact of any single investment.",
+    "Tax saving investments can lower taxable income under the old regime.",
+    "Market linked products carry risk and past returns do not guarantee future returns.",
+    "A systematic investment plan spreads purchases over time and averages cost.",
+    "Emergency funds should cover six months of expenses in liquid instruments.",
+    "Deductions and exemptions differ between the old and new tax regimes.",
+    "Long term investing benefits from compounding when returns are reinvested.",
+]
+QUERIES = ["What is {term}?", "How does {term} work?", "Explain the {term} rules", "Tell me about {term}"]
+
+def build_corpus(n_filler: int) -> List[Document]:
+    rng = random.Random(0)
+    docs = [Document(page_content=f"{term}: {text}.", metadata={"term": term}) for term, text in TERMS.items()]
+    for i in range(n_filler):
+        # Filler mentions generic tax and investing words, so dense search has plenty of near misses
+        docs.append(Document(page_content=" ".join(rng.sample(FILLER, 3)), metadata={"term": None}))
+    rng.shuffle(docs)
+    return docs
+
+def evaluate(retriever, queries: List[tuple]) -> Dict:
+    hits, latencies, chars = 0, [], []
+    for query, term in queries:
+        start = time.perf_counter()
+        docs = retriever.invoke(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += any(doc.metadata.get("term") == term for doc in docs)
+        chars.append(sum(len(doc.page_content) for doc in docs))
+    return {
+        "hit_at_k": hits / len(queries) if queries else None,
+        "p50_ms": statistics.median(latencies),
+        "context_chars": statistics.mean(chars),
+        "stages": {stage: round(summary["p50_ms"], 3) for stage, summary in retriever.metrics.summary().items()},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--filler", type=int, default=5000, help="synthetic distractor chunks")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--store", help="time an existing db_faiss store (needs OpenAI embeddings)")
+    parser.add_argument("--output", help="also write results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as path:
+        if args.store:
+            from embedding_cache import get_embeddings
+            path = args.store
+            db, bm25 = load_store(path, get_embeddings()), load_bm25(path)
+            queries = [(template.format(term=term), term) for term in TERMS for template in QUERIES[:1]]
+        else:
+            save_store(FAISS.from_documents(build_corpus(args.filler), HashingEmbeddings()), path)
+            db, bm25 = load_store(path, HashingEmbeddings()), load_bm25(path)
+            queries = [(template.format(term=term), term) for term in TERMS for template in QUERIES]
+
+        configs = [
+            ("dense", make_retriever(db, None, k=args.k, rerank="none")),
+            ("hybrid", make_retriever(db, bm25, k=args.k, rerank="none")),
+            ("hybrid+rerank", make_retriever(db, bm25, k=args.k, rerank="lexical")),
+        ]
+        results = {}
+        for name, retriever in configs:
+            results[name] = evaluate(retriever, queries)
+            if args.store:
+                results[name]["hit_at_k"] = None
+            hit = results[name]["hit_at_k"]
+            print(f"{name:<14} hit@{args.k}={'n/a' if hit is None else f'{hit:.2f}'}  "
+                  f"p50={results[name]['p50_ms']:7.3f} ms  context={results[name]['context_chars']:6.0f} chars  "
+                  f"stages(p50 ms)={results[name]['stages']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+
+if __name__ == "__main__":
+    main()
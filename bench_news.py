@@ -0,0 +1,94 @@
+"""
+Wall time of a news briefing: articles one at a time (the old loop, minus
+its fixed sleeps) vs the concurrent fetch/summarize pipeline.
+
+Runs offline. Local HTTP stand-ins, one per news site, serve article pages
+with random latency, and a fake chat model stands in for GPT-4. The
+concurrent run should take about as long as the slowest single article,
+and a second run over the same articles is served from the news cache.
+"""
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import HTMLResponse
+from starlette.routing import Route
+import argparse
+import asyncio
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+
+import uvicorn
+
+from anchor import FinancialNewsAnchor
+from fakes import SlowFakeChatModel
+from news_cache import NewsCache
+
+PARAGRAPH = "<p>Markets closed higher as banking and IT stocks gained on strong quarterly results and steady inflows.</p>"
+
+class ArticleSite:
+    """Serves /article/<n> after a per-article delay"""
+    def __init__(self, delays):
+        self.delays = delays
+        self.requests = 0
+        self.app = Starlette(routes=[Route("/article/{n:int}", self.article)])
+
+    async def article(self, request: Request):
+        self.requests += 1
+        n = request.path_params["n"]
+        await asyncio.sleep(self.delays[n])
+        return HTMLResponse(f"<html><head><title>Story {n}</title></head><body><article>"
+                            f"<h1>Story {n}</h1>{PARAGRAPH * 12}</article></body></html>")
+
+    def start(self) -> str:
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        self.server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=port, log_level="error"))
+        threading.Thread(target=self.server.run, daemon=True).start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return f"http://127.0.0.1:{port}"
+
+async def serial(anchor: FinancialNewsAnchor, articles):
+    return [await anchor._summarize_article(article) for article in articles]
+
+async def timed(anchor: FinancialNewsAnchor, articles, concurrent: bool):
+    start = time.perf_counter()
+    summaries = await (anchor.summarize_articles(articles) if concurrent else serial(anchor, articles))
+    elapsed = time.perf_counter() - start
+    await anchor.aclose()
+    return elapsed, summaries
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=15)
+    parser.add_argument("--sites", type=int, default=5)
+    parser.add_argument("--max-fetch", type=float, default=1.0, help="slowest page latency in seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.8)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    delays = [rng.uniform(0.1, args.max_fetch) for _ in range(args.articles)]
+    sites = [ArticleSite(delays) for _ in range(args.sites)]
+    urls = [site.start() for site in sites]
+    articles = [{"title": f"Story {n}", "link": f"{urls[n % args.sites]}/article/{n}"} for n in range(args.articles)]
+    slowest = max(delays) + args.llm_latency
+
+    with tempfile.TemporaryDirectory() as path:
+        runs = [("serial", False, "serial"), ("concurrent", True, "shared"), ("warm cache", True, "shared")]
+        for label, concurrent, cache_name in runs:
+            llm = SlowFakeChatModel(responses=["Markets rose on bank and IT gains."], latency=args.llm_latency)
+            cache = NewsCache(os.path.join(path, f"{cache_name}.sqlite"))
+            requests = sum(site.requests for site in sites)
+            elapsed, summaries = asyncio.run(timed(FinancialNewsAnchor(llm=llm, cache=cache), articles, concurrent))
+            stats = cache.stats()
+            print(f"{label:<11} {elapsed:6.2f} s for {len(summaries)} articles "
+                  f"(slowest single article {slowest:.2f} s)  page requests={sum(site.requests for site in sites) - requests}  "
+                  f"article hit rate={stats['article_hit_rate']:.2f}  summary hit rate={stats['summary_hit_rate']:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Per-query latency of the CLI QA path: rebuilding the chain per question
+(old final_result) vs. the long-lived QAEngine.
+
+Runs fully offline against a temporary FAISS index built with a
+deterministic fake embedding model and a fake chat model.
+"""
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import FakeListChatModel
+from langchain_community.vectorstores import FAISS
+import argparse
+import statistics
+import tempfile
+import time
+
+from main import qa_bot, QAEngine
+
+QUERIES = [
+    "What is the psychology of money?",
+    "Why does saving matter?",
+    "How should I think about risk?",
+    "What is compounding?",
+    "What does enough mean?",
+]
+
+def build_index(path: str, n_chunks: int, dim: int):
+    embeddings = DeterministicFakeEmbedding(size=dim)
+    docs = [
+        Document(page_content=f"Chunk {i} about money, saving, risk and compounding.",
+                 metadata={"source": "synthetic.pdf", "page": i // 10})
+        for i in range(n_chunks)
+    ]
+    FAISS.from_documents(docs, embeddings).save_local(path)
+    return embeddings
+
+def fake_llm():
+    return FakeListChatModel(responses=["Synthetic answer."])
+
+def timed(fn, queries):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def report(label, latencies):
+    print(f"{label:<22} p50={statistics.median(latencies):8.2f} ms  "
+          f"mean={statistics.mean(latencies):8.2f} ms  max={max(latencies):8.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--rounds", type=int, default=4)
+    args = parser.parse_args()
+
+    queries = QUERIES * args.rounds
+    with tempfile.TemporaryDirectory() as path:
+        print(f"Building synthetic index ({args.chunks} chunks, dim={args.dim})...")
+        embeddings = build_index(path, args.chunks, args.dim)
+
+        def per_call(query):
+            qa_bot(embeddings=embeddings, llm=fake_llm(), db_path=path).invoke({"query": query})
+
+        before = timed(per_call, queries)
+
+        start = time.perf_counter()
+        engine = QAEngine(embeddings=embeddings, llm=fake_llm(), db_path=path)
+        startup = (time.perf_counter() - start) * 1000
+        after = timed(engine.answer, queries)
+
+    report("before (per-call)", before)
+    report("after (QAEngine)", after)
+    print(f"QAEngine one-time startup: {startup:.2f} ms")
+    print(f"Speedup (p50): {statistics.median(before) / statistics.median(after):.1f}x")
+
+if __name__ == "__main__":
+    main()
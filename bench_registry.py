@@ -0,0 +1,89 @@
+"""
+Per-call overhead of building ChatOpenAI and RunnableWithMessageHistory for
+every query (the old app.query_handler) compared with reusing them from
+the registry.
+
+Talks to a local fake /v1/chat/completions server over plain HTTP, so it
+runs offline. The numbers leave out the TLS handshake that a fresh client
+pays against api.openai.com, so the real saving is larger.
+"""
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables.history import RunnableWithMessageHistory
+from langchain_openai import ChatOpenAI
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+import argparse
+import asyncio
+import socket
+import statistics
+import threading
+import time
+
+import uvicorn
+
+from registry import get_chat_model, registry, shared
+from sessions import MemorySessionStore, get_session_history
+
+async def chat_completions(request: Request):
+    body = await request.json()
+    await asyncio.sleep(0.002)
+    return JSONResponse({
+        "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": "Synthetic answer."}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+    })
+
+def start_server() -> str:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    app = Starlette(routes=[Route("/v1/chat/completions", chat_completions, methods=["POST"])])
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}/v1"
+
+def per_call_chain(base_url: str, store):
+    model = ChatOpenAI(model="gpt-3.5-turbo", base_url=base_url, api_key="sk-bench")
+    return RunnableWithMessageHistory(model, lambda session_id: get_session_history(session_id, store))
+
+def shared_chain(base_url: str, store):
+    return shared(("bench.chat",), lambda: RunnableWithMessageHistory(
+        get_chat_model("gpt-3.5-turbo", base_url=base_url, api_key="sk-bench"),
+        lambda session_id: get_session_history(session_id, store)
+    ))
+
+def measure(build, base_url: str, n: int, invoke: bool):
+    store = MemorySessionStore()
+    timings = []
+    for i in range(n):
+        start = time.perf_counter()
+        chain = build(base_url, store)
+        if invoke:
+            chain.invoke([HumanMessage(content=f"question {i}")],
+                         config={"configurable": {"session_id": f"bench-{i % 10}"}})
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    base_url = start_server()
+    for invoke in (False, True):
+        label = "construct + invoke" if invoke else "construct only"
+        for name, build in [("per call", per_call_chain), ("registry", shared_chain)]:
+            registry.clear()
+            timings = measure(build, base_url, args.calls, invoke)
+            print(f"{label:<19} {name:<9} mean={statistics.mean(timings):7.3f} ms  "
+                  f"p50={statistics.median(timings):7.3f} ms")
+    print("Registry stats:", registry.stats()["constructions"])
+
+if __name__ == "__main__":
+    main()
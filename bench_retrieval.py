@@ -0,0 +1,161 @@
+"""
+Retrieval benchmark and recall harness for a db_faiss store.
+
+Loads the vectors of an existing store (or a synthetic corpus), derives a
+deterministic query set from them, then for each index type and k reports
+p50/p95/p99 latency, QPS, index size, process RSS and recall@k against an
+exact flat-search baseline. Results are written as JSON so runs can be
+compared over time.
+"""
+from datetime import datetime, timezone
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from typing import Dict, List
+import argparse
+import json
+import os
+import time
+
+import faiss
+import numpy as np
+import psutil
+
+from index_store import INDEX_TYPES, VECTORS_FILE, build_index, is_native_store, load_meta, load_store
+
+DEFAULT_CONFIGS = [
+    ("flat", {}),
+    ("ivf_flat", {"nprobe": 8}),
+    ("ivf_flat", {"nprobe": 32}),
+    ("ivf_pq", {"nprobe": 16}),
+    ("hnsw", {"ef_search": 64}),
+]
+
+def rss_mb() -> float:
+    return psutil.Process().memory_info().rss / 2**20
+
+def load_vectors(path: str) -> np.ndarray:
+    """All vectors of a store, in index order"""
+    if is_native_store(path) and load_meta(path)["index_type"] != "flat":
+        return np.load(os.path.join(path, VECTORS_FILE))
+    index = faiss.read_index(os.path.join(path, "index.faiss"))
+    return index.reconstruct_n(0, index.ntotal)
+
+def synthetic_vectors(n: int, dim: int, clusters: int = 64) -> np.ndarray:
+    """Clustered Gaussian corpus so ANN indexes behave like they do on real embeddings"""
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, n)
+    return (centers[labels] + 0.3 * rng.standard_normal((n, dim))).astype(np.float32)
+
+def make_queries(vectors: np.ndarray, n: int, noise: float = 0.1) -> np.ndarray:
+    """Deterministic queries: perturbed copies of random corpus vectors"""
+    rng = np.random.default_rng(1)
+    picks = vectors[rng.choice(len(vectors), n, replace=len(vectors) < n)]
+    scale = noise * float(np.linalg.norm(vectors[:1000], axis=1).mean()) / np.sqrt(vectors.shape[1])
+    return (picks + scale * rng.standard_normal(picks.shape)).astype(np.float32)
+
+def percentile_ms(latencies: List[float], q: float) -> float:
+    return float(np.percentile(latencies, q) * 1000)
+
+def measure(index, queries: np.ndarray, truth: np.ndarray, k: int) -> Dict:
+    latencies = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        found.append(ids[0])
+    start = time.perf_counter()
+    index.search(queries, k)
+    batch_seconds = time.perf_counter() - start
+    recall = np.mean([len(set(f) & set(t[:k])) / k for f, t in zip(found, truth)])
+    return {
+        "k": k,
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "p99_ms": percentile_ms(latencies, 99),
+        "qps_single": len(queries) / sum(latencies),
+        "qps_batch": len(queries) / batch_seconds,
+        "recall_at_k": float(recall),
+    }
+
+def measure_store(path: str, queries: np.ndarray, k: int) -> Dict:
+    """End-to-end cost of opening the store and searching through the LangChain wrapper"""
+    before = rss_mb()
+    start = time.perf_counter()
+    db = load_store(path, DeterministicFakeEmbedding(size=queries.shape[1]))
+    load_seconds = time.perf_counter() - start
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        db.similarity_search_with_score_by_vector(query.tolist(), k=k)
+        latencies.append(time.perf_counter() - start)
+    return {
+        "load_seconds": load_seconds,
+        "rss_delta_mb": rss_mb() - before,
+        "k": k,
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "p99_ms": percentile_ms(latencies, 99),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", default="vectorstore/db_faiss", help="store directory to benchmark")
+    parser.add_argument("--synthetic", type=int, help="use N synthetic vectors instead of a store")
+    parser.add_argument("--dim", type=int, default=3072, help="dimension for --synthetic")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 4, 10])
+    parser.add_argument("--index-types", nargs="+", choices=INDEX_TYPES,
+                        help="restrict to these index types (default: all configs)")
+    parser.add_argument("--output", default=None, help="JSON file (default bench_results/retrieval-<time>.json)")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors, source = synthetic_vectors(args.synthetic, args.dim), f"synthetic:{args.synthetic}x{args.dim}"
+    else:
+        vectors, source = load_vectors(args.store), args.store
+    queries = make_queries(vectors, args.queries)
+    max_k = max(args.k)
+    print(f"Corpus {source}: {len(vectors)} vectors, dim {vectors.shape[1]}; {len(queries)} queries")
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, max_k)
+
+    configs = [(t, p) for t, p in DEFAULT_CONFIGS if not args.index_types or t in args.index_types]
+    results = []
+    for index_type, params in configs:
+        start = time.perf_counter()
+        index = build_index(vectors, index_type, **params)
+        build_seconds = time.perf_counter() - start
+        index_bytes = int(faiss.serialize_index(index).nbytes)
+        for k in args.k:
+            row = {"index_type": index_type, "params": params, "build_seconds": build_seconds,
+                   "index_mb": index_bytes / 2**20, "rss_mb": rss_mb(), **measure(index, queries, truth, k)}
+            results.append(row)
+            print(f"{index_type:<9} {json.dumps(params):<18} k={k:<3} p50={row['p50_ms']:7.3f} ms "
+                  f"p95={row['p95_ms']:7.3f} p99={row['p99_ms']:7.3f} qps={row['qps_batch']:9.0f} "
+                  f"recall={row['recall_at_k']:.3f} size={row['index_mb']:.1f} MB")
+        del index
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "source": source,
+        "vectors": len(vectors),
+        "dim": int(vectors.shape[1]),
+        "queries": len(queries),
+        "results": results,
+    }
+    if not args.synthetic and is_native_store(args.store):
+        report["store"] = measure_store(args.store, queries[:100], max_k)
+
+    output = args.output or os.path.join(
+        "bench_results", f"retrieval-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
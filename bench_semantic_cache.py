@@ -0,0 +1,74 @@
+"""
+Median latency and LLM call count for a retail-investor FAQ workload with
+and without the semantic answer cache, through main.QAEngine.
+
+Runs offline: a character-trigram hashing embedding stands in for
+text-embedding-3-large (so paraphrases land close together) and a fake
+chat model sleeps to mimic GPT-4 latency.
+"""
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+from typing import List
+import argparse
+import random
+import statistics
+import tempfile
+import time
+
+from fakes import HashingEmbeddings, SlowFakeChatModel
+from main import QAEngine
+
+FAQ = [
+    ["What is SIP?", "what is sip", "What's a SIP?", "what is a SIP", "Explain SIP"],
+    ["What is ELSS?", "what is elss", "What's an ELSS fund?", "Explain ELSS"],
+    ["How does section 80C work?", "how does 80C work", "How does Section 80C work?"],
+    ["What is a mutual fund?", "what's a mutual fund", "What is a mutual fund"],
+    ["Is PPF better than FD?", "is ppf better than fd", "Is PPF better than an FD?"],
+    ["How much should I save for retirement?", "how much to save for retirement",
+     "How much should I save for my retirement?"],
+    ["What is an index fund?", "what's an index fund", "What is index fund?"],
+    ["How do I start investing with little money?", "how to start investing with little money"],
+]
+
+def workload(n: int) -> List[str]:
+    rng = random.Random(0)
+    weights = [1 / (rank + 1) for rank in range(len(FAQ))]  # Zipf-like popularity
+    return [rng.choice(rng.choices(FAQ, weights)[0]) for _ in range(n)]
+
+def run(engine: QAEngine, queries: List[str]):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        engine.answer(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--threshold", type=float, default=0.75,
+                        help="cosine threshold suited to the hashing embedding")
+    args = parser.parse_args()
+
+    embeddings = HashingEmbeddings()
+    queries = workload(args.queries)
+    with tempfile.TemporaryDirectory() as path:
+        docs = [Document(page_content=f"{variants[0]} Background text {i}.") for i, variants in enumerate(FAQ)]
+        FAISS.from_documents(docs, embeddings).save_local(path)
+
+        results = {}
+        for label, cache in [("no cache", False), ("semantic cache", True)]:
+            llm = SlowFakeChatModel(responses=["Synthetic answer."], latency=args.llm_latency)
+            engine = QAEngine(embeddings=embeddings, llm=llm, db_path=path, cache=cache)
+            if cache:
+                engine.cache.threshold = args.threshold
+            results[label] = (run(engine, queries), engine.cache.stats() if cache else None)
+
+    for label, (latencies, stats) in results.items():
+        llm_calls = sum(1 for latency in latencies if latency >= args.llm_latency * 1000)
+        print(f"{label:<15} p50={statistics.median(latencies):8.2f} ms  mean={statistics.mean(latencies):8.2f} ms  "
+              f"LLM calls={llm_calls}/{len(latencies)}" + (f"  {stats}" if stats else ""))
+
+if __name__ == "__main__":
+    main()
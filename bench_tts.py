@@ -0,0 +1,58 @@
+"""
+Time to first audio for a news briefing: one TTS call for the whole
+broadcast, played once it is written (the old text_to_speech +
+play_audio), vs segmented synthesis piped into a single player.
+
+Runs offline with a fake TTS backend whose latency grows with text length.
+The player is a local process that reads the audio from stdin. The last
+runs add the audio cache: a repeat of the same briefing makes no TTS
+requests, and a briefing with one new headline makes one.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from fakes import FakeTTSBackend
+from news_audio import AudioCache, CachedTTSBackend, SegmentedSpeaker
+
+HEADLINE = "📈 MoneyControl: Sensex rose 500 points as bank stocks rallied on strong quarterly results."
+PLAYER = [sys.executable, "-c", "import sys; sys.stdin.buffer.read()"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--headlines", default="3,10,30")
+    parser.add_argument("--latency", type=float, default=0.5, help="fixed seconds per TTS request")
+    parser.add_argument("--per-char", type=float, default=0.005)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    for count in [int(n) for n in args.headlines.split(",")]:
+        text = "\n".join([HEADLINE] * count) + "\n\nEnd of Indian market update"
+        backend = FakeTTSBackend(args.latency, args.per_char)
+
+        start = time.perf_counter()
+        backend.synthesize(text)
+        whole = time.perf_counter() - start
+
+        speaker = SegmentedSpeaker(backend, concurrency=args.concurrency, player=PLAYER)
+        timings = asyncio.run(speaker.speak(text))
+        print(f"{count:>3} headlines  whole-file first audio {whole:6.2f} s  |  segmented first audio "
+              f"{timings['first_audio']:5.2f} s, all segments {timings['total']:6.2f} s ({timings['segments']} segments)")
+
+    headlines = [f"{HEADLINE} Update {n}." for n in range(10)]
+    sign_off = "End of Indian market update"
+    briefings = [("cold cache", headlines), ("same briefing", headlines), ("one new headline", headlines[1:] + ["New story."])]
+    with tempfile.TemporaryDirectory() as path:
+        cache = AudioCache(os.path.join(path, "audio"))
+        for label, lines in briefings:
+            backend = FakeTTSBackend(args.latency, args.per_char)
+            speaker = SegmentedSpeaker(CachedTTSBackend(backend, cache), concurrency=args.concurrency, player=PLAYER)
+            timings = asyncio.run(speaker.speak("\n".join(lines + [sign_off])))
+            print(f"{label:<17} {backend.requests:>2} TTS requests  first audio {timings['first_audio']:5.2f} s, "
+                  f"all segments {timings['total']:5.2f} s  cache={cache.stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Inverted BM25 index over the chunks of a vector store.
+
+Built once at ingestion, in FAISS position order, so BM25 and dense hits
+can be fused by position. The index is saved as plain .npy arrays plus a
+JSON vocabulary and memory-mapped on load.
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import json
+import os
+import re
+
+import numpy as np
+
+K1 = 1.2
+B = 0.75
+VOCAB_FILE = "vocab.json"
+ARRAY_FILES = ("offsets", "doc_ids", "tfs", "doc_lens")
+
+# Keeps tokens such as "80c", "elss", "nifty50" and "u/s" intact
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[/&.-][a-z0-9]+)*")
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have how i in is it its of on or that the this to was
+what when where which who why will with you your
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    def __init__(self, vocab: Dict[str, int], offsets: np.ndarray, doc_ids: np.ndarray,
+                 tfs: np.ndarray, doc_lens: np.ndarray, k1: float = K1, b: float = B):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lens = doc_lens
+        self.k1 = k1
+        self.b = b
+        self.n_docs = len(doc_lens)
+        self.avgdl = float(doc_lens.mean()) if self.n_docs else 0.0
+        df = np.diff(offsets).astype(np.float32)
+        self.idf = np.log1p((self.n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        self._norm = (k1 * (1 - b + b * doc_lens / (self.avgdl or 1.0))).astype(np.float32)
+
+    @classmethod
+    def build(cls, texts: Iterable[str], k1: float = K1, b: float = B) -> "BM25Index":
+        vocab: Dict[str, int] = {}
+        postings: List[List[Tuple[int, int]]] = []
+        doc_lens = []
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lens.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                term_id = vocab.setdefault(term, len(vocab))
+                if term_id == len(postings):
+                    postings.append([])
+                postings[term_id].append((doc_id, tf))
+        lengths = np.array([len(plist) for plist in postings], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        flat = [posting for plist in postings for posting in plist]
+        doc_ids = np.array([doc_id for doc_id, _ in flat], dtype=np.int32)
+        tfs = np.array([tf for _, tf in flat], dtype=np.float32)
+        return cls(vocab, offsets, doc_ids, tfs, np.array(doc_lens, dtype=np.float32), k1, b)
+
+    def _term_ids(self, query: str) -> List[int]:
+        return [self.vocab[term] for term in dict.fromkeys(tokenize(query)) if term in self.vocab]
+
+    def search(self, query: str, k: int = 20) -> List[Tuple[int, float]]:
+        """Top-k (position, score) pairs, best first"""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term_id in self._term_ids(query):
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs, tf = self.doc_ids[start:end], self.tfs[start:end]
+            scores[docs] += self.idf[term_id] * tf * (self.k1 + 1) / (tf + self._norm[docs])
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k)[:k]]
+        hits = hits[np.argsort(-scores[hits])]
+        return [(int(position), float(scores[position])) for position in hits]
+
+    def term_idf(self, term: str) -> Optional[float]:
+        term_id = self.vocab.get(term)
+        return None if term_id is None else float(self.idf[term_id])
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAY_FILES:
+            np.save(os.path.join(path, f"{name}.tmp.npy"), getattr(self, name))
+            os.replace(os.path.join(path, f"{name}.tmp.npy"), os.path.join(path, f"{name}.npy"))
+        with open(os.path.join(path, VOCAB_FILE + ".tmp"), "w") as f:
+            json.dump({"k1": self.k1, "b": self.b, "vocab": self.vocab}, f)
+        os.replace(os.path.join(path, VOCAB_FILE + ".tmp"), os.path.join(path, VOCAB_FILE))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "BM25Index":
+        with open(os.path.join(path, VOCAB_FILE)) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None)
+                  for name in ARRAY_FILES}
+        return cls(meta["vocab"], k1=meta["k1"], b=meta["b"], **arrays)
+
+def rrf_fuse(rankings: Sequence[Sequence[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Reciprocal rank fusion of several best-first rankings of positions"""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, position in enumerate(ranking):
+            fused[position] = fused.get(position, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: -item[1])
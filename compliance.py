@@ -0,0 +1,238 @@
+"""
+Compliance stage for streamed answers.
+
+Each finished sentence goes through a local rule pre-filter first. Clear
+violations (promised returns, insider tips, tax evasion...) fail at once
+and generation can stop there. Generic explanations pass without an LLM
+call. Only borderline sentences (buy/sell advice, return figures,
+derivatives, crypto...) go to the LLM safety check. That check runs
+alongside generation, one call at a time, batching whatever borderline
+sentences arrived while the previous call was in flight.
+
+Text is released to the caller a sentence at a time, and only once it is
+cleared: a passing sentence at once, a borderline one after its LLM
+verdict. A failing sentence, and anything after it, is never released.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import List, Optional, Tuple
+import asyncio
+import re
+import threading
+import time
+
+from metrics import LatencyRecorder
+
+PASS, BORDERLINE, FAIL = "pass", "borderline", "fail"
+
+FAIL_PATTERNS = re.compile(r"""
+    \bguaranteed?\s+(returns?|profits?|income|gains?)\b
+  | \bassured\s+(returns?|profits?)\b
+  | \brisk[-\s]free\s+(returns?|profits?|gains?)\b
+  | \b(double|triple)\s+your\s+money\b
+  | \bsure[-\s]shot\b
+  | \bmulti[-\s]?baggers?\b
+  | \binsider\s+(information|tips?|news)\b
+  | \b(evade|evading|avoid\s+paying|hide\s+income\s+from)\s+tax
+  | \bcan(not|'t)\s+(lose|go\s+wrong)\b
+""", re.IGNORECASE | re.VERBOSE)
+
+BORDERLINE_PATTERNS = re.compile(r"""
+    \b(buy|sell|short|exit)\b
+  | \b(you\s+should|i\s+(would\s+)?recommend|i\s+suggest|best\s+(stock|share|fund)s?)\b
+  | \d+(\.\d+)?\s*%\s*(returns?|p\.?a\.?|per\s+annum|annually|a\s+year|cagr)
+  | \b(target\s+price|stock\s+tips?|intraday|f&o|futures|options\s+trading|crypto\w*|bitcoin)\b
+  | \b(leverage|margin\s+trading|borrow\w*\s+to\s+invest|loan\s+to\s+invest)\b
+""", re.IGNORECASE | re.VERBOSE)
+
+# "There are no guaranteed returns" is a disclaimer, not a promise
+NEGATION = re.compile(r"\b(no|not|never|nothing|without|cannot)\b|n't\b", re.IGNORECASE)
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+def prefilter(sentence: str) -> str:
+    """Local rule verdict for one sentence: PASS, BORDERLINE or FAIL"""
+    for match in FAIL_PATTERNS.finditer(sentence):
+        if not NEGATION.search(sentence[max(0, match.start() - 25):match.start()]):
+            return FAIL
+    if FAIL_PATTERNS.search(sentence) or BORDERLINE_PATTERNS.search(sentence):
+        return BORDERLINE
+    return PASS
+
+def split_sentences(text: str) -> Tuple[List[str], str]:
+    """Finished sentences in text, each with the whitespace that ends it, plus the unfinished tail"""
+    sentences, start = [], 0
+    for match in SENTENCE_END.finditer(text):
+        sentences.append(text[start:match.end()])
+        start = match.end()
+    return sentences, text[start:]
+
+class ComplianceChecker:
+    """
+    Wraps the LLM safety check (a runnable whose reply contains
+    "non-compliant" for a violation) and opens a run per streamed answer.
+    """
+    def __init__(self, safety_check, metrics: Optional[LatencyRecorder] = None, max_workers: int = 4):
+        self.safety_check = safety_check
+        self.metrics = metrics or LatencyRecorder()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="compliance")
+        # Updated from worker threads and concurrent requests
+        self._lock = threading.Lock()
+        self.verdicts = {PASS: 0, BORDERLINE: 0, FAIL: 0}
+        self.llm_calls = 0
+
+    def screen(self, sentence: str) -> str:
+        start = time.perf_counter()
+        verdict = prefilter(sentence)
+        self.metrics.record("prefilter", (time.perf_counter() - start) * 1000)
+        with self._lock:
+            self.verdicts[verdict] += 1
+        return verdict
+
+    def _count_llm_call(self):
+        with self._lock:
+            self.llm_calls += 1
+
+    def llm_flags(self, text: str) -> bool:
+        self._count_llm_call()
+        with self.metrics.time("llm_check"):
+            result = self.safety_check.invoke({"response": text})
+        return "non-compliant" in result.content.lower()
+
+    async def allm_flags(self, text: str, limit=None) -> bool:
+        self._count_llm_call()
+        async with limit or nullcontext():
+            with self.metrics.time("llm_check"):
+                result = await self.safety_check.ainvoke({"response": text})
+        return "non-compliant" in result.content.lower()
+
+    def run(self) -> "ComplianceRun":
+        return ComplianceRun(self)
+
+    def arun(self, limit=None) -> "AsyncComplianceRun":
+        """Async run; LLM checks enter `limit` (e.g. the assistant's semaphore) if given"""
+        return AsyncComplianceRun(self, limit)
+
+    def stats(self):
+        with self._lock:
+            return {"prefilter": dict(self.verdicts), "llm_calls": self.llm_calls}
+
+class _Run:
+    def __init__(self, checker: ComplianceChecker):
+        self.checker = checker
+        self.buffer = ""
+        self.sentences: List[str] = []  # screened text, in order, exactly as streamed
+        self.released = 0  # sentences already handed to the caller
+        self.pending: List[int] = []  # borderline sentences waiting for an LLM check
+        self.in_flight: List[int] = []  # borderline sentences in the current LLM check
+        self.violation = False
+
+    def _screen(self, sentence: str):
+        if not sentence.strip():
+            self.sentences.append(sentence)  # bare line breaks: nothing to screen
+            return
+        verdict = self.checker.screen(sentence)
+        if verdict == FAIL:
+            self.violation = True
+            return
+        self.sentences.append(sentence)
+        if verdict == BORDERLINE:
+            self.pending.append(len(self.sentences) - 1)
+
+    def _take_sentences(self, chunk: str):
+        sentences, self.buffer = split_sentences(self.buffer + chunk)
+        for sentence in sentences:
+            self._screen(sentence)
+
+    def _take_rest(self):
+        if self.buffer.strip():
+            self._screen(self.buffer)
+        self.buffer = ""
+
+    def _next_batch(self) -> Optional[str]:
+        if self.violation or not self.pending:
+            return None
+        self.in_flight, self.pending = self.pending, []
+        return " ".join(self.sentences[i].strip() for i in self.in_flight)
+
+    def _verdict(self, flagged: bool):
+        self.violation |= flagged
+        self.in_flight = []
+
+    def release(self) -> str:
+        """Text cleared since the last call: sentences up to the first one still awaiting a verdict"""
+        if self.violation:
+            return ""
+        cleared = min(self.in_flight + self.pending, default=len(self.sentences))
+        text = "".join(self.sentences[self.released:cleared])
+        self.released = max(self.released, cleared)
+        return text
+
+class ComplianceRun(_Run):
+    """Checks one streamed answer, LLM calls on the checker's thread pool"""
+    def __init__(self, checker: ComplianceChecker):
+        super().__init__(checker)
+        self.future = None
+
+    def _poll(self):
+        if self.future is not None and self.future.done():
+            self._verdict(self.future.result())
+            self.future = None
+        if self.future is None:
+            text = self._next_batch()
+            if text is not None:
+                self.future = self.checker.executor.submit(self.checker.llm_flags, text)
+
+    def feed(self, chunk: str) -> bool:
+        """Add streamed text; False once the answer is known to be non-compliant"""
+        self._take_sentences(chunk)
+        self._poll()
+        return not self.violation
+
+    def finish(self) -> bool:
+        """Check the remaining text and wait for outstanding LLM checks; True if compliant"""
+        self._take_rest()
+        with self.checker.metrics.time("check_wait"):
+            self._poll()
+            while self.future is not None and not self.violation:
+                self.future.result()
+                self._poll()
+        if self.future is not None:
+            self.future.cancel()
+        return not self.violation
+
+class AsyncComplianceRun(_Run):
+    """Checks one streamed answer, LLM calls as tasks on the running event loop"""
+    def __init__(self, checker: ComplianceChecker, limit=None):
+        super().__init__(checker)
+        self.limit = limit
+        self.task: Optional[asyncio.Task] = None
+
+    def _poll(self):
+        if self.task is not None and self.task.done():
+            self._verdict(self.task.result())
+            self.task = None
+        if self.task is None:
+            text = self._next_batch()
+            if text is not None:
+                self.task = asyncio.create_task(self.checker.allm_flags(text, self.limit))
+
+    def feed(self, chunk: str) -> bool:
+        self._take_sentences(chunk)
+        self._poll()
+        return not self.violation
+
+    async def finish(self) -> bool:
+        self._take_rest()
+        with self.checker.metrics.time("check_wait"):
+            self._poll()
+            while self.task is not None and not self.violation:
+                await asyncio.wait([self.task])
+                self._poll()
+        self.cancel()
+        return not self.violation
+
+    def cancel(self):
+        """Drop an in-flight LLM check, e.g. when the client disconnects"""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
@@ -0,0 +1,176 @@
+"""
+Token-budgeted context for retrieval prompts. The retriever returns more
+candidates than the prompt needs, in relevance order. The packer then:
+1. merges chunks that overlap or touch in the same source page, using the
+   splitter's start_index metadata, so the 100-200 character overlaps
+   are not paid for twice;
+2. drops chunks whose text is already nearly all contained in a chunk
+   that ranks higher;
+3. fills CONTEXT_TOKEN_BUDGET tiktoken tokens in relevance order,
+   skipping chunks that no longer fit. If even the best chunk is over
+   budget, it is cut to a window around its best-ranked member.
+Prompt size therefore has a fixed upper bound whatever the chunk sizes,
+and the space goes to distinct evidence.
+"""
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+from typing import Dict, FrozenSet, List, Tuple
+import os
+
+from tokens import DEFAULT_MODEL, count_tokens, count_tokens_batch, truncate_tokens
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 1500))
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", 8))  # chunks retrieved before packing
+NEAR_DUPLICATE = 0.8  # share of a chunk's word trigrams already in a higher-ranked chunk
+MERGE_GAP = 2  # characters between chunks still treated as adjacent (stripped separators)
+SEPARATOR = "\n\n"
+SEPARATOR_TOKENS = 2
+
+def shingles(text: str, n: int = 3) -> FrozenSet[Tuple[str, ...]]:
+    words = text.lower().split()
+    return frozenset(tuple(words[i:i + n]) for i in range(max(1, len(words) - n + 1)))
+
+def _span(doc: Document) -> Tuple[int, int]:
+    start = doc.metadata["start_index"]
+    return start, start + len(doc.page_content)
+
+def merge_adjacent(docs: List[Document]) -> Tuple[List[Document], int]:
+    """
+    Chunks of the same source page whose spans overlap or touch, joined
+    into one chunk ranked at its best member. A joined chunk records where
+    that member's text lies in it as focus_start/focus_end metadata.
+    Returns the chunks in rank order and the number of merges.
+    """
+    groups: Dict[tuple, List[Tuple[int, Document]]] = {}
+    loose: List[Tuple[int, Document]] = []
+    for rank, doc in enumerate(docs):
+        if isinstance(doc.metadata.get("start_index"), int):
+            key = (doc.metadata.get("source"), doc.metadata.get("page"))
+            groups.setdefault(key, []).append((rank, doc))
+        else:
+            loose.append((rank, doc))
+
+    def finish(rank: int, doc: Document, focus: Tuple[int, int], joined: bool):
+        if joined:
+            doc = Document(page_content=doc.page_content,
+                           metadata={**doc.metadata, "focus_start": focus[0], "focus_end": focus[1]})
+        merged.append((rank, doc))
+
+    merged, merges = list(loose), 0
+    for members in groups.values():
+        members.sort(key=lambda member: _span(member[1]))
+        rank, current = members[0]
+        focus, joined = (0, len(current.page_content)), False
+        for next_rank, doc in members[1:]:
+            start, end = _span(current)
+            next_start, next_end = _span(doc)
+            overlap = end - next_start
+            consistent = overlap <= 0 or current.page_content[-overlap:] == doc.page_content[:overlap]
+            if next_start > end + MERGE_GAP or not consistent:
+                finish(rank, current, focus, joined)
+                rank, current = next_rank, doc
+                focus, joined = (0, len(current.page_content)), False
+                continue
+            if next_end > end:
+                # A small gap is the separator the splitter stripped; keep the span length exact
+                text = current.page_content + "\n" * max(0, -overlap) + doc.page_content[max(0, overlap):]
+                current = Document(page_content=text, metadata={**current.metadata, "start_index": start})
+            if next_rank < rank:
+                rank, focus = next_rank, (next_start - start, next_end - start)
+            merges += 1
+            joined = True
+        finish(rank, current, focus, joined)
+    merged.sort(key=lambda member: member[0])
+    return [doc for _, doc in merged], merges
+
+def focus_window(doc: Document, max_tokens: int, model: str = DEFAULT_MODEL) -> str:
+    """
+    Text of doc within max_tokens, centred on its focus span (the whole
+    text if it has none): the focus plus as much context either side as
+    fits, or the head of the focus if the focus alone is too long
+    """
+    text = doc.page_content
+    focus_start, focus_end = doc.metadata.get("focus_start", 0), doc.metadata.get("focus_end", len(text))
+    focus = text[focus_start:focus_end]
+    spare = max_tokens - count_tokens(focus, model)
+    if spare <= 0:
+        return truncate_tokens(focus, max_tokens, model)
+    after = truncate_tokens(text[focus_end:], spare // 2, model)
+    before = truncate_tokens(text[:focus_start], spare - count_tokens(after, model), model, from_end=True)
+    if len(after) < len(text) - focus_end:
+        # The start of the text may have left budget unused; give it to the end
+        after = truncate_tokens(text[focus_end:], spare - count_tokens(before, model), model)
+    return before + focus + after
+
+class ContextPacker:
+    def __init__(self, max_tokens: int = CONTEXT_TOKEN_BUDGET, model: str = DEFAULT_MODEL,
+                 near_duplicate: float = NEAR_DUPLICATE):
+        self.max_tokens = max_tokens
+        self.model = model
+        self.near_duplicate = near_duplicate
+        self.counts = {"packs": 0, "candidates": 0, "merged": 0, "duplicates": 0,
+                       "over_budget": 0, "packed": 0, "tokens": 0}
+
+    def _drop_duplicates(self, docs: List[Document]) -> List[Document]:
+        kept, kept_shingles = [], []
+        for doc in docs:
+            doc_shingles = shingles(doc.page_content)
+            if any(len(doc_shingles & other) >= self.near_duplicate * len(doc_shingles) for other in kept_shingles):
+                self.counts["duplicates"] += 1
+                continue
+            kept.append(doc)
+            kept_shingles.append(doc_shingles)
+        return kept
+
+    def pack(self, docs: List[Document]) -> List[Document]:
+        """Merged, deduplicated chunks in relevance order, within max_tokens in total"""
+        self.counts["packs"] += 1
+        self.counts["candidates"] += len(docs)
+        docs, merges = merge_adjacent(docs)
+        self.counts["merged"] += merges
+        docs = self._drop_duplicates(docs)
+
+        packed, used = [], 0
+        for doc, tokens in zip(docs, count_tokens_batch([doc.page_content for doc in docs], self.model)):
+            cost = tokens + SEPARATOR_TOKENS
+            if used + cost <= self.max_tokens:
+                packed.append(doc)
+                used += cost
+            elif not packed:
+                # The best chunk alone is over budget: keep the part around its best member
+                text = focus_window(doc, self.max_tokens - SEPARATOR_TOKENS, self.model)
+                packed.append(Document(page_content=text, metadata={**doc.metadata, "truncated": True}))
+                used = self.max_tokens
+            else:
+                self.counts["over_budget"] += 1
+        self.counts["packed"] += len(packed)
+        self.counts["tokens"] += used
+        return packed
+
+    def format(self, docs: List[Document]) -> str:
+        """Packed chunks as prompt text, joined the way the stuff chain joins them"""
+        return SEPARATOR.join(doc.page_content for doc in self.pack(docs))
+
+    def stats(self) -> Dict:
+        packs = self.counts["packs"] or 1
+        return {**self.counts,
+                "mean_candidates": self.counts["candidates"] / packs,
+                "mean_packed": self.counts["packed"] / packs,
+                "mean_tokens": self.counts["tokens"] / packs}
+
+class PackedRetriever(BaseRetriever):
+    """Wraps a retriever so chains that stuff its documents (RetrievalQA) get packed context"""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    retriever: BaseRetriever
+    packer: ContextPacker
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.packer.pack(self.retriever.invoke(query, config={"callbacks": run_manager.get_child()}))
+
+    async def _aget_relevant_documents(self, query: str, *,
+                                       run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        docs = await self.retriever.ainvoke(query, config={"callbacks": run_manager.get_child()})
+        return self.packer.pack(docs)
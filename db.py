@@ -2,6 +2,7 @@ import faiss
 
 DB_FAISS_PATH = "vectorstores/db_faiss/index.faiss"
 
-# Load the FAISS index
-index = faiss.read_index(DB_FAISS_PATH)
+# Memory-map the FAISS index instead of reading it into RAM
+index = faiss.read_index(DB_FAISS_PATH, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
 print("FAISS index dimension:", index.d)
+print("FAISS index type:", type(index).__name__, "vectors:", index.ntotal)
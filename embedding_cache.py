@@ -0,0 +1,191 @@
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+from typing import Dict, List, Optional
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from tokens import count_tokens_batch
+
+EMBEDDING_MODEL = "text-embedding-3-large"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "cache/embeddings.sqlite")
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# USD per 1M input tokens, used only to report what cache hits saved
+EMBEDDING_PRICES = {
+    "text-embedding-3-large": 0.13,
+    "text-embedding-3-small": 0.02,
+    "text-embedding-ada-002": 0.10,
+}
+
+class EmbeddingStore:
+    """
+    Content-addressed SQLite store of float32 vectors with LRU eviction
+    once the total vector payload exceeds max_bytes
+    """
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_bytes: int = EMBEDDING_CACHE_MAX_BYTES):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        now = time.time()
+        with self._lock:
+            # SQLite caps bound parameters, so look up in slices
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i+500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items.items()]
+        with self._lock:
+            # Keys are content addresses, so an existing row already holds the same vector
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            # Upper bound; _evict recounts from the table before deleting anything
+            self._total_bytes += sum(len(row[1]) for row in rows)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used vectors until the store fits in max_bytes"""
+        if self._total_bytes <= self.max_bytes:
+            return
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()
+        if count and total > self.max_bytes:
+            # Vectors of one model share a size, so the average is a good per-row estimate
+            n = -(-(total - self.max_bytes) // (total // count))
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)", (n,)
+            )
+            total = self._conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+            ).fetchone()[0]
+        self._total_bytes = total
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends cache misses to the underlying model"""
+    def __init__(self, underlying: Embeddings, store: EmbeddingStore, model_name: Optional[str] = None):
+        self.underlying = underlying
+        self.store = store
+        self.model_name = model_name or getattr(underlying, "model", type(underlying).__name__)
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self._stats_lock = threading.Lock()
+
+    def _lookup(self, texts: List[str]):
+        keys = [EmbeddingStore.make_key(self.model_name, text) for text in texts]
+        found = self.store.get_many(list(dict.fromkeys(keys)))
+        missing = list(dict.fromkeys(text for text, key in zip(texts, keys) if key not in found))
+        hit_texts = [text for text, key in zip(texts, keys) if key in found]
+        with self._stats_lock:
+            self.hits += len(hit_texts)
+            self.misses += len(texts) - len(hit_texts)
+            self.tokens_saved += sum(count_tokens_batch(hit_texts, self.model_name))
+        return keys, found, missing
+
+    def _assemble(self, texts, keys, found, missing, vectors) -> List[List[float]]:
+        fresh = {EmbeddingStore.make_key(self.model_name, text): vector for text, vector in zip(missing, vectors)}
+        self.store.put_many(fresh)
+        found.update(fresh)
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._lookup(texts)
+        vectors = self.underlying.embed_documents(missing) if missing else []
+        return self._assemble(texts, keys, found, missing, vectors)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._lookup(texts)
+        vectors = await self.underlying.aembed_documents(missing) if missing else []
+        return self._assemble(texts, keys, found, missing, vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, found, missing = self._lookup([text])
+        vectors = [self.underlying.embed_query(text)] if missing else []
+        return self._assemble([text], keys, found, missing, vectors)[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, found, missing = self._lookup([text])
+        vectors = [await self.underlying.aembed_query(text)] if missing else []
+        return self._assemble([text], keys, found, missing, vectors)[0]
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        price = EMBEDDING_PRICES.get(self.model_name, 0.0)
+        return {
+            "model": self.model_name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "tokens_saved": self.tokens_saved,
+            "usd_saved": self.tokens_saved * price / 1_000_000,
+            "entries": len(self.store),
+        }
+
+_stores: Dict[str, EmbeddingStore] = {}
+_stores_lock = threading.Lock()
+
+def get_store(path: str = EMBEDDING_CACHE_PATH) -> EmbeddingStore:
+    """One store per path per process, shared by every CachedEmbeddings"""
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = EmbeddingStore(path)
+        return _stores[path]
+
+def get_embeddings(model: str = EMBEDDING_MODEL, cache_path: str = EMBEDDING_CACHE_PATH, **kwargs) -> CachedEmbeddings:
+    """OpenAI embeddings routed through the shared on-disk cache"""
+    return CachedEmbeddings(OpenAIEmbeddings(model=model, **kwargs), get_store(cache_path), model_name=model)
@@ -0,0 +1,117 @@
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Optional
+import asyncio
+import logging
+import random
+import uuid
+
+import httpx
+import openai
+import tqdm
+
+from tokens import count_tokens_batch
+
+logger = logging.getLogger(__name__)
+
+# OpenAI limits: 2048 inputs and 300k tokens per embeddings request
+MAX_BATCH_ITEMS = 2048
+MAX_BATCH_TOKENS = 250_000
+DEFAULT_BATCH_TOKENS = 60_000
+DEFAULT_CONCURRENCY = 8
+MAX_RETRIES = 6
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+def is_retryable(exc: BaseException) -> bool:
+    """Rate limits, timeouts and transient server errors are worth retrying"""
+    if isinstance(exc, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                        httpx.TimeoutException, httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    return getattr(exc, "status_code", None) in RETRYABLE_STATUS
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Server-suggested wait from a Retry-After header, if any"""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def token_batches(texts: List[str], max_tokens: int = DEFAULT_BATCH_TOKENS,
+                  max_items: int = MAX_BATCH_ITEMS, model: str = "text-embedding-3-large") -> Iterator[range]:
+    """Split texts into contiguous index ranges that stay under the token and item limits"""
+    max_tokens = min(max_tokens, MAX_BATCH_TOKENS)
+    start, tokens = 0, 0
+    for i, n in enumerate(count_tokens_batch(texts, model)):
+        if i > start and (tokens + n > max_tokens or i - start >= max_items):
+            yield range(start, i)
+            start, tokens = i, 0
+        tokens += n
+    if start < len(texts):
+        yield range(start, len(texts))
+
+async def with_backoff(call: Callable[[], Awaitable], max_retries: int = MAX_RETRIES,
+                       base_delay: float = 1.0, max_delay: float = 60.0):
+    """Await call(), retrying retryable errors with jittered exponential backoff"""
+    for attempt in range(max_retries + 1):
+        try:
+            return await call()
+        except Exception as e:
+            if attempt == max_retries or not is_retryable(e):
+                raise
+            backoff = min(max_delay, base_delay * 2 ** attempt)
+            delay = max(retry_after(e) or 0.0, random.uniform(backoff / 2, backoff))
+            logger.warning(f"Embedding batch failed ({type(e).__name__}), retry {attempt + 1} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+async def embed_batches(texts: List[str], embeddings: Embeddings,
+                        concurrency: int = DEFAULT_CONCURRENCY,
+                        max_tokens: int = DEFAULT_BATCH_TOKENS,
+                        max_retries: int = MAX_RETRIES) -> AsyncIterator:
+    """
+    Embed texts with a bounded pool of concurrent requests.
+    Yields (batch_range, vectors) in input order as soon as each prefix is complete.
+    """
+    batches = list(token_batches(texts, max_tokens=max_tokens))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(batch: range):
+        async with semaphore:
+            return await with_backoff(
+                lambda: embeddings.aembed_documents([texts[i] for i in batch]),
+                max_retries=max_retries
+            )
+
+    tasks = [asyncio.create_task(run(batch)) for batch in batches]
+    try:
+        for batch, task in zip(batches, tasks):
+            yield batch, await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def aembed_into_faiss(chunks: List, ids: Optional[List[str]], embeddings: Embeddings,
+                            db: Optional[FAISS] = None, concurrency: int = DEFAULT_CONCURRENCY,
+                            max_tokens: int = DEFAULT_BATCH_TOKENS, **faiss_kwargs) -> Optional[FAISS]:
+    """Embed chunks concurrently and add them to db (created if None) in their original order"""
+    texts = [chunk.page_content for chunk in chunks]
+    ids = ids or [str(uuid.uuid4()) for _ in chunks]
+    progress = tqdm.tqdm(total=len(texts), unit="chunk")
+    async for batch, vectors in embed_batches(texts, embeddings, concurrency, max_tokens):
+        text_embeddings = [(texts[i], vector) for i, vector in zip(batch, vectors)]
+        metadatas = [chunks[i].metadata for i in batch]
+        batch_ids = [ids[i] for i in batch]
+        if db is None:
+            db = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas,
+                                       ids=batch_ids, **faiss_kwargs)
+        else:
+            db.add_embeddings(text_embeddings, metadatas=metadatas, ids=batch_ids)
+        progress.update(len(batch))
+    progress.close()
+    return db
+
+def embed_into_faiss(chunks: List, ids: Optional[List[str]], embeddings: Embeddings,
+                     db: Optional[FAISS] = None, **kwargs) -> Optional[FAISS]:
+    """Synchronous entry point for the ingestion scripts"""
+    return asyncio.run(aembed_into_faiss(chunks, ids, embeddings, db=db, **kwargs))
@@ -0,0 +1,111 @@
+"""
+Offline stand-ins for OpenAI models, used by the bench_* and loadtest scripts.
+"""
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from typing import AsyncIterator, Iterator, List, Tuple
+import asyncio
+import json
+import re
+import time
+import zlib
+
+import numpy as np
+
+from tokens import count_tokens
+
+class HashingEmbeddings(Embeddings):
+    """Hashed character-trigram embedding: deterministic, offline, paraphrases land close"""
+    def __init__(self, size: int = 512):
+        self.size = size
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        padded = f"  {text.lower()}  "
+        for i in range(len(padded) - 2):
+            vector[zlib.crc32(padded[i:i+3].encode()) % self.size] += 1.0
+        return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+class SlowFakeChatModel(FakeListChatModel):
+    """
+    FakeListChatModel that takes `latency` seconds per completion. Streaming
+    emits the first word after `ttft` seconds and spreads the rest evenly.
+    """
+    latency: float = 1.0
+    ttft: float = 0.2
+
+    def _next_response(self) -> str:
+        response = self.responses[self.i]
+        self.i = (self.i + 1) % len(self.responses)
+        return response
+
+    def _call(self, *args, **kwargs) -> str:
+        time.sleep(self.latency)
+        return self._next_response()
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._next_response()))])
+
+    def _tokens(self) -> List[str]:
+        words = self._next_response().split(" ")
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        tokens = self._tokens()
+        step = max(0.0, self.latency - self.ttft) / max(1, len(tokens) - 1)
+        for i, token in enumerate(tokens):
+            time.sleep(self.ttft if i == 0 else step)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        tokens = self._tokens()
+        step = max(0.0, self.latency - self.ttft) / max(1, len(tokens) - 1)
+        for i, token in enumerate(tokens):
+            await asyncio.sleep(self.ttft if i == 0 else step)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+class SummaryFakeChatModel(SlowFakeChatModel):
+    """
+    Answers the single-article summary prompt with one sentence and a
+    packed prompt (news_batch.BATCH_PROMPT) with a JSON array. Latency is
+    `latency` plus `per_summary` for each summary written, since output
+    tokens dominate generation time. Every `drop_every`-th article is left
+    out of packed answers to exercise the per-article fallback.
+    """
+    per_summary: float = 0.5
+    drop_every: int = 0
+    requests: int = 0
+    prompt_tokens: int = 0
+
+    def _answer(self, messages) -> Tuple[str, int]:
+        prompt = "".join(message.content for message in messages)
+        self.requests += 1
+        self.prompt_tokens += count_tokens(prompt)
+        ids = [int(i) for i in re.findall(r'<article id="(\d+)">', prompt)]
+        if not ids:
+            return "Markets rose on bank and IT gains.", 1
+        kept = [i for i in ids if not self.drop_every or (i + 1) % self.drop_every]
+        return json.dumps([{"id": i, "summary": f"Article {i}: markets rose on bank and IT gains."} for i in kept]), len(kept)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        text, summaries = self._answer(messages)
+        await asyncio.sleep(self.latency + self.per_summary * summaries)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+class FakeTTSBackend:
+    """Stand-in for news_audio.GTTSBackend: takes latency + per_char * len(text) seconds, returns tagged bytes"""
+    def __init__(self, latency: float = 0.5, per_char: float = 0.01):
+        self.latency = latency
+        self.per_char = per_char
+        self.requests = 0
+
+    def synthesize(self, text: str) -> bytes:
+        self.requests += 1
+        time.sleep(self.latency + self.per_char * len(text))
+        return f"<audio:{text}>".encode()
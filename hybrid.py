@@ -0,0 +1,133 @@
+"""
+Hybrid retrieval: FAISS and BM25 candidates fused by reciprocal rank,
+then optionally reranked on CPU.
+
+Dense search finds paraphrases. BM25 finds exact financial terms
+("ELSS", "80C", tickers) that embeddings blur, so fewer and smaller
+chunks are enough to cover a question.
+"""
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict, Field
+from typing import Any, List, Optional
+import asyncio
+import logging
+import os
+import time
+
+import faiss
+import numpy as np
+
+from bm25 import BM25Index, rrf_fuse, tokenize
+from metrics import LatencyRecorder
+
+logger = logging.getLogger(__name__)
+
+RERANKER = os.getenv("RERANKER", "lexical")  # "lexical", "cross-encoder" or "none"
+CROSS_ENCODER_MODEL = os.getenv("CROSS_ENCODER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+class LexicalReranker:
+    """
+    Scores each candidate by the IDF-weighted share of query terms it
+    contains, plus half its normalised fusion score, so chunks that
+    mention every rare term of the question ("ELSS lock-in 80C") rise
+    to the top
+    """
+    def __init__(self, bm25: Optional[BM25Index] = None):
+        self.bm25 = bm25
+
+    def rerank(self, query: str, docs: List[Document], prior: List[float]) -> List[float]:
+        terms = dict.fromkeys(tokenize(query))
+        weights = {term: (self.bm25.term_idf(term) or 0.0) if self.bm25 else 1.0 for term in terms}
+        total = sum(weights.values()) or 1.0
+        top = max(prior, default=0.0) or 1.0
+        scores = []
+        for doc, fused in zip(docs, prior):
+            doc_terms = set(tokenize(doc.page_content))
+            coverage = sum(weight for term, weight in weights.items() if term in doc_terms) / total
+            scores.append(coverage + 0.5 * fused / top)
+        return scores
+
+class CrossEncoderReranker:
+    """sentence-transformers cross-encoder on CPU; slower but reads the question and chunk together"""
+    def __init__(self, model_name: str = CROSS_ENCODER_MODEL):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, device="cpu")
+
+    def rerank(self, query: str, docs: List[Document], prior: List[float]) -> List[float]:
+        return [float(score) for score in self.model.predict([(query, doc.page_content) for doc in docs])]
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retrieves fetch_k candidates from FAISS and from BM25, fuses the two
+    rankings with RRF, reranks the best rerank_k and returns k documents.
+    Without a BM25 index (stores saved before it existed) it reranks dense
+    candidates only.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vectorstore: FAISS
+    bm25: Optional[BM25Index] = None
+    reranker: Optional[Any] = None
+    k: int = 3
+    fetch_k: int = 20
+    rerank_k: int = 10
+    rrf_k: int = 60
+    metrics: LatencyRecorder = Field(default_factory=LatencyRecorder)
+
+    def _timed(self, stage: str, start: float) -> float:
+        now = time.perf_counter()
+        self.metrics.record(stage, (now - start) * 1000)
+        return now
+
+    def _retrieve(self, query: str, vector: List[float], start: float) -> List[Document]:
+        vector = np.asarray([vector], dtype=np.float32)
+        if self.vectorstore._normalize_L2:
+            faiss.normalize_L2(vector)
+        _, positions = self.vectorstore.index.search(vector, self.fetch_k)
+        rankings = [[int(position) for position in positions[0] if position != -1]]
+        start = self._timed("dense", start)
+
+        if self.bm25 is not None:
+            rankings.append([position for position, _ in self.bm25.search(query, self.fetch_k)])
+            start = self._timed("bm25", start)
+
+        fused = rrf_fuse(rankings, self.rrf_k)[:self.rerank_k if self.reranker else self.k]
+        docstore, index_map = self.vectorstore.docstore, self.vectorstore.index_to_docstore_id
+        docs = [docstore.search(index_map[position]) for position, _ in fused]
+        start = self._timed("fuse", start)
+
+        if self.reranker is not None and docs:
+            scores = self.reranker.rerank(query, docs, [score for _, score in fused])
+            docs = [doc for _, doc in sorted(zip(scores, docs), key=lambda item: -item[0])]
+            self._timed("rerank", start)
+        return docs[:self.k]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        start = time.perf_counter()
+        vector = self.vectorstore._embed_query(query)
+        return self._retrieve(query, vector, self._timed("embed", start))
+
+    async def _aget_relevant_documents(self, query: str, *,
+                                       run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        start = time.perf_counter()
+        vector = await self.vectorstore._aembed_query(query)
+        # faiss and BM25 search and the docstore reads block, so they run off the event loop
+        return await asyncio.to_thread(self._retrieve, query, vector, self._timed("embed", start))
+
+def make_reranker(kind: str = RERANKER, bm25: Optional[BM25Index] = None):
+    if kind in (None, "", "none"):
+        return None
+    if kind == "lexical":
+        return LexicalReranker(bm25)
+    if kind == "cross-encoder":
+        return CrossEncoderReranker()
+    raise ValueError(f"Unknown reranker {kind!r}, expected 'lexical', 'cross-encoder' or 'none'")
+
+def make_retriever(db: FAISS, bm25: Optional[BM25Index] = None, k: int = 3, fetch_k: int = 20,
+                   rerank: Optional[str] = RERANKER) -> HybridRetriever:
+    if bm25 is None:
+        logger.warning("No BM25 index for this store; re-run ingestion to enable hybrid retrieval")
+    return HybridRetriever(vectorstore=db, bm25=bm25, reranker=make_reranker(rerank, bm25), k=k, fetch_k=fetch_k)
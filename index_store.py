@@ -0,0 +1,225 @@
+from collections.abc import Mapping
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from typing import Dict, Iterator, List, Optional, Union
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+
+import faiss
+import numpy as np
+
+from bm25 import BM25Index
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.sqlite"
+META_FILE = "index_meta.json"
+VECTORS_FILE = "vectors.npy"  # raw vectors kept for ANN indexes so writers can rebuild
+BM25_DIR = "bm25"
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+def _factory_string(index_type: str, n: int, dim: int, params: Dict) -> str:
+    """faiss.index_factory description for an index type, with sizes clamped to the corpus"""
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{params.get('hnsw_m', 32)}"
+    # ~39 training points per centroid is faiss' lower bound
+    nlist = params.get("nlist") or max(1, int(4 * math.sqrt(n)))
+    nlist = max(1, min(nlist, n // 39 or 1))
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        # Subvectors of at least 2 dimensions, and the same ~39 points per PQ centroid
+        m = max(1, min(params.get("pq_m", 64), dim // 2))
+        while dim % m:
+            m -= 1
+        nbits = min(params.get("pq_nbits", 8), int(math.log2(max(n / 39, 2))))
+        return f"IVF{nlist},PQ{m}x{nbits}"
+    raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+
+def apply_search_params(index, params: Dict):
+    """Set query-time knobs (nprobe for IVF, efSearch for HNSW)"""
+    if params.get("nprobe"):
+        try:
+            faiss.extract_index_ivf(index).nprobe = params["nprobe"]
+        except RuntimeError:
+            pass
+    if params.get("ef_search") and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = params["ef_search"]
+
+def build_index(vectors: np.ndarray, index_type: str = "flat", **params):
+    """Train (if needed) and fill a faiss index of the given type from raw L2 vectors"""
+    n, dim = vectors.shape
+    description = _factory_string(index_type, n, dim, params)
+    index = faiss.index_factory(dim, description, faiss.METRIC_L2)
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = params.get("ef_construction", 80)
+    if not index.is_trained:
+        sample = vectors
+        max_train = params.get("max_train", 256 * 1024)
+        if n > max_train:
+            rng = np.random.default_rng(0)
+            sample = vectors[rng.choice(n, max_train, replace=False)]
+        index.train(np.ascontiguousarray(sample))
+    index.add(np.ascontiguousarray(vectors))
+    apply_search_params(index, params)
+    logger.info(f"Built {description} index over {n} vectors")
+    return index
+
+class SQLiteDocstore(Docstore):
+    """Read-only docstore backed by the store's SQLite file; rows are fetched on demand"""
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def search(self, search: str) -> Union[str, Document]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT page_content, metadata FROM docs WHERE id = ?", (search,)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+    def position_to_id(self, position: int) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM docs WHERE pos = ?", (position,)).fetchone()
+        return row[0] if row else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+class SQLiteIndexMap(Mapping):
+    """index_to_docstore_id view that resolves positions lazily instead of holding a dict"""
+    def __init__(self, docstore: SQLiteDocstore):
+        self._docstore = docstore
+
+    def __getitem__(self, position: int) -> str:
+        doc_id = self._docstore.position_to_id(int(position))
+        if doc_id is None:
+            raise KeyError(position)
+        return doc_id
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self)))
+
+    def __len__(self) -> int:
+        return len(self._docstore)
+
+def _write_docstore(db: FAISS, path: str) -> List[str]:
+    """Write the docs table; returns page contents in position order"""
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("CREATE TABLE docs (pos INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, "
+                 "page_content TEXT NOT NULL, metadata TEXT NOT NULL)")
+    rows = []
+    for position, doc_id in sorted(db.index_to_docstore_id.items()):
+        doc = db.docstore.search(doc_id)
+        rows.append((position, doc_id, doc.page_content, json.dumps(doc.metadata, default=str)))
+    conn.executemany("INSERT INTO docs VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, path)
+    return [row[2] for row in rows]
+
+def is_native_store(path: str) -> bool:
+    return os.path.exists(os.path.join(path, DOCSTORE_FILE))
+
+def save_store(db: FAISS, path: str, index_type: str = "flat", **params):
+    """
+    Persist a (flat, in-memory) FAISS store as index.faiss + docstore.sqlite
+    (plus the BM25 index over the same chunks), converting the index to
+    index_type on the way out. No pickle involved.
+    """
+    os.makedirs(path, exist_ok=True)
+    vectors = db.index.reconstruct_n(0, db.index.ntotal) if db.index.ntotal else \
+        np.zeros((0, db.index.d), dtype=np.float32)
+    if index_type != "flat" and not len(vectors):
+        index_type = "flat"
+    index = build_index(vectors, index_type, **params) if index_type != "flat" else db.index
+
+    faiss.write_index(index, os.path.join(path, INDEX_FILE + ".tmp"))
+    os.replace(os.path.join(path, INDEX_FILE + ".tmp"), os.path.join(path, INDEX_FILE))
+    vectors_path = os.path.join(path, VECTORS_FILE)
+    if index_type != "flat":
+        np.save(vectors_path + ".tmp.npy", vectors)
+        os.replace(vectors_path + ".tmp.npy", vectors_path)
+    elif os.path.exists(vectors_path):
+        os.remove(vectors_path)
+    texts = _write_docstore(db, os.path.join(path, DOCSTORE_FILE))
+    BM25Index.build(texts).save(os.path.join(path, BM25_DIR))
+
+    meta = {
+        "index_type": index_type,
+        "params": params,
+        "dim": int(db.index.d),
+        "ntotal": int(db.index.ntotal),
+        "normalize_L2": bool(db._normalize_L2),
+    }
+    with open(os.path.join(path, META_FILE), "w") as f:
+        json.dump(meta, f, indent=1)
+
+def load_meta(path: str) -> Dict:
+    with open(os.path.join(path, META_FILE)) as f:
+        return json.load(f)
+
+def load_store(path: str, embeddings: Embeddings, mmap: bool = True, **search_params) -> FAISS:
+    """
+    Open a store for querying. The index is memory-mapped (effective for IVF
+    indexes; flat and HNSW indexes are still read into RAM by faiss) and
+    documents are fetched from SQLite only when a search returns them.
+    Falls back to the legacy pickle layout written by FAISS.save_local.
+    """
+    if not is_native_store(path):
+        return FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+    meta = load_meta(path)
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+    index = faiss.read_index(os.path.join(path, INDEX_FILE), flags)
+    apply_search_params(index, {**meta["params"], **search_params})
+    docstore = SQLiteDocstore(os.path.join(path, DOCSTORE_FILE))
+    return FAISS(embeddings, index, docstore, SQLiteIndexMap(docstore),
+                 normalize_L2=meta["normalize_L2"])
+
+def load_bm25(path: str) -> Optional[BM25Index]:
+    """The store's BM25 index, or None for stores saved before it existed"""
+    bm25_path = os.path.join(path, BM25_DIR)
+    if not os.path.exists(os.path.join(bm25_path, "vocab.json")):
+        return None
+    return BM25Index.load(bm25_path)
+
+def load_writable_store(path: str, embeddings: Embeddings) -> FAISS:
+    """
+    Open a store for modification as a flat in-memory index, so adds and
+    deletes keep positions dense; save_store re-derives the ANN index.
+    """
+    if not is_native_store(path):
+        return FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+    meta = load_meta(path)
+    vectors_path = os.path.join(path, VECTORS_FILE)
+    if meta["index_type"] == "flat":
+        index = faiss.read_index(os.path.join(path, INDEX_FILE))
+    else:
+        index = faiss.IndexFlatL2(meta["dim"])
+        index.add(np.load(vectors_path, mmap_mode="r"))
+
+    conn = sqlite3.connect(os.path.join(path, DOCSTORE_FILE))
+    docs, index_to_docstore_id = {}, {}
+    for position, doc_id, content, metadata in conn.execute(
+            "SELECT pos, id, page_content, metadata FROM docs ORDER BY pos"):
+        docs[doc_id] = Document(id=doc_id, page_content=content, metadata=json.loads(metadata))
+        index_to_docstore_id[position] = doc_id
+    conn.close()
+    return FAISS(embeddings, index, InMemoryDocstore(docs), index_to_docstore_id,
+                 normalize_L2=meta["normalize_L2"])
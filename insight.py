@@ -1,59 +1,197 @@
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter 
+from langchain.text_splitter import RecursiveCharacterTextSplitter
 from dotenv import load_dotenv
-import tqdm
+from pathlib import Path
+from typing import Dict, List, Tuple
+import argparse
+import hashlib
+import json
+import os
 import time
 
+from embedding_cache import get_embeddings
+from embedding_pipeline import embed_into_faiss
+from index_store import INDEX_TYPES, load_writable_store, save_store
+from pdf_loader import iter_by_source, iter_pdf_pages
+
 load_dotenv()
 
 DATA_PATH = 'data/'
 DB_FAISS_PATH = 'vectorstore/db_faiss'
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_VERSION = 1
+EMBED_WINDOW = 2000  # chunks embedded per pass while streaming pages
+
+def file_hash(path: Path) -> str:
+    """SHA-256 of a file's bytes, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_ids(source: str, chunks: List) -> List[str]:
+    """
+    Stable per-chunk ids derived from the chunk's content hash.
+    Repeated identical chunks within one file get an occurrence suffix so
+    ids stay unique without depending on offsets that shift on edits.
+    """
+    seen: Dict[str, int] = {}
+    ids = []
+    for chunk in chunks:
+        content_hash = hashlib.sha256(chunk.page_content.encode('utf-8')).hexdigest()
+        occurrence = seen.get(content_hash, 0)
+        seen[content_hash] = occurrence + 1
+        ids.append(hashlib.sha256(f"{source}\0{content_hash}\0{occurrence}".encode('utf-8')).hexdigest())
+    return ids
+
+def moved_chunks(db, reused: List[Tuple[object, str]]) -> Dict[str, object]:
+    """
+    Reused chunks (same id, so same text) whose metadata changed, e.g. a
+    start_index or page that shifted because earlier text was edited.
+    Their vectors stay; only the stored documents need replacing.
+    """
+    moved = {}
+    for chunk, chunk_id in reused:
+        stored = db.docstore.search(chunk_id)
+        if not isinstance(stored, str) and stored.metadata != chunk.metadata:
+            moved[chunk_id] = chunk
+    return moved
+
+def load_manifest(db_path: str = DB_FAISS_PATH) -> Dict:
+    path = os.path.join(db_path, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"version": MANIFEST_VERSION, "files": {}}
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {"version": MANIFEST_VERSION, "files": {}}
+    return manifest
+
+def save_manifest(manifest: Dict, db_path: str = DB_FAISS_PATH):
+    os.makedirs(db_path, exist_ok=True)
+    tmp_path = os.path.join(db_path, MANIFEST_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, os.path.join(db_path, MANIFEST_FILE))
 
-def create_vector_db():
+def index_exists(db_path: str = DB_FAISS_PATH) -> bool:
+    return os.path.exists(os.path.join(db_path, 'index.faiss'))
+
+def get_text_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=800,  # Reduced from 1000
+        chunk_overlap=100,
+        length_function=len,
+        add_start_index=True
+    )
+
+def create_vector_db(incremental: bool = True, data_path: str = DATA_PATH, db_path: str = DB_FAISS_PATH,
+                     index_type: str = "flat", **index_params):
     try:
-        # 1. Load documents
-        print("🔄 Loading PDF documents...")
-        loader = DirectoryLoader(DATA_PATH,
-                               glob=['*.pdf'],
-                               loader_cls=PyPDFLoader)
-        documents = loader.load()
-        print(f"✅ Successfully loaded {len(documents)} pages")
-
-        # 2. Split text with smaller chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=800,  # Reduced from 1000
-            chunk_overlap=100,
-            length_function=len,
-            add_start_index=True
-        )
-        texts = text_splitter.split_documents(documents)
-        print(f"✂️ Split into {len(texts)} text chunks")
-
-        # 3. Create embeddings with manual progress
-        embeddings = OpenAIEmbeddings(
-            model='text-embedding-3-large',
-            request_timeout=60  # Increased timeout
-        )
-
-        # 4. Batch processing with progress
-        print("🧠 Generating embeddings (this may take 5-15 minutes)...")
+        embeddings = get_embeddings(request_timeout=60)  # Increased timeout
         start_time = time.time()
-        
-        # Process in batches to avoid timeouts
-        batch_size = 100
-        for i in tqdm.tqdm(range(0, len(texts), batch_size)):
-            batch = texts[i:i+batch_size]
-            if i == 0:  # Only create the initial DB
-                db = FAISS.from_documents(batch, embeddings)
-            else:       # Add subsequent batches
-                db.add_documents(batch)
-        
+
+        # 1. Work out what changed since the last run
+        manifest = load_manifest(db_path)
+        db = None
+        if incremental and index_exists(db_path) and manifest["files"]:
+            db = load_writable_store(db_path, embeddings)
+            print(f"📂 Loaded existing index with {db.index.ntotal} vectors")
+        else:
+            manifest = {"version": MANIFEST_VERSION, "files": {}}
+
+        pdf_paths = sorted(Path(data_path).glob('*.pdf'))
+        current = {str(path): path for path in pdf_paths}
+        removed_files = [source for source in manifest["files"] if source not in current]
+
+        stale_ids: List[str] = []
+        for source in removed_files:
+            stale_ids.extend(manifest["files"].pop(source)["chunks"])
+
+        print("🔄 Checking PDF documents...")
+        changed: Dict[str, str] = {}
+        for source, path in current.items():
+            digest = file_hash(path)
+            entry = manifest["files"].get(source)
+            if not (entry and entry["hash"] == digest):
+                changed[source] = digest
+
+        print(f"✅ {len(current)} PDFs: {len(current) - len(changed)} unchanged, "
+              f"{len(changed)} new/changed, {len(removed_files)} removed")
+
+        index_config = {"type": index_type, "params": index_params}
+        if not changed and not removed_files and db is not None and manifest.get("index") == index_config:
+            save_manifest(manifest, db_path)
+            print("✨ Vector store is already up to date")
+            return db
+
+        # 2. Parse changed PDFs in a process pool and stream their chunks into the index
+        text_splitter = get_text_splitter()
+        new_chunks, new_ids = [], []
+        moved: Dict[str, object] = {}
+        added = 0
+        failures: Dict[str, str] = {}
+        print(f"🧠 Parsing {len(changed)} PDFs and embedding new chunks...")
+        for source, pages in iter_by_source(iter_pdf_pages(changed, failures=failures)):
+            if source in failures:
+                continue  # a partly parsed file is not indexed; handled with the other failures below
+            chunks = text_splitter.split_documents(pages)
+            ids = chunk_ids(source, chunks)
+            entry = manifest["files"].get(source)
+            old_ids = set(entry["chunks"]) if entry else set()
+            stale_ids.extend(old_ids.difference(ids))
+            reused = []
+            for chunk, chunk_id in zip(chunks, ids):
+                if chunk_id not in old_ids:
+                    new_chunks.append(chunk)
+                    new_ids.append(chunk_id)
+                else:
+                    reused.append((chunk, chunk_id))
+            if reused and db is not None:
+                moved.update(moved_chunks(db, reused))
+            manifest["files"][source] = {"hash": changed[source], "chunks": ids}
+
+            # Embed in windows so only one window of chunks is held in memory
+            if len(new_chunks) >= EMBED_WINDOW:
+                db = embed_into_faiss(new_chunks, new_ids, embeddings, db=db)
+                added += len(new_chunks)
+                new_chunks, new_ids = [], []
+        if new_chunks:
+            db = embed_into_faiss(new_chunks, new_ids, embeddings, db=db)
+            added += len(new_chunks)
+        print(f"✅ Embedded {added} new chunks")
+
+        # Unchanged chunks keep their vectors, but context packing merges by start_index, so offsets must be current
+        if moved:
+            db.docstore.delete(list(moved))
+            db.docstore.add(moved)
+            print(f"📝 Updated offsets of {len(moved)} moved chunks")
+
+        # A file that failed to parse loses its old chunks and manifest entry, so the next run retries it
+        for source, error in failures.items():
+            print(f"⚠️ Could not parse {source}: {error}")
+            entry = manifest["files"].pop(source, None)
+            if entry:
+                stale_ids.extend(entry["chunks"])
+
+        # 3. Drop vectors for removed files and changed chunks
+        if stale_ids and db is not None:
+            db.delete(stale_ids)
+            print(f"🗑️ Removed {len(stale_ids)} stale vectors")
+
+        if db is None:
+            print("\n⚠️ No documents to index - check your data directory")
+            return None
+
         # 5. Save and verify
-        db.save_local(DB_FAISS_PATH)
+        save_store(db, db_path, index_type=index_type, **index_params)
+        manifest["index"] = index_config
+        save_manifest(manifest, db_path)
         print(f"⏱️ Total processing time: {(time.time()-start_time)/60:.1f} minutes")
-        print(f"💾 Saved to {DB_FAISS_PATH}")
+        print(f"💾 Saved to {db_path}")
+        stats = embeddings.stats()
+        print(f"🗃️ Embedding cache: {stats['hits']} hits, {stats['misses']} misses, "
+              f"~${stats['usd_saved']:.4f} saved")
 
         # Quick test
         test_query = "What is the psychology of money?"
@@ -63,6 +201,7 @@ def create_vector_db():
             print(docs[0].page_content[:200] + "...")
         else:
             print("\n⚠️ Verification failed - check your documents")
+        return db
 
     except Exception as e:
         print(f"\n❌ Critical failure: {str(e)}")
@@ -73,4 +212,19 @@ def create_vector_db():
         print("4. Monitor API usage at https://platform.openai.com/usage")
 
 if __name__ == "__main__":
-    create_vector_db()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build the FAISS vector store from data/")
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and re-embed everything")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat")
+    parser.add_argument("--nlist", type=int, help="IVF lists (default 4*sqrt(n))")
+    parser.add_argument("--nprobe", type=int, help="IVF lists probed per query")
+    parser.add_argument("--pq-m", type=int, help="PQ sub-quantizers (must divide the dimension)")
+    parser.add_argument("--pq-nbits", type=int, help="bits per PQ code")
+    parser.add_argument("--hnsw-m", type=int, help="HNSW neighbours per node")
+    parser.add_argument("--ef-construction", type=int)
+    parser.add_argument("--ef-search", type=int)
+    args = parser.parse_args()
+    index_params = {
+        name: value for name, value in vars(args).items()
+        if name not in ("full", "index_type") and value is not None
+    }
+    create_vector_db(incremental=not args.full, index_type=args.index_type, **index_params)
@@ -0,0 +1,127 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
+import hashlib
+import os
+import re
+
+SAMPLE_CHARS = 500  # Same budget the langdetect path used
+PARALLEL_THRESHOLD = 20_000  # below this, process start-up costs more than it saves
+CACHE_SIZE = 200_000
+
+# Unicode blocks for the Indic scripts we care about
+SCRIPT_RANGES = {
+    "hi": (0x0900, 0x097F),  # Devanagari
+    "ta": (0x0B80, 0x0BFF),  # Tamil
+}
+OTHER_INDIC = (0x0980, 0x0DFF)  # Bengali .. Sinhala, minus Tamil above
+
+ENGLISH_WORDS = frozenset("""
+a about after all also an and any are as at be because been but by can could do does for from
+had has have he her his how i if in into is it its may more most no not of on or our out over
+per should so some such than that the their them then there these they this those through to
+under up was we were what when which while who will with would you your
+""".split())
+# Frequent function words of other Latin-script languages that show up in scraped PDFs
+FOREIGN_WORDS = frozenset("""
+le la les des est une et du au aux pour dans sur avec sont
+el los las que por con una para del como más
+der die und das ist nicht mit sich auf dem den ein eine
+il di che non per una sono della
+""".split())
+
+WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+def classify(text: str) -> str:
+    """
+    Deterministic language guess for a single text: 'en', 'hi', 'ta',
+    'other', or 'unknown' when there are no letters to judge by.
+    Indic scripts are decided by code point counts, Latin text by
+    function-word unigrams. Plain ASCII text with no foreign function
+    words (ticker lists, table headers) is 'en' at any length.
+    """
+    sample = text[:SAMPLE_CHARS]
+    counts = {lang: 0 for lang in SCRIPT_RANGES}
+    latin = other = 0
+    for ch in sample:
+        code = ord(ch)
+        if code < 0x80:
+            if ch.isalpha():
+                latin += 1
+            continue
+        for lang, (low, high) in SCRIPT_RANGES.items():
+            if low <= code <= high:
+                counts[lang] += 1
+                break
+        else:
+            if ch.isalpha():
+                if OTHER_INDIC[0] <= code <= OTHER_INDIC[1] or code > 0x024F:
+                    other += 1
+                else:
+                    latin += 1  # Latin-1 / Latin Extended letters
+
+    indic_lang = max(counts, key=counts.get)
+    letters = latin + other + sum(counts.values())
+    if letters == 0:
+        return "unknown"
+    if counts[indic_lang] >= max(latin, other) and counts[indic_lang] > 0:
+        return indic_lang
+    if other > latin:
+        return "other"
+
+    words = [word.lower() for word in WORD_RE.findall(sample)]
+    english = sum(word in ENGLISH_WORDS for word in words)
+    foreign = sum(word in FOREIGN_WORDS for word in words)
+    if english > foreign:
+        return "en"
+    if foreign > english:
+        return "other"
+    # Titles, ticker lists and table rows carry no function words; plain ASCII shows no other language
+    return "en" if all(word.isascii() for word in words) else "other"
+
+def _classify_many(texts: List[str]) -> List[str]:
+    return [classify(text) for text in texts]
+
+class LanguageClassifier:
+    """Batched classify() with a content-hash LRU cache and optional process fan-out"""
+    def __init__(self, cache_size: int = CACHE_SIZE, max_workers: Optional[int] = None,
+                 parallel_threshold: int = PARALLEL_THRESHOLD):
+        self.cache_size = cache_size
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.parallel_threshold = parallel_threshold
+        self._cache: "OrderedDict[bytes, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text[:SAMPLE_CHARS].encode("utf-8"), digest_size=16).digest()
+
+    def classify_batch(self, texts: Iterable[str]) -> List[str]:
+        texts = list(texts)
+        keys = [self._key(text) for text in texts]
+        results: Dict[bytes, str] = {}
+        todo: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                results[key] = self._cache[key]
+            elif key not in todo:
+                todo[key] = text[:SAMPLE_CHARS]
+        self.misses += len(todo)
+        self.hits += len(texts) - len(todo)
+
+        samples = list(todo.values())
+        if len(samples) >= self.parallel_threshold and self.max_workers > 1:
+            size = -(-len(samples) // (self.max_workers * 4))
+            parts = [samples[i:i+size] for i in range(0, len(samples), size)]
+            with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                labels = [label for part in pool.map(_classify_many, parts) for label in part]
+        else:
+            labels = _classify_many(samples)
+
+        for key, label in zip(todo, labels):
+            results[key] = self._cache[key] = label
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return [results[key] for key in keys]
@@ -0,0 +1,129 @@
+"""
+Throughput and latency of the /chat endpoint at increasing concurrency.
+
+By default runs offline against an in-process server: a hashing embedding
+replaces OpenAI embeddings and a fake chat model sleeps to mimic GPT-4, so
+the numbers show how well the service overlaps LLM waits. Pass --url to
+load an already running server instead.
+"""
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+from typing import List
+import argparse
+import asyncio
+import importlib
+import logging
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+
+import httpx
+import uvicorn
+
+from fakes import HashingEmbeddings, SlowFakeChatModel
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+async def post_streaming(client: httpx.AsyncClient, url: str, body: dict, start: float):
+    """POST to the SSE endpoint; returns (finished cleanly, ms to the first token event or None)"""
+    ttft = None
+    async with client.stream("POST", f"{url}/chat/stream", json=body) as response:
+        if response.status_code != 200:
+            return False, ttft
+        async for line in response.aiter_lines():
+            event = line[len("event:"):].strip() if line.startswith("event:") else None
+            if event == "token" and ttft is None:
+                ttft = (time.perf_counter() - start) * 1000
+            elif event in ("done", "refusal"):
+                return True, ttft
+    return False, ttft
+
+async def run_level(url: str, concurrency: int, requests: int, stream: bool = False):
+    latencies, ttfts, errors = [], [], 0
+    queue = asyncio.Queue()
+    for i in range(requests):
+        session_id = str(uuid.uuid4())
+        queue.put_nowait({"session_id": session_id, "question": f"How should I invest for goal {session_id}?"})
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors
+        while not queue.empty():
+            body = queue.get_nowait()
+            start = time.perf_counter()
+            if stream:
+                ok, ttft = await post_streaming(client, url, body, start)
+                if ttft is not None:
+                    ttfts.append(ttft)
+            else:
+                ok = (await client.post(f"{url}/chat", json=body)).status_code == 200
+            if ok:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=300) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return latencies, ttfts, errors, elapsed
+
+def start_local_server(path: str, llm_latency: float, max_inflight: int, port: int):
+    assistant_module = importlib.import_module("try")
+    server_module = importlib.import_module("server")
+
+    def factory(http_client, http_async_client):
+        embeddings = HashingEmbeddings()
+        assistant = assistant_module.FinancialAssistant(
+            db=FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True),
+            llm=SlowFakeChatModel(responses=["Synthetic answer."], latency=llm_latency),
+            safety_llm=SlowFakeChatModel(responses=["compliant"], latency=llm_latency / 4),
+            max_inflight=max_inflight
+        )
+        # Synthetic questions are near-duplicates under the hashing embedding; measure the LLM path
+        assistant.answer_cache.threshold = float("inf")
+        return assistant
+
+    config = uvicorn.Config(server_module.create_app(factory), port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", help="load an existing server instead of starting one")
+    parser.add_argument("--levels", default="1,4,16,64", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=64, help="requests per level")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--max-inflight", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stream", action="store_true", help="use the SSE endpoint and report time to first token")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as path:
+        url = args.url
+        if url is None:
+            docs = [Document(page_content=f"Investment background text {i}.") for i in range(50)]
+            FAISS.from_documents(docs, HashingEmbeddings()).save_local(path)
+            start_local_server(path, args.llm_latency, args.max_inflight, args.port)
+            url = f"http://127.0.0.1:{args.port}"
+
+        for concurrency in [int(level) for level in args.levels.split(",")]:
+            latencies, ttfts, errors, elapsed = asyncio.run(
+                run_level(url, concurrency, max(args.requests, concurrency), args.stream))
+            if not latencies:
+                print(f"concurrency={concurrency:<3} all {errors} requests failed")
+                continue
+            print(f"concurrency={concurrency:<3} throughput={len(latencies) / elapsed:7.2f} req/s  "
+                  f"p50={statistics.median(latencies):8.1f} ms  p95={percentile(latencies, 95):8.1f} ms  "
+                  f"errors={errors}" + (f"  ttft p50={statistics.median(ttfts):7.1f} ms" if ttfts else ""))
+
+if __name__ == "__main__":
+    main()
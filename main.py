@@ -1,12 +1,20 @@
 from langchain.document_loaders import PyPDFLoader, DirectoryLoader
 from langchain.prompts import PromptTemplate
-from langchain_openai import OpenAIEmbeddings
-from langchain.vectorstores import FAISS
-from langchain_openai import ChatOpenAI
 from langchain.chains import RetrievalQA
+from langchain_core.prompts import format_document
+from typing import Iterator
 import os
 from dotenv import load_dotenv
 load_dotenv()
+
+from context_packer import CONTEXT_CANDIDATES, ContextPacker, PackedRetriever
+from embedding_cache import get_embeddings
+from hybrid import make_retriever
+from index_store import load_bm25, load_store
+from news_cache import prompt_version
+from registry import get_chat_model
+from semantic_cache import SemanticCache
+
 # Set up OpenAI API key
 # os.environ["OPENAI_API_KEY"] = "your-openai-api-key"  
 
@@ -33,11 +41,13 @@ def set_custom_prompt():
     return prompt
 
 # Retrieval QA Chain
-def retrieval_qa_chain(llm, prompt, db):
+def retrieval_qa_chain(llm, prompt, db, retriever=None):
+    # Candidates are packed into a fixed token budget instead of stuffing k=2 chunks of any size
+    retriever = retriever or db.as_retriever(search_kwargs={'k': CONTEXT_CANDIDATES})
     qa_chain = RetrievalQA.from_chain_type(
         llm=llm,
         chain_type='stuff',
-        retriever=db.as_retriever(search_kwargs={'k': 2}),
+        retriever=PackedRetriever(retriever=retriever, packer=ContextPacker()),
         return_source_documents=True,
         chain_type_kwargs={'prompt': prompt}
     )
@@ -45,34 +55,113 @@ def retrieval_qa_chain(llm, prompt, db):
 
 # Loading OpenAI model
 def load_llm():
-    llm = ChatOpenAI(model_name="gpt-4", temperature=0.5)
+    llm = get_chat_model("gpt-4", temperature=0.5)
     return llm
 
 # QA Model Function
-def qa_bot():
-    embeddings = OpenAIEmbeddings(model='text-embedding-3-large')
-    db = FAISS.load_local(DB_FAISS_PATH, embeddings, allow_dangerous_deserialization=True)
-    llm = load_llm()
+def qa_bot(embeddings=None, llm=None, db_path=DB_FAISS_PATH):
+    embeddings = embeddings or get_embeddings()
+    db = load_store(db_path, embeddings)
+    llm = llm or load_llm()
     qa_prompt = set_custom_prompt()
-    qa = retrieval_qa_chain(llm, qa_prompt, db)
+    retriever = make_retriever(db, load_bm25(db_path), k=CONTEXT_CANDIDATES)
+    qa = retrieval_qa_chain(llm, qa_prompt, db, retriever)
     return qa
 
+class QAEngine:
+    """
+    Long-lived QA engine: loads the FAISS index, embeddings and LLM once
+    and reuses the compiled RetrievalQA chain for every question.
+    Answers are kept in a semantic cache so paraphrased questions skip the LLM.
+    """
+    def __init__(self, embeddings=None, llm=None, db_path=DB_FAISS_PATH, warm_start=True, cache=True):
+        embeddings = embeddings or get_embeddings()
+        self.qa = qa_bot(embeddings=embeddings, llm=llm, db_path=db_path)
+        self.cache = SemanticCache(embeddings) if cache else None
+        # Answers are only shared between engines on the same store, prompt and model
+        llm = self.qa.combine_documents_chain.llm_chain.llm
+        self.cache_scope = (os.path.abspath(db_path), prompt_version(
+            custom_prompt_template, getattr(llm, "model_name", type(llm).__name__)
+        ))
+        if warm_start:
+            self.warm_up()
+
+    def warm_up(self):
+        """Touch the retriever once so the first real query doesn't pay for it"""
+        self.qa.retriever.invoke("warm up")
+
+    def answer(self, query: str) -> dict:
+        if self.cache is not None:
+            cached = self.cache.lookup(query, self.cache_scope)
+            if cached is not None:
+                return {**cached, "query": query}
+        result = self.qa.invoke({"query": query})
+        if self.cache is not None:
+            self.cache.store(query, result, self.cache_scope)
+        return result
+
+    def stream(self, query: str) -> Iterator[str]:
+        """
+        answer() as a stream of text chunks. Runs the same retriever, prompt
+        and LLM as the RetrievalQA chain, but streams the LLM so the first
+        words arrive without waiting for the whole completion.
+        """
+        if self.cache is not None:
+            cached = self.cache.lookup(query, self.cache_scope)
+            if cached is not None:
+                yield cached["result"]
+                return
+        docs = self.qa.retriever.invoke(query)
+        stuff_chain = self.qa.combine_documents_chain
+        context = stuff_chain.document_separator.join(
+            format_document(doc, stuff_chain.document_prompt) for doc in docs
+        )
+        llm_chain = stuff_chain.llm_chain
+        parts = []
+        for chunk in (llm_chain.prompt | llm_chain.llm).stream({"context": context, "question": query}):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield chunk.content
+        if self.cache is not None:
+            self.cache.store(query, {"query": query, "result": "".join(parts), "source_documents": docs},
+                             self.cache_scope)
+
+    def answer_many(self, queries: list) -> list:
+        results = [self.cache.lookup(query, self.cache_scope) if self.cache is not None else None
+                   for query in queries]
+        misses = [i for i, result in enumerate(results) if result is None]
+        fresh = self.qa.batch([{"query": queries[i]} for i in misses]) if misses else []
+        for i, result in zip(misses, fresh):
+            results[i] = result
+            if self.cache is not None:
+                self.cache.store(queries[i], result, self.cache_scope)
+        return [{**result, "query": query} for query, result in zip(queries, results)]
+
+_engine = None
+
+def get_engine() -> QAEngine:
+    global _engine
+    if _engine is None:
+        _engine = QAEngine()
+    return _engine
+
 # Output function
 def final_result(query):
-    qa_result = qa_bot()
-    print("Required input keys:", qa_result.input_keys)
-    response = qa_result.invoke({
-        
-        "query": query
-    })
-    return response
+    return get_engine().answer(query)
+
+def stream_result(query):
+    return get_engine().stream(query)
 
 if __name__ == "__main__":
     print("Welcome to the CLI-based QA Bot! Type 'exit' to quit.")
+    engine = get_engine()
+    print("Required input keys:", engine.qa.input_keys)
     while True:
         user_input = input("You: ")
         if user_input.lower() == 'exit':
             print("Goodbye!")
             break
-        result = final_result(user_input)
-        print("Bot:", result["result"])
+        print("Bot: ", end="", flush=True)
+        for chunk in engine.stream(user_input):
+            print(chunk, end="", flush=True)
+        print()
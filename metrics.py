@@ -0,0 +1,41 @@
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict
+import threading
+import time
+
+import numpy as np
+
+class LatencyRecorder:
+    """Per-stage latencies in milliseconds over a rolling window, summarised as count/p50/p95/max"""
+    def __init__(self, window: int = 1000):
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, ms: float):
+        with self._lock:
+            self._samples[stage].append(ms)
+            self._counts[stage] += 1
+
+    @contextmanager
+    def time(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - start) * 1000)
+
+    def summary(self) -> Dict[str, Dict]:
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self._samples.items()}
+            counts = dict(self._counts)
+        return {
+            stage: {
+                "count": counts[stage],
+                "p50_ms": float(np.percentile(values, 50)),
+                "p95_ms": float(np.percentile(values, 95)),
+                "max_ms": float(max(values)),
+            }
+            for stage, values in samples.items() if values
+        }
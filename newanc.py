@@ -1,20 +1,20 @@
 from langchain.prompts import PromptTemplate
-from langchain.schema.runnable import RunnablePassthrough
-from langchain_openai import ChatOpenAI
-from gtts import gTTS
 import os
-from typing import List, Dict
+from typing import List, Dict, Optional
 import asyncio
 from dotenv import load_dotenv
-import feedparser
-import httpx
-from readability import Document
 import subprocess
 import random
 import time
 
 load_dotenv()
 
+from news_audio import AudioCache, CachedTTSBackend, GTTSBackend, SegmentedSpeaker, discard_output
+from news_batch import BATCH_PROMPT, NEWS_SUMMARY_MODE, PackedSummarizer
+from news_cache import NewsCache, content_hash, fetch_article, prompt_version
+from news_fetch import ArticleFetcher, Extractor, FeedReader, TokenBucket
+from registry import get_chat_model
+
 # Configuration for Indian financial markets
 INDIAN_NEWS_RSS = [
     "https://www.moneycontrol.com/rss/business.xml",
@@ -31,15 +31,52 @@ HEADERS = {
     "Accept-Language": "en-IN,en-GB;q=0.9,en-US;q=0.8,en;q=0.7",
     "Referer": "https://www.google.co.in/"
 }
+BATCH_INSTRUCTIONS = """Analyze these Indian market news articles for retail investors.
+Give each article a 1-sentence summary focusing on:
+- Market impact (Nifty/Sensex)
+- Key sector/company
+- Investor action"""
 
 class IndiaMarketAnchor:
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            model="gpt-4",
+    def __init__(self, llm=None, fetcher: ArticleFetcher = None, cache: NewsCache = None,
+                 summary_mode: str = NEWS_SUMMARY_MODE, audio_cache: AudioCache = None):
+        self.llm = llm or get_chat_model(
+            "gpt-4",
             temperature=0.2,
             openai_api_key=os.getenv("OPENAI_API_KEY")
         )
         self.summary_prompt = self._create_indian_prompt()
+        self.summary_chain = self.summary_prompt | self.llm
+        self.fetcher = fetcher
+        self.feeds = None
+        self.cache = cache if cache is not None else NewsCache()
+        model_name = getattr(self.llm, "model_name", type(self.llm).__name__)
+        self.prompt_version = prompt_version(self.summary_prompt.template, model_name)
+        # Packed answers come from a different prompt, so they are cached under their own version
+        self.packed_prompt_version = prompt_version(BATCH_PROMPT.template + BATCH_INSTRUCTIONS, model_name)
+        # Paces LLM calls so a burst of articles stays under the provider's rate limit
+        self.llm_bucket = TokenBucket()
+        # Readability + lxml plain text in a process pool, off the event loop
+        self.extractor = Extractor()
+        # "concurrent": one request per article in parallel; "packed": several articles per request
+        self.summary_mode = summary_mode
+        self.packer = PackedSummarizer(self.llm, BATCH_INSTRUCTIONS, self.llm_bucket)
+        # Repeated headlines and the fixed sign-off are read from the audio cache, not re-synthesised
+        self.speaker = SegmentedSpeaker(CachedTTSBackend(GTTSBackend(lang='en', tld='co.in', lang_check=False), audio_cache))
+    
+    def _get_fetcher(self) -> ArticleFetcher:
+        if self.fetcher is None:
+            self.fetcher = ArticleFetcher(headers=HEADERS, timeout=30)
+        return self.fetcher
+    
+    def _get_feeds(self) -> FeedReader:
+        if self.feeds is None:
+            self.feeds = FeedReader(self._get_fetcher())
+        return self.feeds
+    
+    async def aclose(self):
+        if self.fetcher is not None:
+            await self.fetcher.aclose()
     
     def _create_indian_prompt(self) -> PromptTemplate:
         return PromptTemplate.from_template(
@@ -71,76 +108,116 @@ class IndiaMarketAnchor:
     async def fetch_news(self) -> List[Dict]:
         """Fetch and validate news from Indian sources"""
         articles = []
-        for rss_url in INDIAN_NEWS_RSS:
-            try:
-                print(f"Fetching {rss_url}...")
-                feed = feedparser.parse(rss_url)
-                print(f"Found {len(feed.entries)} entries")
-                
-                for entry in feed.entries[:3]:  # Get top 3 entries
-                    if not hasattr(entry, 'link') or not hasattr(entry, 'title'):
-                        continue
-                    articles.append({
-                        "title": entry.title,
-                        "link": entry.link,
-                        "source": self._get_source(rss_url),
-                        "timestamp": time.time()
-                    })
-            except Exception as e:
-                print(f"RSS Error {rss_url}: {str(e)}")
-        return sorted(articles, key=lambda x: x["timestamp"])[:5]
+        print(f"Fetching {len(INDIAN_NEWS_RSS)} feeds...")
+        # All feeds at once; unchanged feeds come back as 304 with cached entries
+        feeds = await self._get_feeds().fetch_all(INDIAN_NEWS_RSS)
+        for rss_url, entries in feeds.items():
+            if isinstance(entries, Exception):
+                print(f"RSS Error {rss_url}: {str(entries)}")
+                continue
+            print(f"Found {len(entries)} entries in {rss_url}")
+            
+            for entry in entries[:3]:  # Get top 3 entries
+                if not entry.get('link') or not entry.get('title'):
+                    continue
+                articles.append({
+                    "title": entry["title"],
+                    "link": entry["link"],
+                    "source": self._get_source(rss_url),
+                    # Publication time from the feed; fetch time only when the feed omits it
+                    "timestamp": entry.get("published_ts") or time.time()
+                })
+        return sorted(articles, key=lambda x: x["timestamp"], reverse=True)[:5]
 
     async def fetch_article_content(self, url: str) -> str:
         """Fetch content with Indian website compatibility"""
-        headers = {**HEADERS, "User-Agent": random.choice(USER_AGENTS)}
-        
-        async with httpx.AsyncClient(
-            timeout=30,
-            headers=headers,
-            follow_redirects=True,
-            http2=True
-        ) as client:
-            try:
-                response = await client.get(url)
-                if response.status_code != 200:
-                    return f"http_error_{response.status_code}"
-                
-                doc = Document(response.text)
-                content = doc.summary()
-                return content if 100 < len(content) < 10000 else "content_unavailable"
-                
-            except Exception as e:
-                print(f"Fetch Error {url}: {str(e)}")
-                return "error"
+        try:
+            status, content = await fetch_article(
+                self._get_fetcher(), self.cache, url, self.extractor,
+                headers={"User-Agent": random.choice(USER_AGENTS)}
+            )
+            if content is None:
+                return f"http_error_{status}"
+            
+            return content if 100 < len(content) < 10000 else "content_unavailable"
+            
+        except Exception as e:
+            print(f"Fetch Error {url}: {str(e)}")
+            return "error"
 
-    async def analyze_articles(self, articles: List[Dict]) -> List[str]:
-        """Generate market analysis with error handling"""
-        chain = (
-            {"title": RunnablePassthrough(), "content": RunnablePassthrough()}
-            | self.summary_prompt
-            | self.llm
+    async def _article_text(self, article: Dict) -> Optional[str]:
+        """Article text for the prompt, or None when only a title-based summary is possible"""
+        content = await self.fetch_article_content(article["link"])
+        if any(err in content for err in ["error", "http_error", "unavailable"]):
+            return None
+        return content[:2000]  # Conservative limit
+
+    async def _llm_summary(self, title: str, content: str) -> str:
+        await self.llm_bucket.acquire()
+        result = await self.summary_chain.ainvoke({
+            "title": title,
+            "content": content
+        })
+        return result.content.strip()
+
+    async def _single_summary(self, title: str, content: str) -> str:
+        """Single-article prompt, cached under its own prompt version"""
+        key = content_hash(self.prompt_version, title, content)
+        summary = self.cache.get_summary(key)
+        if summary is None:
+            summary = await self._llm_summary(title, content)
+            self.cache.put_summary(key, summary)
+        return summary
+
+    async def _analyze_article(self, article: Dict) -> str:
+        try:
+            content = await self._article_text(article)
+            if content is None:
+                return self._title_based_summary(article)
+            
+            summary = await self._single_summary(article["title"], content)
+            return f"{article['source']}: {summary}"
+            
+        except Exception as e:
+            print(f"Analysis Error: {str(e)}")
+            return self._title_based_summary(article)
+
+    async def _analyze_packed(self, articles: List[Dict]) -> List[str]:
+        """Cached analyses as usual; the misses share as few LLM requests as the token budget allows"""
+        contents = await asyncio.gather(*(self._article_text(article) for article in articles))
+        analyses, keys, missing = [None] * len(articles), {}, []
+        for i, (article, content) in enumerate(zip(articles, contents)):
+            if content is None:
+                analyses[i] = self._title_based_summary(article)
+                continue
+            keys[i] = content_hash(self.packed_prompt_version, article["title"], content)
+            # Articles an earlier packed answer missed were summarised, and cached, with the single-article prompt
+            summary = self.cache.get_summary(keys[i]) or \
+                self.cache.get_summary(content_hash(self.prompt_version, article["title"], content))
+            if summary is None:
+                missing.append(i)
+            else:
+                analyses[i] = f"{article['source']}: {summary}"
+        fresh, single = await self.packer.summarize(
+            [(articles[i]["title"], contents[i]) for i in missing], self._single_summary
         )
-        
-        analyses = []
-        for article in articles:
-            try:
-                content = await self.fetch_article_content(article["link"])
-                if any(err in content for err in ["error", "http_error", "unavailable"]):
-                    analyses.append(self._title_based_summary(article))
-                    continue
-                
-                result = await chain.ainvoke({
-                    "title": article["title"],
-                    "content": content[:2000]  # Conservative limit
-                })
-                analyses.append(f"{article['source']}: {result.content.strip()}")
-                await asyncio.sleep(random.uniform(1, 3))
-                
-            except Exception as e:
-                print(f"Analysis Error: {str(e)}")
-                analyses.append(self._title_based_summary(article))
-        
-        return analyses or ["No market updates available"]
+        for j, (i, summary) in enumerate(zip(missing, fresh)):
+            if isinstance(summary, Exception):
+                print(f"Analysis Error: {str(summary)}")
+                analyses[i] = self._title_based_summary(articles[i])
+            else:
+                if j not in single:  # single-prompt summaries were cached under their own version
+                    self.cache.put_summary(keys[i], summary)
+                analyses[i] = f"{articles[i]['source']}: {summary}"
+        return analyses
+
+    async def analyze_articles(self, articles: List[Dict]) -> List[str]:
+        """Generate market analysis with error handling; articles are fetched and analyzed concurrently"""
+        if self.summary_mode == "packed":
+            analyses = await self._analyze_packed(articles)
+        else:
+            analyses = await asyncio.gather(*(self._analyze_article(article) for article in articles))
+        return list(analyses) or ["No market updates available"]
 
     def _title_based_summary(self, article: Dict) -> str:
         """Generate fallback summary from title"""
@@ -157,20 +234,15 @@ class IndiaMarketAnchor:
     def text_to_speech(self, text: str) -> str:
         """Convert to Indian-accent audio"""
         try:
-            tts = gTTS(
-                text=text,
-                lang='en',
-                tld='co.in',
-                slow=False,
-                lang_check=False
-            )
-            audio_file = "indian_market.mp3"
-            tts.save(audio_file)
-            return audio_file
+            return self.speaker.save(text, "indian_market")
         except Exception as e:
             print(f"TTS Error: {str(e)}")
             return None
 
+    async def speak(self, text: str) -> dict:
+        """Per-headline TTS piped into one player, so playback starts on the first headline"""
+        return await self.speaker.speak(text)
+
     def play_audio(self, filename: str):
         """Robust audio playback"""
         if not os.path.exists(filename):
@@ -191,6 +263,8 @@ class IndiaMarketAnchor:
                 )
             except Exception as e:
                 print(f"Playback Failed: {str(e)}")
+        finally:
+            discard_output(filename)  # text_to_speech files are one-shot
 
 async def main():
     anchor = IndiaMarketAnchor()
@@ -201,17 +275,18 @@ async def main():
     
     print("🔍 Analyzing for investor impact...")
     analyses = await anchor.analyze_articles(articles)
+    await anchor.aclose()
+    print(f"🗃️ Cache: {anchor.cache.stats()}")
+    print(f"🧹 Extraction: {anchor.extractor.stats()}")
     
     broadcast = anchor.generate_broadcast(analyses)
     print("\n🇮🇳 Indian Market Briefing:")
     print(broadcast)
     
-    print("\n🔊 Generating audio update...")
-    if audio_file := anchor.text_to_speech(broadcast):
-        print("▶️ Playing market update...")
-        anchor.play_audio(audio_file)
-        os.remove(audio_file)
-        print("✅ Playback completed")
+    print("\n🔊 Playing market update...")
+    timings = await anchor.speak(broadcast)
+    if timings["first_audio"] is not None:
+        print(f"✅ Playback completed (first audio after {timings['first_audio']:.1f} s)")
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,234 @@
+"""
+Segmented text-to-speech for the news anchors. The broadcast is split into
+one segment per headline. Segments are synthesised concurrently, at most
+TTS_CONCURRENCY at a time, and written in order to the stdin of a single
+player process as soon as each one is ready. The listener hears the first
+headline after one segment's synthesis time, however long the briefing
+is.
+
+MP3 streams can be concatenated frame by frame, so the player sees one
+continuous stream. Set TTS_PLAYER to override the player command; it
+must read audio from stdin.
+
+Rendered segments are cached on disk by a hash of the text and voice
+settings. Repeated headlines and fixed strings like the sign-off cost no
+TTS request, and a cached briefing is just its segments joined byte for
+byte.
+"""
+from typing import Dict, List, Optional
+import asyncio
+import io
+import os
+import shlex
+import shutil
+import tempfile
+import threading
+import time
+
+from gtts import gTTS
+
+from news_cache import content_hash
+
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", 4))
+AUDIO_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "cache/audio")
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+AUDIO_OUTPUT_DIR = os.getenv("TTS_OUTPUT_DIR", tempfile.gettempdir())
+PLAYERS = [
+    ["mpv", "--really-quiet", "--no-terminal", "-"],
+    ["ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet", "-i", "-"],
+]
+
+def split_segments(text: str) -> List[str]:
+    """One segment per headline (non-empty line)"""
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+def find_player() -> Optional[List[str]]:
+    if os.getenv("TTS_PLAYER"):
+        return shlex.split(os.environ["TTS_PLAYER"])
+    for command in PLAYERS:
+        if shutil.which(command[0]):
+            return command
+    return None
+
+class GTTSBackend:
+    """Blocking gTTS call returning MP3 bytes"""
+    def __init__(self, lang: str = "en", tld: str = "com", slow: bool = False, lang_check: bool = True):
+        self.lang = lang
+        self.tld = tld
+        self.slow = slow
+        self.lang_check = lang_check
+        self.voice_key = f"gtts|{lang}|{tld}|{slow}"
+
+    def synthesize(self, text: str) -> bytes:
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=self.lang, tld=self.tld, slow=self.slow, lang_check=self.lang_check).write_to_fp(buffer)
+        return buffer.getvalue()
+
+def output_path(prefix: str) -> str:
+    """Fresh .mp3 path per run in AUDIO_OUTPUT_DIR, so concurrent runs do not overwrite each other's audio"""
+    fd, path = tempfile.mkstemp(prefix=f"{prefix}-", suffix=".mp3", dir=AUDIO_OUTPUT_DIR)
+    os.close(fd)
+    return path
+
+def discard_output(path: str):
+    """Delete a file made by output_path once it has been played; other paths are left alone"""
+    if os.path.dirname(os.path.abspath(path)) == os.path.abspath(AUDIO_OUTPUT_DIR):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+class AudioCache:
+    """
+    MP3 segments on disk, one file per key. A hit refreshes the file's
+    mtime, and once the directory exceeds max_bytes the least recently
+    used files are deleted. Writes go through a temp file and os.replace,
+    so processes sharing the directory never see a partial segment.
+    """
+    def __init__(self, path: str = AUDIO_CACHE_DIR, max_bytes: int = AUDIO_CACHE_MAX_BYTES):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._bytes = sum(entry.stat().st_size for entry in os.scandir(path) if entry.name.endswith(".mp3"))
+        self.counts = {"hits": 0, "misses": 0, "evicted": 0}
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.mp3")
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._file(key), "rb") as f:
+                audio = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.counts["misses"] += 1
+            return None
+        try:
+            os.utime(self._file(key))
+        except FileNotFoundError:
+            pass  # evicted since the read; the bytes are still good
+        with self._lock:
+            self.counts["hits"] += 1
+        return audio
+
+    def put(self, key: str, audio: bytes):
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(audio)
+        with self._lock:
+            # Replacing a segment (two misses racing on one key) must not count its old size twice
+            try:
+                self._bytes -= os.stat(self._file(key)).st_size
+            except FileNotFoundError:
+                pass
+            os.replace(tmp, self._file(key))
+            self._bytes += len(audio)
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Delete least recently used segments until the directory fits in max_bytes; call with the lock held"""
+        entries = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                         for entry in os.scandir(self.path) if entry.name.endswith(".mp3"))
+        self._bytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._bytes -= size
+            self.counts["evicted"] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self.counts, bytes=self._bytes)
+        lookups = counts["hits"] + counts["misses"]
+        counts["hit_rate"] = counts["hits"] / lookups if lookups else 0.0
+        return counts
+
+class CachedTTSBackend:
+    """Wraps a TTS backend; segments are keyed by text and the backend's voice settings"""
+    def __init__(self, backend, cache: Optional[AudioCache] = None):
+        self.backend = backend
+        self.cache = cache if cache is not None else AudioCache()
+
+    def synthesize(self, text: str) -> bytes:
+        key = content_hash(getattr(self.backend, "voice_key", type(self.backend).__name__), text)
+        audio = self.cache.get(key)
+        if audio is None:
+            audio = self.backend.synthesize(text)
+            self.cache.put(key, audio)
+        return audio
+
+class SegmentedSpeaker:
+    def __init__(self, backend, concurrency: int = TTS_CONCURRENCY, player: Optional[List[str]] = None):
+        self.backend = backend
+        self.concurrency = concurrency
+        self.player = player
+
+    def _render(self, segments: List[str]) -> List[asyncio.Task]:
+        """One task per segment, started now; the semaphore admits them in order"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def render(segment: str) -> Optional[bytes]:
+            async with semaphore:
+                try:
+                    return await asyncio.to_thread(self.backend.synthesize, segment)
+                except Exception as e:
+                    print(f"TTS error on segment {segment[:40]!r}: {e}")
+                    return None
+
+        return [asyncio.create_task(render(segment)) for segment in segments]
+
+    async def synthesize(self, text: str) -> bytes:
+        """The whole broadcast as one MP3: segments rendered concurrently (or read from cache) and joined"""
+        audio = await asyncio.gather(*self._render(split_segments(text)))
+        return b"".join(segment for segment in audio if segment)
+
+    def save(self, text: str, prefix: str) -> str:
+        """Blocking: the whole broadcast written to a fresh .mp3 path, segment by segment"""
+        path = output_path(prefix)
+        with open(path, "wb") as f:
+            for segment in split_segments(text):
+                f.write(self.backend.synthesize(segment))
+        return path
+
+    async def speak(self, text: str) -> Dict:
+        """Play text while it is still being synthesised; returns timings in seconds"""
+        start = time.perf_counter()
+        timings = {"segments": 0, "first_audio": None, "total": None}
+        command = self.player or find_player()
+        if command is None:
+            print("No audio player found (install mpv or ffplay, or set TTS_PLAYER)")
+            return timings
+
+        tasks = self._render(split_segments(text))
+        process = await asyncio.create_subprocess_exec(
+            *command, stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+        )
+        try:
+            for task in tasks:
+                audio = await task
+                if not audio:
+                    continue
+                process.stdin.write(audio)
+                await process.stdin.drain()
+                timings["segments"] += 1
+                if timings["first_audio"] is None:
+                    timings["first_audio"] = time.perf_counter() - start
+            process.stdin.close()
+            await process.wait()
+        except (BrokenPipeError, ConnectionResetError):
+            print("Audio player exited early")
+        finally:
+            for task in tasks:
+                task.cancel()
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+        timings["total"] = time.perf_counter() - start
+        return timings
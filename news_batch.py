@@ -0,0 +1,122 @@
+"""
+Packed summarisation for the news anchors: several articles go into one LLM
+request, and the model answers with a JSON array holding one summary per
+article. The default "concurrent" mode sends one request per article in
+parallel. It has the lowest wall-clock time but the most calls. "packed"
+makes a briefing cost one or two calls, each somewhat slower because the
+model writes all the summaries in one answer. bench_batch.py measures
+both.
+
+Articles are packed in order until the tiktoken count of the next one
+would exceed NEWS_BATCH_TOKENS. An article missing from the answer, or
+any article in an answer that is not valid JSON, is summarised on its
+own with the anchor's single-article prompt.
+"""
+from typing import Awaitable, Callable, Dict, List, Set, Tuple
+import asyncio
+import json
+import os
+
+from langchain.prompts import PromptTemplate
+
+from tokens import count_tokens, count_tokens_batch
+
+NEWS_SUMMARY_MODE = os.getenv("NEWS_SUMMARY_MODE", "concurrent")  # or "packed"
+BATCH_TOKEN_BUDGET = int(os.getenv("NEWS_BATCH_TOKENS", 5000))
+BATCH_MAX_ARTICLES = int(os.getenv("NEWS_BATCH_MAX_ARTICLES", 6))
+
+BATCH_PROMPT = PromptTemplate.from_template(
+    """{instructions}
+
+Apply these instructions to each article below separately.
+
+{articles}
+
+Answer with only a JSON array holding one object per article, in the form
+[{{"id": <article id>, "summary": "<summary>"}}]"""
+)
+
+ARTICLE_BLOCK = '<article id="{id}">\nTitle: {title}\nContent: {content}\n</article>'
+
+def format_article(article_id: int, title: str, content: str) -> str:
+    return ARTICLE_BLOCK.format(id=article_id, title=title, content=content)
+
+def pack_batches(blocks: List[str], budget: int = BATCH_TOKEN_BUDGET, max_articles: int = BATCH_MAX_ARTICLES,
+                 model: str = "gpt-4") -> List[List[int]]:
+    """Indices of blocks per request, in order, each request within budget tokens; an oversized block goes alone"""
+    batches, current, used = [], [], 0
+    for i, size in enumerate(count_tokens_batch(blocks, model)):
+        if current and (used + size > budget or len(current) >= max_articles):
+            batches.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += size
+    if current:
+        batches.append(current)
+    return batches
+
+def parse_summaries(text: str) -> Dict[int, str]:
+    """id -> summary from the model's answer; anything that does not parse is left out"""
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end < start:
+        return {}
+    try:
+        items = json.loads(text[start:end + 1])
+    except ValueError:
+        return {}
+    summaries = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict) or not isinstance(item.get("summary"), str) or not item["summary"].strip():
+            continue
+        try:
+            summaries[int(item.get("id"))] = item["summary"].strip()
+        except (TypeError, ValueError):
+            continue
+    return summaries
+
+class PackedSummarizer:
+    """Summarises (title, content) pairs in as few requests as the token budget allows"""
+    def __init__(self, llm, instructions: str, bucket, model: str = "gpt-4",
+                 budget: int = BATCH_TOKEN_BUDGET, max_articles: int = BATCH_MAX_ARTICLES):
+        self.chain = BATCH_PROMPT.partial(instructions=instructions) | llm
+        self.bucket = bucket
+        self.model = model
+        self.budget = budget - count_tokens(BATCH_PROMPT.template + instructions, model)
+        self.max_articles = max_articles
+        self.counts = {"requests": 0, "articles": 0, "fallbacks": 0}
+
+    async def _run_batch(self, blocks: List[str], batch: List[int]) -> Dict[int, str]:
+        await self.bucket.acquire()
+        self.counts["requests"] += 1
+        try:
+            result = await self.chain.ainvoke({"articles": "\n\n".join(blocks[i] for i in batch)})
+        except Exception as e:
+            print(f"Packed summary error: {e}")
+            return {}
+        return {i: summary for i, summary in parse_summaries(result.content).items() if i in batch}
+
+    async def summarize(self, items: List[Tuple[str, str]],
+                        single: Callable[[str, str], Awaitable[str]]) -> Tuple[List, Set[int]]:
+        """
+        Summary per item, in order, and the indices summarised by
+        single(title, content) because the packed answer missed them
+        (callers cache those under the single-article prompt). If single
+        raises, that item's result is the exception.
+        """
+        blocks = [format_article(i, title, content) for i, (title, content) in enumerate(items)]
+        batches = pack_batches(blocks, self.budget, self.max_articles, self.model)
+        results: List = [None] * len(items)
+        for parsed in await asyncio.gather(*(self._run_batch(blocks, batch) for batch in batches)):
+            for i, summary in parsed.items():
+                results[i] = summary
+
+        missing = [i for i, result in enumerate(results) if result is None]
+        fallbacks = await asyncio.gather(*(single(*items[i]) for i in missing), return_exceptions=True)
+        for i, result in zip(missing, fallbacks):
+            results[i] = result
+        self.counts["articles"] += len(items)
+        self.counts["fallbacks"] += len(missing)
+        return results, set(missing)
+
+    def stats(self) -> Dict:
+        return dict(self.counts)
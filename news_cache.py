@@ -0,0 +1,210 @@
+"""
+Persistent cache of extracted article text and LLM summaries for the news
+anchors.
+
+Articles are keyed by canonical URL. Within ARTICLE_TTL they are reused
+without a request; after that they are revalidated with a conditional
+GET. Summaries are keyed by a hash of the prompt version, title and
+article content, so an article is only summarised again after its text
+or the prompt changes. Both tables share a byte budget and the least
+recently used rows are evicted first.
+"""
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import hashlib
+import inspect
+import os
+import sqlite3
+import threading
+import time
+
+NEWS_CACHE_PATH = os.getenv("NEWS_CACHE_PATH", "cache/news.sqlite")
+ARTICLE_TTL_SECONDS = float(os.getenv("NEWS_ARTICLE_TTL_SECONDS", 6 * 3600))
+SUMMARY_TTL_SECONDS = float(os.getenv("NEWS_SUMMARY_TTL_SECONDS", 7 * 24 * 3600))
+NEWS_CACHE_MAX_BYTES = int(os.getenv("NEWS_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+ARTICLE_FORMAT = 3  # 1: Readability HTML, 2: plain text, 3: plain text with cell breaks; cached articles in an older format are dropped
+
+TRACKING_PREFIXES = ("utm_",)
+TRACKING_PARAMS = frozenset({"fbclid", "gclid", "ncid", "ref", "cmpid", "src", "mod"})  # exact names only
+
+def is_tracking_param(key: str) -> bool:
+    key = key.lower()
+    return key in TRACKING_PARAMS or key.startswith(TRACKING_PREFIXES)
+
+def canonical_url(url: str) -> str:
+    """Same article, same key: lowercase host, no fragment, tracking parameters or trailing slash"""
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not is_tracking_param(key)
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ""))
+
+def content_hash(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def prompt_version(template: str, model: str) -> str:
+    """Changes whenever the summary prompt or model does, invalidating old summaries"""
+    return content_hash(template, model)[:16]
+
+@dataclass
+class CachedArticle:
+    content: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched: float
+
+class NewsCache:
+    def __init__(self, path: str = NEWS_CACHE_PATH, article_ttl: float = ARTICLE_TTL_SECONDS,
+                 summary_ttl: float = SUMMARY_TTL_SECONDS, max_bytes: int = NEWS_CACHE_MAX_BYTES):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.article_ttl = article_ttl
+        self.summary_ttl = summary_ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS articles (
+                url TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS summaries (
+                key TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < ARTICLE_FORMAT:
+            self._conn.execute("DELETE FROM articles")
+            self._conn.execute(f"PRAGMA user_version = {ARTICLE_FORMAT}")
+        self._conn.commit()
+        self.counts = {"article_hits": 0, "article_revalidated": 0, "article_misses": 0,
+                       "summary_hits": 0, "summary_misses": 0}
+
+    def get_article(self, url: str) -> Optional[CachedArticle]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, etag, last_modified, fetched FROM articles WHERE url = ?", (canonical_url(url),)
+            ).fetchone()
+        return CachedArticle(*row) if row else None
+
+    def is_fresh(self, article: CachedArticle) -> bool:
+        return time.time() - article.fetched <= self.article_ttl
+
+    def put_article(self, url: str, content: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?, ?, ?)",
+                (canonical_url(url), content, etag, last_modified, now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def touch_article(self, url: str):
+        """Mark a revalidated (304) article as freshly fetched"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE articles SET fetched = ?, last_used = ? WHERE url = ?",
+                               (now, now, canonical_url(url)))
+            self._conn.commit()
+
+    def count(self, name: str):
+        """Bump a hit/miss counter; callers outside the class use this rather than self.counts"""
+        with self._lock:
+            self.counts[name] += 1
+
+    def get_summary(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT summary, created FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.summary_ttl:
+                self.counts["summary_misses"] += 1
+                return None
+            self._conn.execute("UPDATE summaries SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.counts["summary_hits"] += 1
+        return row[0]
+
+    def put_summary(self, key: str, summary: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?)", (key, summary, now, now))
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop expired summaries, then least recently used rows until the cache fits in max_bytes"""
+        self._conn.execute("DELETE FROM summaries WHERE created < ?", (time.time() - self.summary_ttl,))
+        total = self._conn.execute(
+            "SELECT (SELECT COALESCE(SUM(LENGTH(content)), 0) FROM articles) + "
+            "(SELECT COALESCE(SUM(LENGTH(summary)), 0) FROM summaries)"
+        ).fetchone()[0]
+        while total > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT 'articles', url, LENGTH(content), last_used FROM articles "
+                "UNION ALL SELECT 'summaries', key, LENGTH(summary), last_used FROM summaries "
+                "ORDER BY last_used ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            table, key, size, _ = row
+            column = "url" if table == "articles" else "key"
+            self._conn.execute(f"DELETE FROM {table} WHERE {column} = ?", (key,))
+            total -= size
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self.counts)
+        articles = counts["article_hits"] + counts["article_revalidated"] + counts["article_misses"]
+        summaries = counts["summary_hits"] + counts["summary_misses"]
+        counts["article_hit_rate"] = (counts["article_hits"] + counts["article_revalidated"]) / articles if articles else 0.0
+        counts["summary_hit_rate"] = counts["summary_hits"] / summaries if summaries else 0.0
+        return counts
+
+async def fetch_article(fetcher, cache: NewsCache, url: str,
+                        extract: Callable[[str], Union[str, Awaitable[str]]],
+                        headers: Optional[Dict[str, str]] = None) -> Tuple[int, Optional[str]]:
+    """
+    (status, extracted content) for url, served from the cache while fresh
+    and revalidated with a conditional GET once stale. Content is None
+    for error statuses, which are not cached. extract may be sync or async.
+    """
+    cached = cache.get_article(url)
+    if cached and cache.is_fresh(cached):
+        cache.count("article_hits")
+        return 200, cached.content
+
+    headers = dict(headers or {})
+    if cached and cached.etag:
+        headers["If-None-Match"] = cached.etag
+    if cached and cached.last_modified:
+        headers["If-Modified-Since"] = cached.last_modified
+    response = await fetcher.get(url, headers=headers)
+    if response.status_code == 304 and cached:
+        cache.count("article_revalidated")
+        cache.touch_article(url)
+        return 200, cached.content
+    cache.count("article_misses")
+    if response.status_code != 200:
+        return response.status_code, None
+    content = extract(response.text)
+    if inspect.isawaitable(content):
+        content = await content
+    cache.put_article(url, content, response.headers.get("etag"), response.headers.get("last-modified"))
+    return 200, content
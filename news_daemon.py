@@ -0,0 +1,221 @@
+"""
+Long-running news mode for the anchors.
+
+Polls the feeds on an interval (conditional GETs, so quiet feeds cost a
+304) and folds entries into a rolling window of stories. The same story
+from several sources is merged when any of these match:
+- the normalised titles are equal;
+- one title only adds words to the other: every word of the shorter
+  title is in the longer one, and they share at least half their words.
+  A headline that swaps a word or a number is a different story;
+- the title+description SimHash fingerprints are within a few bits, as
+  happens with syndicated wire copy.
+
+Each link is remembered from the first poll that lists it, and each
+cycle summarises and prints only stories first seen on that poll, newest
+first by publication time. Stories over the per-briefing limit are
+dropped rather than carried into later briefings. Entries without a date
+are stamped once, when first seen, so re-fetching them never makes them
+new again. The window is capped by age and count, and a link is
+forgotten once the feeds have not listed it for the window's age, so
+memory stays flat over days.
+
+    python news_daemon.py --anchor india --interval 300
+"""
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Set
+import argparse
+import asyncio
+import hashlib
+import re
+import time
+
+from news_cache import canonical_url
+
+SIMHASH_BITS = 64
+NEAR_DUPLICATE_BITS = 3  # max Hamming distance between title+description fingerprints
+MIN_SIMHASH_WORDS = 20  # shorter texts give fingerprints too noisy to compare
+TITLE_JACCARD = 0.5  # min shared share of words when one title contains the other
+MIN_TITLE_WORDS = 5
+MAX_STORIES = 2000
+MAX_AGE_SECONDS = 48 * 3600
+
+SOURCE_SUFFIX = re.compile(r"\s+[-|–]\s+[^-|–]{2,40}$")
+STOPWORDS = frozenset("a an and as at by for from in is of on or the to with after over amid its".split())
+
+def normalize_title(title: str) -> str:
+    """Lowercase words without the trailing " - Source" tag, punctuation, stopwords or plural -s"""
+    title = SOURCE_SUFFIX.sub("", title.strip())
+    words = re.findall(r"[a-z0-9]+", title.lower())
+    return " ".join(word[:-1] if len(word) > 3 and word.endswith("s") else word
+                    for word in words if word not in STOPWORDS)
+
+def simhash(text: str, bits: int = SIMHASH_BITS) -> int:
+    """SimHash over word unigrams and bigrams"""
+    words = text.split()
+    weights = [0] * bits
+    for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        value = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=bits // 8).digest(), "big")
+        for bit in range(bits):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(bits) if weights[bit] > 0)
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+@dataclass
+class Story:
+    title: str
+    link: str
+    source: str
+    published: float
+    key: str
+    words: FrozenSet[str]
+    fingerprint: Optional[int]
+    sources: Set[str] = field(default_factory=set)
+
+    def as_article(self) -> Dict:
+        return {"title": self.title, "link": self.link, "source": self.source, "timestamp": self.published}
+
+class StoryWindow:
+    """Deduplicated stories from the last max_age seconds, at most max_stories of them"""
+    def __init__(self, max_stories: int = MAX_STORIES, max_age: float = MAX_AGE_SECONDS):
+        self.max_stories = max_stories
+        self.max_age = max_age
+        self.stories: Dict[str, Story] = {}
+        self.seen: Dict[str, List[float]] = {}  # canonical link -> [first seen, last seen]
+        self.duplicates = 0  # entries merged into a story from another source
+
+    def _find_duplicate(self, key: str, words: FrozenSet[str], fingerprint: Optional[int]) -> Optional[Story]:
+        if key in self.stories:
+            return self.stories[key]
+        for story in self.stories.values():
+            if fingerprint is not None and story.fingerprint is not None \
+                    and hamming(fingerprint, story.fingerprint) <= NEAR_DUPLICATE_BITS:
+                return story
+            if min(len(words), len(story.words)) >= MIN_TITLE_WORDS \
+                    and (words <= story.words or story.words <= words) \
+                    and len(words & story.words) / len(words | story.words) >= TITLE_JACCARD:
+                return story
+        return None
+
+    def add(self, entry: Dict, source: str, now: Optional[float] = None) -> Optional[Story]:
+        """
+        Add a feed entry; returns the new Story, or None if its link was
+        seen on an earlier poll, it is too old, or it repeats a story
+        already in the window
+        """
+        now = now or time.time()
+        if not entry.get("title") or not entry.get("link"):
+            return None
+        link = canonical_url(entry["link"])
+        if link in self.seen:
+            self.seen[link][1] = now
+            return None
+        self.seen[link] = [now, now]
+        # Undated entries take the time they were first seen, once
+        published = entry.get("published_ts") or now
+        if now - published > self.max_age:
+            return None
+        key = normalize_title(entry["title"])
+        words = frozenset(key.split())
+        body = f"{key} {normalize_title(entry.get('summary', ''))}"
+        fingerprint = simhash(body) if len(body.split()) >= MIN_SIMHASH_WORDS else None
+
+        duplicate = self._find_duplicate(key, words, fingerprint)
+        if duplicate is not None:
+            if source not in duplicate.sources:
+                duplicate.sources.add(source)
+                self.duplicates += 1
+            return None
+        story = Story(entry["title"], entry["link"], source, published, key, words, fingerprint, {source})
+        self.stories[key] = story
+        return story
+
+    def prune(self, now: Optional[float] = None):
+        now = now or time.time()
+        for key in [key for key, story in self.stories.items() if now - story.published > self.max_age]:
+            del self.stories[key]
+        if len(self.stories) > self.max_stories:
+            newest = sorted(self.stories.values(), key=lambda story: -story.published)[:self.max_stories]
+            self.stories = {story.key: story for story in newest}
+        # A link stays known while any feed still lists it, however old its story
+        for link in [link for link, (_, last_seen) in self.seen.items() if now - last_seen > self.max_age]:
+            del self.seen[link]
+
+class NewsDaemon:
+    def __init__(self, anchor, feeds: Dict[str, str], summarize, window: Optional[StoryWindow] = None,
+                 interval: float = 300, max_items: int = 5):
+        self.anchor = anchor
+        self.feeds = feeds  # feed URL -> source name
+        self.summarize = summarize  # async (articles) -> summaries, e.g. anchor.analyze_articles
+        self.window = window or StoryWindow()
+        self.interval = interval
+        self.max_items = max_items
+
+    async def poll(self) -> List[Story]:
+        """The newest max_items stories first seen on this poll"""
+        results = await self.anchor._get_feeds().fetch_all(self.feeds)
+        new = []
+        for url, entries in results.items():
+            if isinstance(entries, Exception):
+                print(f"RSS Error {url}: {entries}")
+                continue
+            for entry in entries:
+                story = self.window.add(entry, self.feeds[url])
+                if story is not None:
+                    new.append(story)
+        self.window.prune()
+        return sorted(new, key=lambda story: -story.published)[:self.max_items]
+
+    async def run_once(self) -> List[str]:
+        """One cycle: poll, then brief on new stories only"""
+        stories = await self.poll()
+        if not stories:
+            return []
+        return await self.summarize([story.as_article() for story in stories])
+
+    async def run(self, cycles: Optional[int] = None):
+        cycle = 0
+        try:
+            while cycles is None or cycle < cycles:
+                start = time.monotonic()
+                summaries = await self.run_once()
+                stamp = time.strftime("%H:%M")
+                if summaries:
+                    print(f"\n[{stamp}] New since last briefing: {len(summaries)}")
+                    print("\n".join(f"- {summary}" for summary in summaries))
+                else:
+                    print(f"[{stamp}] nothing new ({len(self.window.stories)} stories tracked, "
+                          f"{self.window.duplicates} duplicates merged)")
+                cycle += 1
+                if cycles is None or cycle < cycles:
+                    await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - start)))
+        finally:
+            await self.anchor.aclose()
+
+def make_daemon(anchor_name: str, interval: float, max_items: int) -> NewsDaemon:
+    if anchor_name == "india":
+        from newanc import INDIAN_NEWS_RSS, IndiaMarketAnchor
+        anchor = IndiaMarketAnchor()
+        feeds = {url: anchor._get_source(url) for url in INDIAN_NEWS_RSS}
+        return NewsDaemon(anchor, feeds, anchor.analyze_articles, interval=interval, max_items=max_items)
+    from anchor import NEWS_RSS_URL, FinancialNewsAnchor
+    anchor = FinancialNewsAnchor()
+    return NewsDaemon(anchor, {NEWS_RSS_URL: "Yahoo Finance"}, anchor.summarize_articles,
+                      interval=interval, max_items=max_items)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--anchor", choices=["india", "global"], default="india")
+    parser.add_argument("--interval", type=float, default=300, help="seconds between polls")
+    parser.add_argument("--max-items", type=int, default=5, help="new stories per briefing")
+    parser.add_argument("--cycles", type=int, default=None, help="stop after this many polls")
+    args = parser.parse_args()
+    try:
+        asyncio.run(make_daemon(args.anchor, args.interval, args.max_items).run(args.cycles))
+    except KeyboardInterrupt:
+        print("Stopped")
+
+if __name__ == "__main__":
+    main()
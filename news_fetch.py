@@ -0,0 +1,237 @@
+"""
+HTTP plumbing shared by the news anchors: one pooled client with per-host
+concurrency limits for article pages and feeds, conditional-GET RSS
+polling, and a token bucket that paces LLM calls instead of fixed sleeps
+between them. Article extraction (Readability, then lxml to plain text)
+runs in a process pool so it never blocks the event loop.
+"""
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+import asyncio
+import calendar
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from lxml import etree, html as lxml_html
+from readability import Document
+import feedparser
+import httpx
+
+from tokens import count_tokens_batch
+
+try:
+    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+PER_HOST_LIMIT = int(os.getenv("NEWS_PER_HOST_LIMIT", 4))
+MAX_CONNECTIONS = int(os.getenv("NEWS_MAX_CONNECTIONS", 32))
+LLM_REQUESTS_PER_SECOND = float(os.getenv("NEWS_LLM_RPS", 5))
+LLM_BURST = int(os.getenv("NEWS_LLM_BURST", 15))
+EXTRACT_WORKERS = int(os.getenv("NEWS_EXTRACT_WORKERS", os.cpu_count() or 1))
+BLOCK_TAGS = {"p", "div", "section", "article", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6",
+              "blockquote", "pre", "table", "tr", "td", "th", "dl", "dt", "dd", "figcaption"}
+FEED_CACHE_PATH = os.getenv("NEWS_FEED_CACHE_PATH", "cache/feeds.sqlite")
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts of up to `capacity`"""
+    def __init__(self, rate: float = LLM_REQUESTS_PER_SECOND, capacity: float = LLM_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1.0):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+class ArticleFetcher:
+    """
+    One keep-alive connection pool (HTTP/2 when h2 is installed) for all
+    article requests, with at most per_host requests in flight per site
+    """
+    def __init__(self, headers: Optional[Dict[str, str]] = None, timeout: float = 30,
+                 per_host: int = PER_HOST_LIMIT, max_connections: int = MAX_CONNECTIONS,
+                 follow_redirects: bool = True):
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            timeout=timeout,
+            follow_redirects=follow_redirects,
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self._host_limits = defaultdict(lambda: asyncio.Semaphore(per_host))
+
+    async def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        async with self._host_limits[urlsplit(url).netloc]:
+            return await self.client.get(url, headers=headers)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self) -> "ArticleFetcher":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+def extract_content(html: str) -> str:
+    """Main article HTML via Readability"""
+    return Document(html).summary()
+
+def html_to_text(html: str) -> str:
+    """Visible text with one line per block element (or table cell) and whitespace collapsed"""
+    if not html.strip():
+        return ""
+    try:
+        root = lxml_html.fromstring(html)
+    except etree.ParserError:  # "Document is empty": only whitespace or comments
+        return ""
+    for element in list(root.iter("script", "style", "noscript")):
+        element.drop_tree()
+    for element in root.iter():
+        if element.tag in BLOCK_TAGS:
+            # Break before the block too, so text just ahead of it does not run into its first line
+            element.text = "\n" + (element.text or "")
+        if element.tag == "br" or element.tag in BLOCK_TAGS:
+            element.tail = "\n" + (element.tail or "")
+    lines = (" ".join(line.split()) for line in root.text_content().splitlines())
+    return "\n".join(line for line in lines if line)
+
+def extract_text(html: str) -> Tuple[str, int, int]:
+    """Readability article as plain text, with token counts of the Readability HTML and of the text"""
+    article = extract_content(html)
+    text = html_to_text(article)
+    html_tokens, text_tokens = count_tokens_batch([article, text])
+    return text, html_tokens, text_tokens
+
+_extract_pool: Optional[ProcessPoolExecutor] = None
+
+def get_extract_pool() -> ProcessPoolExecutor:
+    global _extract_pool
+    if _extract_pool is None:
+        _extract_pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS)
+    return _extract_pool
+
+class Extractor:
+    """Async article extraction in the shared process pool; keeps token counts before and after"""
+    def __init__(self, pool: Optional[ProcessPoolExecutor] = None):
+        self.pool = pool
+        self.articles = 0
+        self.html_tokens = 0
+        self.text_tokens = 0
+
+    async def __call__(self, html: str) -> str:
+        loop = asyncio.get_running_loop()
+        text, html_tokens, text_tokens = await loop.run_in_executor(self.pool or get_extract_pool(), extract_text, html)
+        self.articles += 1
+        self.html_tokens += html_tokens
+        self.text_tokens += text_tokens
+        return text
+
+    def stats(self) -> Dict:
+        saved = 1 - self.text_tokens / self.html_tokens if self.html_tokens else 0.0
+        return {"articles": self.articles, "html_tokens": self.html_tokens,
+                "text_tokens": self.text_tokens, "tokens_saved": round(saved, 3)}
+
+def parse_feed(content: bytes) -> List[Dict]:
+    """Feed entries as plain dicts, so they can be cached as JSON; published_ts is epoch seconds or None"""
+    feed = feedparser.parse(content)
+    return [
+        {
+            **{key: entry.get(key, "") for key in ("title", "link", "published", "summary")},
+            "published_ts": calendar.timegm(entry.published_parsed) if entry.get("published_parsed") else None,
+        }
+        for entry in feed.entries
+    ]
+
+class FeedCache:
+    """Validators (ETag / Last-Modified) and last parsed entries per feed URL, in SQLite"""
+    def __init__(self, path: str = FEED_CACHE_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS feeds (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                entries TEXT NOT NULL,
+                fetched REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, entries FROM feeds WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"etag": row[0], "last_modified": row[1], "entries": json.loads(row[2])}
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], entries: List[Dict]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO feeds VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, json.dumps(entries), time.time())
+            )
+            self._conn.commit()
+
+class FeedReader:
+    """
+    Polls RSS feeds concurrently through an ArticleFetcher. Repeat polls
+    send If-None-Match / If-Modified-Since, so an unchanged feed costs a
+    304 and returns the cached entries. Parsing runs in a worker thread,
+    off the event loop.
+    """
+    def __init__(self, fetcher: ArticleFetcher, cache: Optional[FeedCache] = None):
+        self.fetcher = fetcher
+        self.cache = cache if cache is not None else FeedCache()
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_received = 0
+
+    async def fetch(self, url: str) -> List[Dict]:
+        cached = self.cache.get(url)
+        headers = {}
+        if cached and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        response = await self.fetcher.get(url, headers=headers)
+        self.requests += 1
+        self.bytes_received += len(response.content)
+        if response.status_code == 304 and cached:
+            self.not_modified += 1
+            return cached["entries"]
+        response.raise_for_status()
+        entries = await asyncio.to_thread(parse_feed, response.content)
+        self.cache.put(url, response.headers.get("etag"), response.headers.get("last-modified"), entries)
+        return entries
+
+    async def fetch_all(self, urls: Iterable[str]) -> Dict[str, List[Dict]]:
+        """Entries per URL; a feed that fails maps to its exception instead"""
+        urls = list(urls)
+        results = await asyncio.gather(*(self.fetch(url) for url in urls), return_exceptions=True)
+        return dict(zip(urls, results))
+
+    def stats(self) -> Dict:
+        return {"requests": self.requests, "not_modified": self.not_modified, "bytes": self.bytes_received}
@@ -0,0 +1,106 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from langchain_core.documents import Document
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import itertools
+import logging
+import os
+
+from pypdf import PdfReader
+
+logger = logging.getLogger(__name__)
+
+PAGES_PER_TASK = 32
+
+ParseResult = Tuple[List[Document], Optional[str]]  # pages, error message
+
+def _page_count(path: str, failures: Optional[Dict[str, str]] = None) -> int:
+    try:
+        return len(PdfReader(path).pages)
+    except Exception as e:
+        logger.error(f"Cannot open {path}: {e}")
+        if failures is not None:
+            failures[path] = f"cannot open: {e}"
+        return 0
+
+def _parse_pypdf(path: str, start: int, stop: int) -> ParseResult:
+    """Worker: extract text for pages [start, stop) of one PDF"""
+    try:
+        reader = PdfReader(path)
+        total = len(reader.pages)
+        return [
+            Document(
+                page_content=reader.pages[i].extract_text() or "",
+                metadata={"source": path, "page": i, "total_pages": total}
+            )
+            for i in range(start, min(stop, total))
+        ], None
+    except Exception as e:
+        logger.error(f"PDF parsing failed for {path} pages {start}-{stop}: {e}")
+        return [], f"pages {start}-{stop}: {e}"
+
+def _parse_unstructured(path: str, start: int, stop: int) -> ParseResult:
+    """Worker: unstructured element-mode parsing of a whole PDF"""
+    from langchain_community.document_loaders import UnstructuredPDFLoader
+    try:
+        return UnstructuredPDFLoader(path, mode="elements").load(), None
+    except Exception as e:
+        logger.error(f"PDF parsing failed for {path}: {e}")
+        return [], str(e)
+
+PARSERS = {
+    "pypdf": _parse_pypdf,
+    "unstructured": _parse_unstructured,
+}
+
+def _tasks(paths: Iterable[str], parser: str, pages_per_task: int,
+           failures: Optional[Dict[str, str]]) -> Iterator[Tuple[str, int, int]]:
+    for path in paths:
+        if parser == "pypdf":
+            total = _page_count(path, failures)
+            for start in range(0, total, pages_per_task):
+                yield path, start, start + pages_per_task
+        else:
+            # unstructured has no cheap page-range API, so a file is one task
+            yield path, 0, 0
+
+def find_pdfs(data_path: str, glob: str = "*.pdf") -> List[str]:
+    return [str(path) for path in sorted(Path(data_path).glob(glob))]
+
+def iter_pdf_pages(paths: Iterable[str], parser: str = "pypdf", max_workers: int = None,
+                   pages_per_task: int = PAGES_PER_TASK,
+                   failures: Optional[Dict[str, str]] = None) -> Iterator[Document]:
+    """
+    Parse PDFs in a process pool and yield documents in file/page order.
+    Only about two tasks per worker are in flight at once, so memory stays
+    flat no matter how many PDFs there are.
+
+    Files that fail to open or parse, in whole or in part, are recorded in
+    `failures` (source -> error) before the next file's first page is
+    yielded, so a caller grouping pages with iter_by_source can check each
+    group against it.
+    """
+    parse = PARSERS[parser]
+    max_workers = max_workers or os.cpu_count() or 1
+    tasks = _tasks(paths, parser, pages_per_task, failures)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        pending = deque((task[0], pool.submit(parse, *task)) for task in itertools.islice(tasks, max_workers * 2))
+        while pending:
+            path, future = pending.popleft()
+            docs, error = future.result()
+            if error is not None and failures is not None:
+                failures.setdefault(path, error)
+            for task in itertools.islice(tasks, 1):
+                pending.append((task[0], pool.submit(parse, *task)))
+            yield from docs
+
+def iter_by_source(docs: Iterable[Document]) -> Iterator[Tuple[str, List[Document]]]:
+    """Group a page stream into (source, pages) per file"""
+    for source, group in itertools.groupby(docs, key=lambda doc: doc.metadata.get("source")):
+        yield source, list(group)
+
+def iter_batches(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
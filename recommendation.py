@@ -1,10 +1,15 @@
 import os
+import argparse
 import datetime
+import json
 import warnings
+from typing import Dict, List
 import google.generativeai as genai
 from dotenv import load_dotenv
 from termcolor import colored
 
+from term_calendar import TermCalendar, normalize_term
+
 # Suppress GRPC warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="grpc")
 
@@ -17,25 +22,10 @@ genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 # Initialize Gemini model
 model = genai.GenerativeModel('gemini-2.0-flash')
 
-def get_daily_term():
-    """Get today's financial term using Gemini with date-based seed"""
-    today = datetime.date.today()
-    seed = today.strftime("%Y%m%d")
-    
-    prompt = f"""Generate one random financial term suitable for daily learning. 
-    The term should be different based on this seed: {seed}.
-    Return only the term itself, nothing else."""
-    
-    try:
-        response = model.generate_content(prompt, request_options={"timeout": 10})
-        return response.text.strip()
-    except Exception as e:
-        return "Unearned Revenue"  # Fallback term
-
-def get_term_explanation(term):
-    """Get explanation and product example for the given term"""
-    prompt = f"""Explain the financial term '{term}' in simple terms with these components:
-    1. Brief definition (1-2 sentences)
+EXPLAIN_BATCH = 7  # terms per explanation request when precomputing
+AVOID_PROMPT_TERMS = 100  # nearest scheduled terms listed in the prompt; the rest are filtered locally
+DAILY_TIMEOUT = 10  # seconds per request when the daily run has to fill today itself
+EXPLANATION_FORMAT = """1. Brief definition (1-2 sentences)
     2. Common usage context
     3. Example financial product that uses this concept
     4. Simple real-world analogy
@@ -43,12 +33,9 @@ def get_term_explanation(term):
     
     Format the response with clear section headings between each component, 
     but do not use markdown formatting. Use '---' as section separators."""
-    
-    try:
-        response = model.generate_content(prompt, request_options={"timeout": 10})
-        return response.text
-    except Exception as e:
-        return f"""Brief Definition:
+
+FALLBACK_TERM = "Unearned Revenue"
+FALLBACK_EXPLANATION = """Brief Definition:
 Unearned revenue represents money received for undelivered goods/services.
 ---        
 Common Usage Context:
@@ -63,6 +50,96 @@ Like a gift certificate for future spa services
 Key Considerations:
 Check company stability before large upfront payments"""
 
+def explain_term(term, timeout=DAILY_TIMEOUT):
+    """Explanation for one term; raises on API errors"""
+    prompt = f"""Explain the financial term '{term}' in simple terms with these components:
+    {EXPLANATION_FORMAT}"""
+    response = model.generate_content(prompt, request_options={"timeout": timeout})
+    return response.text
+
+def _generate_json(prompt, timeout=60):
+    """Gemini answer parsed as JSON, tolerating a fenced code block around it"""
+    response = model.generate_content(
+        prompt,
+        generation_config={"response_mime_type": "application/json"},
+        request_options={"timeout": timeout}
+    )
+    text = response.text.strip()
+    if text.startswith("```"):
+        text = text.strip("`").split("\n", 1)[-1]
+    return json.loads(text)
+
+def generate_terms(count: int, avoid: List[str], attempts: int = 3, timeout: float = 60) -> List[str]:
+    """
+    Up to count distinct terms, none matching avoid, from one request
+    (re-asked only while short). avoid is nearest first; the prompt lists
+    only the first AVOID_PROMPT_TERMS, and answers matching any of it are
+    dropped here.
+    """
+    seen = {normalize_term(term) for term in avoid}
+    excluded, terms = list(avoid[:AVOID_PROMPT_TERMS]), []
+    for _ in range(attempts):
+        needed = count - len(terms)
+        if needed <= 0:
+            break
+        prompt = f"""Generate {needed + 5} different financial terms suitable for daily learning, from beginner
+    to intermediate, covering personal finance, investing, banking, taxation and accounting.
+    Do not use any of these terms: {json.dumps(excluded)}
+    Return only a JSON array of strings, one term per string."""
+        try:
+            candidates = _generate_json(prompt, timeout)
+        except Exception as e:
+            print(colored(f"⚠️ Term generation failed: {str(e)}", "red"))
+            continue
+        for term in candidates if isinstance(candidates, list) else []:
+            normalized = normalize_term(term) if isinstance(term, str) else ""
+            if normalized and normalized not in seen:
+                seen.add(normalized)
+                excluded.append(term.strip())
+                terms.append(term.strip())
+    return terms[:count]
+
+def generate_explanations(terms: List[str], attempts: int = 2, timeout: float = 60) -> Dict[str, str]:
+    """
+    Explanations for terms, EXPLAIN_BATCH per request; with more than one
+    attempt, a term the batch answer misses is asked on its own
+    """
+    explanations = {}
+    for i in range(0, len(terms), EXPLAIN_BATCH):
+        batch = terms[i:i + EXPLAIN_BATCH]
+        prompt = f"""Explain each financial term in this list in simple terms: {json.dumps(batch)}
+    Each explanation has these components:
+    {EXPLANATION_FORMAT}
+    Return only a JSON object mapping each term, exactly as given, to its explanation."""
+        try:
+            answer = _generate_json(prompt, timeout)
+        except Exception as e:
+            print(colored(f"⚠️ Batch explanation failed: {str(e)}", "red"))
+            answer = {}
+        for term in batch:
+            explanation = answer.get(term) if isinstance(answer, dict) else None
+            if isinstance(explanation, str) and "---" in explanation:
+                explanations[term] = explanation
+    retry = [term for term in terms if term not in explanations] if attempts > 1 else []
+    for term in retry:
+        try:
+            explanations[term] = explain_term(term, timeout)
+        except Exception as e:
+            print(colored(f"⚠️ No explanation for {term}: {str(e)}", "red"))
+    return explanations
+
+def precompute(calendar: TermCalendar, days: int, start: datetime.date = None,
+               attempts: int = 3, timeout: float = 60) -> int:
+    """Fill the empty days of the next `days` days with new, non-repeating terms; returns days scheduled"""
+    start = start or datetime.date.today()
+    missing = calendar.missing_days(start, days)
+    if not missing:
+        return 0
+    terms = generate_terms(len(missing), calendar.terms_near(missing[0], missing[-1]), attempts, timeout)
+    explanations = generate_explanations(terms, attempts, timeout)
+    explained = [term for term in terms if term in explanations]
+    return sum(calendar.put(day, term, explanations[term]) for day, term in zip(missing, explained))
+
 def display_explanation(term, explanation):
     """Format and display the explanation with colors"""
     sections = explanation.split('---')
@@ -80,10 +157,17 @@ def display_explanation(term, explanation):
         
     print(colored("\n💡 Remember: Financial literacy is a superpower!", "magenta"))
 
-def main():
+def main(calendar: TermCalendar = None):
+    calendar = calendar or TermCalendar()
+    today = datetime.date.today()
     try:
-        term = get_daily_term()
-        explanation = get_term_explanation(term)
+        # Normally a local lookup; only a day missing from the calendar reaches Gemini
+        scheduled = calendar.get(today)
+        if scheduled is None:
+            # One short-timeout try, as the old live lookup did, before the fallback term
+            precompute(calendar, 1, today, attempts=1, timeout=DAILY_TIMEOUT)
+            scheduled = calendar.get(today)
+        term, explanation = scheduled or (FALLBACK_TERM, FALLBACK_EXPLANATION)
         display_explanation(term, explanation)
     except Exception as e:
         print(colored(f"⚠️ Error: {str(e)}", "red"))
@@ -98,5 +182,14 @@ def main():
 
         
 if __name__ == "__main__":
-    print(colored("\n🔍 Your Daily Financial Education Briefing", "green", attrs=["bold"]))
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Daily financial term briefing")
+    parser.add_argument("--precompute", type=int, metavar="DAYS",
+                        help="schedule terms for the next DAYS days in a few batched requests, then exit")
+    args = parser.parse_args()
+    if args.precompute:
+        calendar = TermCalendar()
+        scheduled = precompute(calendar, args.precompute)
+        print(colored(f"📅 Scheduled {scheduled} new days; calendar: {calendar.stats()}", "green"))
+    else:
+        print(colored("\n🔍 Your Daily Financial Education Briefing", "green", attrs=["bold"]))
+        main()
\ No newline at end of file
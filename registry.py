@@ -0,0 +1,87 @@
+"""
+Process-wide registry of expensive runnables.
+
+Chat models, chains and HTTP clients are built once per key and then
+reused, so each call no longer pays for new OpenAI clients, TLS contexts
+and connections. Construction counts and times are recorded and
+reported by stats().
+"""
+from collections import Counter
+from langchain_openai import ChatOpenAI
+from typing import Any, Callable, Hashable
+import os
+import threading
+import time
+
+import httpx
+
+from metrics import LatencyRecorder
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 64))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 60))
+
+class Registry:
+    def __init__(self):
+        self._items = {}
+        self._lock = threading.RLock()
+        self.constructions = Counter()
+        self.lookups = Counter()
+        self.metrics = LatencyRecorder()
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """The object registered under key, built with factory on first use"""
+        kind = key[0] if isinstance(key, tuple) else key
+        self.lookups[kind] += 1
+        item = self._items.get(key)
+        if item is None:
+            with self._lock:
+                item = self._items.get(key)
+                if item is None:
+                    start = time.perf_counter()
+                    item = self._items[key] = factory()
+                    self.metrics.record(kind, (time.perf_counter() - start) * 1000)
+                    self.constructions[kind] += 1
+        return item
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        return {
+            "constructions": dict(self.constructions),
+            "lookups": dict(self.lookups),
+            "construction_ms": self.metrics.summary(),
+        }
+
+registry = Registry()
+
+def shared(key: Hashable, factory: Callable[[], Any]) -> Any:
+    return registry.get(key, factory)
+
+def get_http_client() -> httpx.Client:
+    limits = httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE)
+    return shared(("http_client",), lambda: httpx.Client(limits=limits, timeout=HTTP_TIMEOUT))
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Pooled async client. Its connections belong to the event loop that
+    opened them, so use it from one long-lived loop (asyncio.run once per
+    process, or the server's loop), not from repeated asyncio.run calls.
+    """
+    limits = httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE)
+    return shared(("async_http_client",), lambda: httpx.AsyncClient(limits=limits, timeout=HTTP_TIMEOUT))
+
+def get_chat_model(model: str, temperature: float = 0.7, **kwargs) -> ChatOpenAI:
+    """
+    Shared ChatOpenAI per (model, temperature, kwargs), on the pooled HTTP
+    clients unless the caller passes its own
+    """
+    key = ("chat_model", model, temperature, tuple(sorted(kwargs.items())))
+    def build():
+        clients = {"http_client": get_http_client(), "http_async_client": get_async_http_client()}
+        return ChatOpenAI(model=model, temperature=temperature, **{**clients, **kwargs})
+    return shared(key, build)
+
+def stats():
+    return registry.stats()
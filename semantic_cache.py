@@ -0,0 +1,178 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from langchain_core.embeddings import Embeddings
+from typing import Any, Dict, Hashable, Optional, Tuple
+import asyncio
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+# Cosine for text-embedding-3-large. Paraphrases with opposite meanings ("should I buy" / "should I
+# not buy") can score above 0.93, so hits also need matching negations and numbers (see compatible()).
+SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+TTL_SECONDS = 24 * 3600
+MAX_ENTRIES = 5000
+PURGE_INTERVAL = 60.0  # seconds between sweeps for expired entries
+
+# Words that make a question lean on earlier turns ("what about its risk?")
+FOLLOW_UP_WORDS = frozenset("""
+it its it's this that these those they them their above previous earlier same
+else also more another again instead
+""".split())
+
+def normalize_question(text: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower().replace("'s", " is")))
+
+NEGATIONS = frozenset("no not never without nor cannot dont doesnt isnt arent shouldnt wont avoid".split())
+
+def compatible(a: str, b: str) -> bool:
+    """Similar questions may share an answer only if they agree on negations and numbers"""
+    def key(question: str):
+        words = normalize_question(question.replace("n't", " not")).split()
+        return {word for word in words if word in NEGATIONS}, {word for word in words if word.isdigit()}
+    return key(a) == key(b)
+
+def is_follow_up(question: str) -> bool:
+    """Heuristic: does answering this question depend on chat history?"""
+    words = normalize_question(question).split()
+    return len(words) <= 2 or any(word in FOLLOW_UP_WORDS for word in words)
+
+@dataclass
+class CacheEntry:
+    question: str
+    vector: np.ndarray
+    answer: Any
+    created: float = field(default_factory=time.time)
+
+class SemanticCache:
+    """
+    Answer cache keyed by question embedding. A lookup hits when a cached
+    question in the same scope (e.g. the user-profile fields) has cosine
+    similarity above the threshold. Entries expire after ttl seconds and
+    the least recently used are evicted beyond max_entries.
+    """
+    def __init__(self, embeddings: Embeddings, threshold: float = SIMILARITY_THRESHOLD,
+                 ttl: float = TTL_SECONDS, max_entries: int = MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Hashable, str], CacheEntry]" = OrderedDict()
+        self._matrices: Dict[Hashable, Tuple[np.ndarray, list]] = {}
+        self._lock = threading.Lock()
+        self._last_purge = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    async def _aembed(self, question: str) -> np.ndarray:
+        vector = np.asarray(await self.embeddings.aembed_query(question), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _scope_matrix(self, scope: Hashable):
+        """Stacked vectors of one scope, rebuilt only after that scope changes"""
+        if scope not in self._matrices:
+            keys = [key for key in self._entries if key[0] == scope]
+            matrix = np.stack([self._entries[key].vector for key in keys]) if keys else None
+            self._matrices[scope] = (matrix, keys)
+        return self._matrices[scope]
+
+    def _drop(self, key):
+        del self._entries[key]
+        self._matrices.pop(key[0], None)
+
+    def _purge(self, now: float):
+        """Drop every expired entry; call with the lock held"""
+        self._last_purge = now
+        for key in [key for key, entry in self._entries.items() if now - entry.created > self.ttl]:
+            self._drop(key)
+
+    def _exact(self, question: str, scope: Hashable) -> Optional[Any]:
+        key = (scope, normalize_question(question))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry.created > self.ttl:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.answer
+
+    def _nearest(self, question: str, vector: np.ndarray, scope: Hashable) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            matrix, keys = self._scope_matrix(scope)
+            if matrix is not None:
+                scores = matrix @ vector
+                for i in np.argsort(-scores):
+                    if scores[i] < self.threshold:
+                        break
+                    key = keys[i]
+                    entry = self._entries.get(key)
+                    if entry is None:
+                        continue
+                    if now - entry.created > self.ttl:
+                        self._drop(key)
+                        continue
+                    if not compatible(question, entry.question):
+                        continue
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.answer
+            self.misses += 1
+        return None
+
+    def lookup(self, question: str, scope: Hashable = None, vector: Optional[np.ndarray] = None) -> Optional[Any]:
+        """Cached answer for a semantically equivalent question, or None"""
+        answer = self._exact(question, scope)
+        if answer is not None:
+            return answer
+        return self._nearest(question, self._embed(question) if vector is None else vector, scope)
+
+    async def alookup(self, question: str, scope: Hashable = None) -> Optional[Any]:
+        """lookup() with the question embedded asynchronously and the search off the event loop"""
+        answer = await asyncio.to_thread(self._exact, question, scope)
+        if answer is not None:
+            return answer
+        return await asyncio.to_thread(self._nearest, question, await self._aembed(question), scope)
+
+    def store(self, question: str, answer: Any, scope: Hashable = None, vector: Optional[np.ndarray] = None):
+        vector = self._embed(question) if vector is None else vector
+        key = (scope, normalize_question(question))
+        now = time.time()
+        with self._lock:
+            if now - self._last_purge > PURGE_INTERVAL:
+                self._purge(now)
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = CacheEntry(question, vector, answer)
+            self._matrices.pop(scope, None)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    async def astore(self, question: str, answer: Any, scope: Hashable = None):
+        await asyncio.to_thread(self.store, question, answer, scope, await self._aembed(question))
+
+    def bypass(self):
+        """Count a query that skipped the cache because it depends on chat history"""
+        with self._lock:
+            self.bypassed += 1
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+        }
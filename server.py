@@ -0,0 +1,103 @@
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel
+from sse_starlette.sse import EventSourceResponse
+from typing import Callable
+import importlib
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+import httpx
+import uvicorn
+
+from index_store import load_bm25
+from registry import registry
+
+load_dotenv()
+
+# try.py can't be imported with a plain import statement ("try" is a keyword)
+assistant_module = importlib.import_module("try")
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 8000))
+WORKERS = int(os.getenv("WORKERS", 1))
+MAX_INFLIGHT_LLM = int(os.getenv("MAX_INFLIGHT_LLM", 16))  # per worker process
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 64))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 60))
+
+class ChatRequest(BaseModel):
+    session_id: str
+    question: str
+
+class ChatResponse(BaseModel):
+    answer: str
+    latency_ms: float
+
+def default_assistant(http_client: httpx.Client, http_async_client: httpx.AsyncClient):
+    """FinancialAssistant whose OpenAI clients all share the worker's connection pools"""
+    clients = {"http_client": http_client, "http_async_client": http_async_client}
+    return assistant_module.FinancialAssistant(
+        db=assistant_module.load_vectorstore(**clients),
+        bm25=load_bm25(assistant_module.DB_FAISS_PATH),
+        llm=assistant_module.load_llm(**clients),
+        safety_llm=assistant_module.load_safety_llm(**clients),
+        max_inflight=MAX_INFLIGHT_LLM
+    )
+
+def create_app(assistant_factory: Callable = default_assistant) -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # One vector store, one assistant and one pair of pooled clients per worker
+        limits = httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE)
+        async with httpx.AsyncClient(limits=limits, timeout=HTTP_TIMEOUT) as http_async_client:
+            with httpx.Client(limits=limits, timeout=HTTP_TIMEOUT) as http_client:
+                app.state.assistant = assistant_factory(http_client, http_async_client)
+                logger.info(f"Assistant ready (max {MAX_INFLIGHT_LLM} in-flight LLM calls)")
+                yield
+
+    app = FastAPI(title="Financial Assistant", lifespan=lifespan)
+
+    @app.post("/chat", response_model=ChatResponse)
+    async def chat(body: ChatRequest, request: Request):
+        start = time.perf_counter()
+        try:
+            answer = await request.app.state.assistant.aquery(body.session_id, body.question)
+        except Exception as e:
+            logger.error(f"Query failed for session {body.session_id}: {e}")
+            raise HTTPException(status_code=502, detail="Upstream model error")
+        return ChatResponse(answer=answer, latency_ms=(time.perf_counter() - start) * 1000)
+
+    @app.post("/chat/stream")
+    async def chat_stream(body: ChatRequest, request: Request):
+        """Server-sent events: "token" events as each sentence passes compliance, then "done" or "refusal" """
+        async def events():
+            try:
+                async for event in request.app.state.assistant.astream(body.session_id, body.question):
+                    yield event
+            except Exception as e:
+                logger.error(f"Streamed query failed for session {body.session_id}: {e}")
+                yield {"event": "error", "data": "Upstream model error"}
+
+        return EventSourceResponse(events())
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/stats")
+    async def stats(request: Request):
+        return {**request.app.state.assistant.stats(), "registry": registry.stats()}
+
+    return app
+
+app = create_app()
+
+if __name__ == "__main__":
+    # Each worker is a separate process with its own store, pool and LLM limit;
+    # set SESSION_BACKEND=sqlite so chat sessions are shared between them
+    uvicorn.run("server:app", host=HOST, port=PORT, workers=WORKERS)
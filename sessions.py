@@ -0,0 +1,231 @@
+"""
+Bounded chat-session storage.
+
+Sessions live in an in-memory LRU (lost on restart) or in SQLite (shared
+by all server workers and kept across restarts). Either way sessions
+expire after a TTL, the number of sessions is capped and each session
+keeps only its most recent messages. The model is sent just the newest
+turns that fit a token budget, so the cost of a turn does not grow with
+the length of the conversation.
+"""
+from collections import OrderedDict
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, HumanMessage, messages_from_dict, messages_to_dict
+from typing import Dict, List, Sequence
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from tokens import DEFAULT_MODEL, count_tokens_batch
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")  # "memory" or "sqlite"
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "cache/sessions.sqlite")
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", 24 * 3600))
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", 10000))
+MAX_STORED_MESSAGES = int(os.getenv("MAX_STORED_MESSAGES", 40))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 1500))
+MESSAGE_OVERHEAD_TOKENS = 4  # role and separators around each chat message
+
+def window_messages(messages: Sequence[BaseMessage], max_tokens: int = HISTORY_TOKEN_BUDGET,
+                    model: str = DEFAULT_MODEL) -> List[BaseMessage]:
+    """Newest messages whose tokens fit max_tokens, starting at a user turn"""
+    counts = count_tokens_batch([str(message.content) for message in messages], model)
+    start, used = len(messages), 0
+    for i in range(len(messages) - 1, -1, -1):
+        used += counts[i] + MESSAGE_OVERHEAD_TOKENS
+        if used > max_tokens:
+            break
+        start = i
+    while start < len(messages) and not isinstance(messages[start], HumanMessage):
+        start += 1
+    return list(messages[start:])
+
+class MemorySessionStore:
+    """Per-process LRU of sessions with a TTL since last use"""
+    def __init__(self, ttl: float = SESSION_TTL_SECONDS, max_sessions: int = MAX_SESSIONS,
+                 max_messages: int = MAX_STORED_MESSAGES):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self._sessions: "OrderedDict[str, List[BaseMessage]]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> List[BaseMessage]:
+        with self._lock:
+            if session_id not in self._sessions:
+                return []
+            if time.time() - self._last_used[session_id] > self.ttl:
+                self._drop(session_id)
+                return []
+            self._sessions.move_to_end(session_id)
+            return list(self._sessions[session_id])
+
+    def append(self, session_id: str, messages: Sequence[BaseMessage]):
+        with self._lock:
+            if session_id in self._sessions and time.time() - self._last_used[session_id] > self.ttl:
+                self._drop(session_id)  # an expired session starts over, it is not revived
+            history = self._sessions.pop(session_id, [])
+            self._sessions[session_id] = (history + list(messages))[-self.max_messages:]
+            self._last_used[session_id] = time.time()
+            while len(self._sessions) > self.max_sessions:
+                self._drop(next(iter(self._sessions)))
+
+    def clear(self, session_id: str):
+        with self._lock:
+            if session_id in self._sessions:
+                self._drop(session_id)
+
+    def _drop(self, session_id: str):
+        del self._sessions[session_id]
+        del self._last_used[session_id]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+class SQLiteSessionStore:
+    """Sessions in SQLite, so they survive restarts and are shared between worker processes"""
+    PURGE_INTERVAL = 60.0
+
+    def __init__(self, path: str = SESSION_DB_PATH, ttl: float = SESSION_TTL_SECONDS,
+                 max_sessions: int = MAX_SESSIONS, max_messages: int = MAX_STORED_MESSAGES):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                message TEXT NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_used ON sessions(last_used)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id, id)")
+        self._conn.commit()
+
+    def _expire(self, session_id: str, now: float) -> bool:
+        """Delete the session if its TTL has passed; True if it exists and is live. Call with the lock held."""
+        row = self._conn.execute(
+            "SELECT last_used FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return False
+        if now - row[0] > self.ttl:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            return False
+        return True
+
+    def get(self, session_id: str) -> List[BaseMessage]:
+        with self._lock:
+            if not self._expire(session_id, time.time()):
+                self._conn.commit()
+                return []
+            rows = self._conn.execute(
+                "SELECT message FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (session_id, self.max_messages)
+            ).fetchall()
+        return messages_from_dict([json.loads(message) for message, in reversed(rows)])
+
+    def append(self, session_id: str, messages: Sequence[BaseMessage]):
+        rows = [(session_id, json.dumps(message)) for message in messages_to_dict(messages)]
+        now = time.time()
+        with self._lock:
+            # An expired session starts over, it is not revived with its old messages
+            self._expire(session_id, now)
+            self._conn.executemany("INSERT INTO messages (session_id, message) VALUES (?, ?)", rows)
+            self._conn.execute(
+                "INSERT INTO sessions (session_id, last_used) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET last_used = excluded.last_used",
+                (session_id, now)
+            )
+            # Keep only the newest max_messages of this session
+            self._conn.execute(
+                "DELETE FROM messages WHERE session_id = ? AND id <= "
+                "(SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (session_id, session_id, self.max_messages)
+            )
+            if now - self._last_purge > self.PURGE_INTERVAL:
+                self._purge(now)
+            self._conn.commit()
+
+    def _purge(self, now: float):
+        """Drop expired sessions, then the least recently used beyond max_sessions"""
+        self._last_purge = now
+        self._conn.execute("DELETE FROM sessions WHERE last_used < ?", (now - self.ttl,))
+        self._conn.execute(
+            "DELETE FROM sessions WHERE session_id IN "
+            "(SELECT session_id FROM sessions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,)
+        )
+        self._conn.execute("DELETE FROM messages WHERE session_id NOT IN (SELECT session_id FROM sessions)")
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class WindowedChatHistory(BaseChatMessageHistory):
+    """
+    Chat history backed by a session store. Reading `messages` returns only
+    the newest turns within the token budget. Writes go to the store, which
+    keeps its own bounded copy.
+    """
+    def __init__(self, store, session_id: str, max_tokens: int = HISTORY_TOKEN_BUDGET,
+                 model: str = DEFAULT_MODEL):
+        self.store = store
+        self.session_id = session_id
+        self.max_tokens = max_tokens
+        self.model = model
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return window_messages(self.store.get(self.session_id), self.max_tokens, self.model)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.store.append(self.session_id, messages)
+
+    def clear(self) -> None:
+        self.store.clear(self.session_id)
+
+_stores = {}
+
+def get_session_store(backend: str = SESSION_BACKEND):
+    """Process-wide session store for a backend"""
+    if backend not in _stores:
+        if backend == "sqlite":
+            _stores[backend] = SQLiteSessionStore()
+        elif backend == "memory":
+            _stores[backend] = MemorySessionStore()
+        else:
+            raise ValueError(f"Unknown session backend {backend!r}, expected 'memory' or 'sqlite'")
+    return _stores[backend]
+
+def get_session_history(session_id: str, store=None, max_tokens: int = HISTORY_TOKEN_BUDGET,
+                        model: str = DEFAULT_MODEL) -> WindowedChatHistory:
+    return WindowedChatHistory(store if store is not None else get_session_store(), session_id, max_tokens, model)
@@ -0,0 +1,94 @@
+"""
+Local calendar of daily financial terms for recommendation.py. Each row is
+keyed by ISO date and holds the term and its explanation. The daily run is
+then a primary-key lookup with no network. A term may appear only once
+within any REPEAT_WINDOW_DAYS days, enforced on write.
+"""
+from typing import Dict, List, Optional, Tuple
+import datetime
+import os
+import re
+import sqlite3
+import threading
+
+TERM_CALENDAR_PATH = os.getenv("TERM_CALENDAR_PATH", "cache/terms.sqlite")
+REPEAT_WINDOW_DAYS = int(os.getenv("TERM_REPEAT_WINDOW_DAYS", 365))
+
+def normalize_term(term: str) -> str:
+    """Lowercase words only, so "P/E Ratio" and "p-e ratio" count as the same term"""
+    return " ".join(re.findall(r"[a-z0-9]+", term.lower()))
+
+class TermCalendar:
+    def __init__(self, path: str = TERM_CALENDAR_PATH, repeat_window: int = REPEAT_WINDOW_DAYS):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.repeat_window = repeat_window
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS calendar (
+                day TEXT PRIMARY KEY,
+                term TEXT NOT NULL,
+                normalized TEXT NOT NULL,
+                explanation TEXT NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS calendar_normalized ON calendar (normalized, day)")
+        self._conn.commit()
+
+    def get(self, day: datetime.date) -> Optional[Tuple[str, str]]:
+        """(term, explanation) scheduled for day, or None"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT term, explanation FROM calendar WHERE day = ?", (day.isoformat(),)
+            ).fetchone()
+
+    def missing_days(self, start: datetime.date, days: int) -> List[datetime.date]:
+        wanted = [start + datetime.timedelta(days=i) for i in range(days)]
+        with self._lock:
+            have = {row[0] for row in self._conn.execute(
+                "SELECT day FROM calendar WHERE day BETWEEN ? AND ?",
+                (wanted[0].isoformat(), wanted[-1].isoformat())
+            )} if wanted else set()
+        return [day for day in wanted if day.isoformat() not in have]
+
+    def terms_near(self, start: datetime.date, end: datetime.date) -> List[str]:
+        """
+        Terms scheduled within repeat_window days of [start, end], nearest
+        to the middle of the range first; new terms in that range must
+        avoid them
+        """
+        low = start - datetime.timedelta(days=self.repeat_window - 1)
+        high = end + datetime.timedelta(days=self.repeat_window - 1)
+        middle = start + (end - start) / 2
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT term FROM calendar WHERE day BETWEEN ? AND ? "
+                "ORDER BY ABS(julianday(day) - julianday(?)), day",
+                (low.isoformat(), high.isoformat(), middle.isoformat())
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _repeats(self, day: datetime.date, normalized: str) -> bool:
+        low = day - datetime.timedelta(days=self.repeat_window - 1)
+        high = day + datetime.timedelta(days=self.repeat_window - 1)
+        return self._conn.execute(
+            "SELECT 1 FROM calendar WHERE normalized = ? AND day BETWEEN ? AND ? AND day != ? LIMIT 1",
+            (normalized, low.isoformat(), high.isoformat(), day.isoformat())
+        ).fetchone() is not None
+
+    def put(self, day: datetime.date, term: str, explanation: str) -> bool:
+        """Schedule term for day; False (nothing written) if it would repeat within the window"""
+        normalized = normalize_term(term)
+        with self._lock:
+            if not normalized or self._repeats(day, normalized):
+                return False
+            self._conn.execute("INSERT OR REPLACE INTO calendar VALUES (?, ?, ?, ?)",
+                               (day.isoformat(), term, normalized, explanation))
+            self._conn.commit()
+        return True
+
+    def stats(self) -> Dict:
+        with self._lock:
+            days, first, last = self._conn.execute("SELECT COUNT(*), MIN(day), MAX(day) FROM calendar").fetchone()
+        return {"days": days, "first": first, "last": last}
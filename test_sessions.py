@@ -0,0 +1,38 @@
+"""Session expiry: a session past its TTL must not come back when new messages are appended"""
+from langchain_core.messages import AIMessage, HumanMessage
+import time
+
+import pytest
+
+from sessions import MemorySessionStore, SQLiteSessionStore
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield MemorySessionStore(ttl=0.2)
+    else:
+        store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite"), ttl=0.2)
+        yield store
+        store.close()
+
+def contents(messages):
+    return [message.content for message in messages]
+
+def test_append_after_expiry_starts_a_new_session(store):
+    store.append("s", [HumanMessage("old q"), AIMessage("old a")])
+    assert contents(store.get("s")) == ["old q", "old a"]
+    time.sleep(0.4)
+    assert store.get("s") == []
+    store.append("s", [HumanMessage("new q"), AIMessage("new a")])
+    assert contents(store.get("s")) == ["new q", "new a"]
+
+def test_append_after_expiry_without_a_read(store):
+    store.append("s", [HumanMessage("old q"), AIMessage("old a")])
+    time.sleep(0.4)
+    store.append("s", [HumanMessage("new q"), AIMessage("new a")])
+    assert contents(store.get("s")) == ["new q", "new a"]
+
+def test_live_session_keeps_history(store):
+    store.append("s", [HumanMessage("q1"), AIMessage("a1")])
+    store.append("s", [HumanMessage("q2"), AIMessage("a2")])
+    assert contents(store.get("s")) == ["q1", "a1", "q2", "a2"]
@@ -0,0 +1,45 @@
+from functools import lru_cache
+from typing import List
+import logging
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gpt-4"
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = DEFAULT_MODEL):
+    """tiktoken encoding for a model, or None if it cannot be loaded (e.g. offline)"""
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable for {model}, estimating tokens: {e}")
+        return None
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    encoding = get_encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4  # ~4 characters per token for English text
+    return len(encoding.encode(text, disallowed_special=()))
+
+def count_tokens_batch(texts: List[str], model: str = DEFAULT_MODEL) -> List[int]:
+    encoding = get_encoding(model)
+    if encoding is None:
+        return [(len(text) + 3) // 4 for text in texts]
+    return [len(tokens) for tokens in encoding.encode_batch(texts, disallowed_special=())]
+
+def truncate_tokens(text: str, max_tokens: int, model: str = DEFAULT_MODEL, from_end: bool = False) -> str:
+    """Longest prefix of text within max_tokens, or longest suffix if from_end"""
+    if max_tokens <= 0:
+        return ""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[-max_tokens * 4:] if from_end else text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[-max_tokens:] if from_end else tokens[:max_tokens])
@@ -1,17 +1,26 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import PromptTemplate, ChatPromptTemplate
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain.chains import ConversationalRetrievalChain
 from langchain.memory import ConversationBufferMemory
 from langchain_core.runnables import RunnablePassthrough
+from operator import itemgetter
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from context_packer import CONTEXT_CANDIDATES, ContextPacker
+from embedding_cache import get_embeddings
+from compliance import ComplianceChecker
+from hybrid import make_retriever
+from index_store import load_bm25, load_store
+from metrics import LatencyRecorder
+from registry import get_chat_model
+from semantic_cache import SemanticCache, is_follow_up
+from sessions import get_session_history, get_session_store
+
 DB_FAISS_PATH = 'vectorstore/db_faiss'
-store = {}
 
 FINANCIAL_SYSTEM_PROMPT = """You are a financial guidance assistant for Indian investors. Your responses must:
 1. Be accurate and based on SEBI regulations
@@ -36,32 +45,54 @@ User Profile:
 Question: {question}""")
 ])
 
-def load_llm():
-    return ChatOpenAI(model="gpt-4", temperature=0.3)
+def load_llm(**kwargs):
+    return get_chat_model("gpt-4", temperature=0.3, **kwargs)
+
+def load_safety_llm(**kwargs):
+    return get_chat_model("gpt-3.5-turbo", temperature=0, max_tokens=5, **kwargs)
+
+def load_vectorstore(**kwargs):
+    embeddings = get_embeddings(**kwargs)
+    return load_store(DB_FAISS_PATH, embeddings)
+
+SAFETY_PROMPT = """Verify compliance with Indian financial regulations: {response}
 
-def load_vectorstore():
-    embeddings = OpenAIEmbeddings(model='text-embedding-3-large')
-    return FAISS.load_local(DB_FAISS_PATH, embeddings, allow_dangerous_deserialization=True)
+Reply with one word: compliant or non-compliant."""
+
+REFUSAL = "I cannot provide that information. Please consult a certified financial advisor."
 
 class FinancialAssistant:
-    def __init__(self):
-        self.db = load_vectorstore()
-        self.llm = load_llm()
+    def __init__(self, db=None, llm=None, safety_llm=None, max_inflight: int = 16, sessions=None, bm25=None):
+        if db is None:
+            db = load_vectorstore()
+            bm25 = bm25 if bm25 is not None else load_bm25(DB_FAISS_PATH)
+        self.db = db
+        self.retriever = make_retriever(self.db, bm25, k=CONTEXT_CANDIDATES)
+        # Merges overlapping chunks, drops repeats and caps the context at a token budget
+        self.context_packer = ContextPacker()
+        self.llm = llm or load_llm()
+        self.sessions = sessions if sessions is not None else get_session_store()
+        self.answer_cache = SemanticCache(self.db.embeddings)
+        # Caps concurrent LLM calls from aquery so one process can't flood the provider
+        self.llm_limit = asyncio.Semaphore(max_inflight)
         
-        # Updated safety check using new chain syntax
+        # Updated safety check using new chain syntax; a one-word verdict keeps it cheap
         self.safety_check = (
-            PromptTemplate.from_template("Verify compliance with Indian financial regulations: {response}")
-            | ChatOpenAI(model="gpt-3.5-turbo")
+            PromptTemplate.from_template(SAFETY_PROMPT)
+            | (safety_llm or load_safety_llm())
         )
+        self.metrics = LatencyRecorder()
+        self.compliance = ComplianceChecker(self.safety_check, self.metrics)
+        self.chain = self._build_chain()
         
     def get_memory(self, session_id):
-        if session_id not in store:
-            store[session_id] = ConversationBufferMemory(
-                return_messages=True,
-                output_key="answer",
-                memory_key="chat_history"
-            )
-        return store[session_id]
+        # Cheap per-call view; the bounded session store holds the actual history
+        return ConversationBufferMemory(
+            chat_memory=get_session_history(session_id, self.sessions),
+            return_messages=True,
+            output_key="answer",
+            memory_key="chat_history"
+        )
     
     def get_user_profile(self, session_id):
         return {
@@ -70,36 +101,172 @@ class FinancialAssistant:
             'experience_level': 'beginner'
         }
     
-    def query(self, session_id, question):
-        memory = self.get_memory(session_id)
-        user_profile = self.get_user_profile(session_id)
-        
-        chain = (
+    def _build_chain(self):
+        # Built once; per-question state (history, profile) arrives as chain input
+        return (
             RunnablePassthrough.assign(
-                chat_history=lambda _: memory.load_memory_variables({})["chat_history"],
-                context=lambda x: self.db.as_retriever().invoke(x["question"])
+                context=itemgetter("question") | self.retriever | self.context_packer.format
             )
             | PROMPT_TEMPLATE
             | self.llm
         )
+    
+    def _cache_policy(self, history, question, user_profile):
+        """
+        Answers are shared between users with the same profile, unless the
+        question only makes sense in the light of this session's history
+        """
+        cache_scope = tuple(sorted(user_profile.items()))
+        use_cache = not (history and is_follow_up(question))
+        if not use_cache:
+            self.answer_cache.bypass()
+        return use_cache, cache_scope
+    
+    def _cached(self, memory, question, cached):
+        memory.save_context({"question": question}, {"answer": cached})
+        yield {"event": "token", "data": cached}
+        yield {"event": "done", "data": ""}
+    
+    def _commit(self, memory, question, answer, start):
+        """History only ever sees answers that passed the compliance check"""
+        memory.save_context({"question": question}, {"answer": answer})
+        self.metrics.record("total", (time.perf_counter() - start) * 1000)
+    
+    def stream(self, session_id, question):
+        """
+        Answer as a stream of SSE-style events: "token" events carry text a
+        sentence at a time, once it has passed the compliance check, then a
+        final "done" event, or a "refusal" event that supersedes the text
+        sent so far. Sentences are screened while the model is still
+        generating, and generation stops as soon as one is found
+        non-compliant; that sentence and anything after it are never sent.
+        """
+        start = time.perf_counter()
+        memory = self.get_memory(session_id)
+        user_profile = self.get_user_profile(session_id)
         
-        response = chain.invoke({
-            "question": question,
-            **user_profile
-        })
+        history = memory.load_memory_variables({})["chat_history"]
+        use_cache, cache_scope = self._cache_policy(history, question, user_profile)
+        if use_cache:
+            cached = self.answer_cache.lookup(question, cache_scope)
+            if cached is not None:
+                yield from self._cached(memory, question, cached)
+                return
         
-        # Save to memory
-        memory.save_context(
-            {"question": question},
-            {"answer": response.content}
-        )
+        check = self.compliance.run()
+        parts = []
+        chunks = self.chain.stream({"question": question, "chat_history": history, **user_profile})
+        try:
+            for chunk in chunks:
+                if not chunk.content:
+                    continue
+                if not parts:
+                    self.metrics.record("ttft", (time.perf_counter() - start) * 1000)
+                parts.append(chunk.content)
+                if not check.feed(chunk.content):
+                    break
+                cleared = check.release()
+                if cleared:
+                    yield {"event": "token", "data": cleared}
+        finally:
+            chunks.close()
+        self.metrics.record("generation", (time.perf_counter() - start) * 1000)
+        
+        if not check.finish():
+            yield {"event": "refusal", "data": REFUSAL}
+            return
+        cleared = check.release()
+        if cleared:
+            yield {"event": "token", "data": cleared}
+        answer = "".join(parts)
+        self._commit(memory, question, answer, start)
+        if use_cache:
+            self.answer_cache.store(question, answer, cache_scope)
+        yield {"event": "done", "data": ""}
+    
+    async def astream(self, session_id, question):
+        """
+        Async variant of stream() for the HTTP server; LLM calls go through
+        llm_limit, and session store reads and writes run off the event loop
+        """
+        start = time.perf_counter()
+        memory = self.get_memory(session_id)
+        user_profile = self.get_user_profile(session_id)
         
-        # Safety check
-        safety_result = self.safety_check.invoke({"response": response.content})
-        if "non-compliant" in safety_result.content.lower():
-            return "I cannot provide that information. Please consult a certified financial advisor."
+        history = (await asyncio.to_thread(memory.load_memory_variables, {}))["chat_history"]
+        use_cache, cache_scope = self._cache_policy(history, question, user_profile)
+        if use_cache:
+            cached = await self.answer_cache.alookup(question, cache_scope)
+            if cached is not None:
+                await asyncio.to_thread(memory.save_context, {"question": question}, {"answer": cached})
+                yield {"event": "token", "data": cached}
+                yield {"event": "done", "data": ""}
+                return
         
-        return response.content
+        check = self.compliance.arun(self.llm_limit)
+        parts = []
+        try:
+            async with self.llm_limit:
+                chunks = self.chain.astream(
+                    {"question": question, "chat_history": history, **user_profile}
+                )
+                try:
+                    async for chunk in chunks:
+                        if not chunk.content:
+                            continue
+                        if not parts:
+                            self.metrics.record("ttft", (time.perf_counter() - start) * 1000)
+                        parts.append(chunk.content)
+                        if not check.feed(chunk.content):
+                            break
+                        cleared = check.release()
+                        if cleared:
+                            yield {"event": "token", "data": cleared}
+                finally:
+                    await chunks.aclose()
+            self.metrics.record("generation", (time.perf_counter() - start) * 1000)
+            compliant = await check.finish()
+        finally:
+            check.cancel()
+        
+        if not compliant:
+            yield {"event": "refusal", "data": REFUSAL}
+            return
+        cleared = check.release()
+        if cleared:
+            yield {"event": "token", "data": cleared}
+        answer = "".join(parts)
+        await asyncio.to_thread(self._commit, memory, question, answer, start)
+        if use_cache:
+            await self.answer_cache.astore(question, answer, cache_scope)
+        yield {"event": "done", "data": ""}
+    
+    def query(self, session_id, question):
+        answer = ""
+        for event in self.stream(session_id, question):
+            if event["event"] == "token":
+                answer += event["data"]
+            elif event["event"] == "refusal":
+                return event["data"]
+        return answer
+    
+    async def aquery(self, session_id, question):
+        answer = ""
+        async for event in self.astream(session_id, question):
+            if event["event"] == "token":
+                answer += event["data"]
+            elif event["event"] == "refusal":
+                return event["data"]
+        return answer
+    
+    def stats(self):
+        return {
+            "answer_cache": self.answer_cache.stats(),
+            "compliance": self.compliance.stats(),
+            "context": self.context_packer.stats(),
+            "latency": self.metrics.summary(),
+            "retrieval": self.retriever.metrics.summary(),
+        }
 
 if __name__ == "__main__":
     print("Namaste! I'm your financial guide. Ask me about:")
@@ -115,8 +282,13 @@ if __name__ == "__main__":
                 print("Dhanyavaad! Always verify investments with certified advisors.")
                 break
                 
-            response = assistant.query(session_id, user_input)
-            print(f"Guide: {response}")
+            print("Guide: ", end="", flush=True)
+            for event in assistant.stream(session_id, user_input):
+                if event["event"] == "token":
+                    print(event["data"], end="", flush=True)
+                elif event["event"] == "refusal":
+                    print(f"\n[Withdrawn] {event['data']}", end="")
+            print()
             
         except Exception as e:
             print(f"System error: {str(e)}")
@@ -1,31 +1,36 @@
-from langchain_community.document_loaders import DirectoryLoader, UnstructuredPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter  # Fallback splitter
-from langchain_openai.embeddings import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
-from langdetect import detect
-from typing import List
+from typing import Iterator, List
+import argparse
 import os
 import logging
 
+from embedding_cache import get_embeddings
+from embedding_pipeline import embed_into_faiss
+from index_store import INDEX_TYPES, save_store
+from langfilter import LanguageClassifier
+from pdf_loader import find_pdfs, iter_batches, iter_pdf_pages
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SUPPORTED_LANGUAGES = ("en", "hi", "ta")
+KEPT_LABELS = SUPPORTED_LANGUAGES + ("unknown",)  # no letters (figures, numeric tables) is not another language
+
 class FinancialDocumentProcessor:
     def __init__(self):
-        self.embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
+        self.embeddings = get_embeddings()
+        self.language_classifier = LanguageClassifier()
         
+    def iter_documents(self, data_path: str = "./data") -> Iterator:
+        """Stream element-mode documents from a process pool of PDF parsers"""
+        return iter_pdf_pages(find_pdfs(data_path, glob="**/*.pdf"), parser="unstructured")
+
     def load_documents(self, data_path: str = "./data") -> List:
         """Load financial documents with error handling"""
         try:
-            loader = DirectoryLoader(
-                data_path,
-                glob="**/*.pdf",
-                loader_cls=UnstructuredPDFLoader,
-                loader_kwargs={"mode": "elements"},
-                use_multithreading=True
-            )
-            return loader.load()
+            return list(self.iter_documents(data_path))
         except Exception as e:
             logger.error(f"Document loading failed: {str(e)}")
             raise
@@ -41,35 +46,47 @@ class FinancialDocumentProcessor:
         return text_splitter.split_documents(documents)
 
     def filter_vernacular(self, documents: List) -> List:
-        """Basic language filtering for Indian context"""
-        filtered = []
-        for doc in documents:
-            try:
-                content = doc.page_content[:500]  # Check first 500 chars
-                lang = detect(content)
-                if lang in ["en", "hi", "ta"]:
-                    filtered.append(doc)
-            except:
-                continue
-        return filtered
+        """Batched, deterministic language filtering for Indian context"""
+        languages = self.language_classifier.classify_batch(doc.page_content for doc in documents)
+        kept = [doc for doc, lang in zip(documents, languages) if lang in KEPT_LABELS]
+        if len(kept) < len(documents):
+            logger.info(f"Language filter dropped {len(documents) - len(kept)} of {len(documents)} elements")
+        return kept
 
-    def build_knowledge_base(self) -> FAISS:
-        """Create financial knowledge base"""
-        documents = self.load_documents()
-        filtered_docs = self.filter_vernacular(documents)
-        chunks = self.chunk_documents(filtered_docs)
-        
-        return FAISS.from_documents(
-            documents=chunks,
-            embedding=self.embeddings,
-            normalize_L2=True
-        )
+    def build_knowledge_base(self, batch_size: int = 5000) -> FAISS:
+        """Create financial knowledge base, streaming documents through filter, splitter and embedder"""
+        knowledge_base = None
+        for documents in iter_batches(self.iter_documents(), batch_size):
+            filtered_docs = self.filter_vernacular(documents)
+            chunks = self.chunk_documents(filtered_docs)
+            if chunks:
+                knowledge_base = embed_into_faiss(
+                    chunks,
+                    None,
+                    self.embeddings,
+                    db=knowledge_base,
+                    normalize_L2=True
+                )
+        return knowledge_base
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the financial knowledge base")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat")
+    parser.add_argument("--nlist", type=int)
+    parser.add_argument("--nprobe", type=int)
+    parser.add_argument("--pq-m", type=int)
+    parser.add_argument("--pq-nbits", type=int)
+    parser.add_argument("--hnsw-m", type=int)
+    parser.add_argument("--ef-construction", type=int)
+    parser.add_argument("--ef-search", type=int)
+    args = parser.parse_args()
+    index_params = {name: value for name, value in vars(args).items() if name != "index_type" and value is not None}
+
     processor = FinancialDocumentProcessor()
     knowledge_base = processor.build_knowledge_base()
-    knowledge_base.save_local("financial_db")
+    save_store(knowledge_base, "financial_db", index_type=args.index_type, **index_params)
     
     # Test query
     results = knowledge_base.similarity_search("What is ELSS?", k=3)
-    print(f"Found {len(results)} relevant documents")
\ No newline at end of file
+    print(f"Found {len(results)} relevant documents")
+    logger.info(f"Embedding cache: {processor.embeddings.stats()}")
\ No newline at end of file